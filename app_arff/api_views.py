@@ -2,21 +2,147 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
 from rest_framework import status
-from django.core.cache import cache
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
 import pandas as pd
-import hashlib
 import io
+import json
+import logging
 import re
 import numpy as np
 
+from . import arff_reader, ingest, jobs
+from .encoding import (
+    COLUMN_BUFFERS_MEDIA_TYPE, PAGE_FORMATS, RECORDS_FORMAT, encode_buffers, encode_page,
+)
+from .export import EXPORT_CONTENT_TYPES, NDJSON_FORMAT, ReleasingStream, iter_blocks, iter_export
+from .compaction import compact_dataset
+from .correlation import association_summary
+from .dataset_cache import get_dataset_cache
+from .dataset_store import get_store, is_valid_key
+from .instrumentation import PROMETHEUS_CONTENT_TYPE, get_registry, is_enabled, stage
+from .parallel_reader import read_arff_path
+from .renderers import ColumnBuffersRenderer, InstrumentedJSONRenderer
+from .plotting import DEFAULT_BINS, DEFAULT_POINTS, MAX_BINS, MAX_POINTS, plot_data
+from .query import QueryError, normalize_query, query_row_ids, sort_permutation
+from .result_sets import (
+    InvalidCursor, decode_cursor, encode_cursor, get_result_cache, make_page_etag,
+)
+from .sparse import SparseFrame
+from .stats import HISTOGRAM_BINS, MAX_HISTOGRAM_BINS, dataset_summary
+
+logger = logging.getLogger(__name__)
+
+# Filas enviadas en la respuesta inicial de la subida
+INITIAL_ROWS = 1000
+
+# Máximo de celdas densificadas por página en datasets dispersos
+SPARSE_MAX_PAGE_CELLS = 1000000
+
+def sparse_page_rows(df):
+    """Máximo de filas por página de un dataset disperso (se densifican al codificarlas)"""
+    return max(1, SPARSE_MAX_PAGE_CELLS // max(1, len(df.columns)))
+
+
+def initial_page_rows(df):
+    """Filas de la primera página; en datasets dispersos anchos se limita por celdas"""
+    if isinstance(df, SparseFrame):
+        return min(INITIAL_ROWS, sparse_page_rows(df))
+    return INITIAL_ROWS
+
+
+def _encode_timed(page_data, layout):
+    with stage('encode', rows=len(page_data)):
+        return encode_page(page_data, layout)
+
+
+def dataset_payload(df, metadata, cache_key, filename, layout):
+    """Respuesta de una subida: metadata del dataset y su primera página"""
+    initial_rows = initial_page_rows(df)
+    
+    return {
+        'success': True,
+        'filename': filename,
+        'columns': list(df.columns),
+        # Codificar la primera página (por filas o por columnas) con nulos como null
+        'data': _encode_timed(df.head(initial_rows), layout),
+        'layout': layout,
+        'shape': {
+            'rows': len(df),
+            'columns': len(df.columns)
+        },
+        'description': metadata.get('description', 'Dataset procesado'),
+        'relation': metadata.get('relation', 'N/A'),
+        'cache_key': cache_key,
+        'has_more': len(df) > initial_rows,
+        'sparse': isinstance(df, SparseFrame),
+        'partial': False,
+        'rows_ready': len(df)
+    }
+
+
+def partial_payload(partial, cache_key, filename, layout):
+    """Como dataset_payload, con las filas ya parseadas de un dataset que aún se está procesando"""
+    page_data = partial.rows(0, INITIAL_ROWS)
+    
+    return {
+        'success': True,
+        'filename': filename,
+        'columns': partial.columns,
+        'data': _encode_timed(page_data, layout),
+        'layout': layout,
+        'shape': {
+            'rows': partial.rows_ready,
+            'columns': len(partial.columns)
+        },
+        'description': partial.metadata.get('description', 'Dataset procesado'),
+        'relation': partial.metadata.get('relation', 'N/A'),
+        'cache_key': cache_key,
+        # Quedan filas por parsear aunque todas las publicadas quepan en la página
+        'has_more': True,
+        'sparse': False,
+        'partial': True,
+        'rows_ready': partial.rows_ready
+    }
+
+
+def job_payload(job, cache_key, filename, layout):
+    """Respuesta 202 de un trabajo en curso; incluye la primera página si ya está publicada"""
+    response_data = {
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'cache_key': cache_key,
+        'filename': filename,
+        'layout': layout,
+    }
+    
+    if settings.ARFF_PROGRESSIVE_INGEST:
+        with stage('cache'):
+            partial = get_store().load_partial(cache_key)
+        if partial is not None:
+            try:
+                response_data.update(partial_payload(partial, cache_key, filename, layout))
+            except OSError:
+                # El trabajo terminó mientras se leía: el cliente lo verá al consultarlo
+                pass
+    return response_data
+
+
 class ARFFUploadAPI(APIView):
    
     parser_classes = [MultiPartParser]
     
     def post(self, request):
-        print(" DEBUG - Request recibido")
+        logger.debug('Request recibido')
         
-        arff_file = request.FILES.get('file')
+        # El parser multipart lee (y copia a disco si es grande) el archivo aquí
+        with stage('read'):
+            arff_file = request.FILES.get('file')
         
         if not arff_file:
             return Response(
@@ -24,43 +150,65 @@ class ARFFUploadAPI(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        layout = request.data.get('layout') or RECORDS_FORMAT
+        if layout not in PAGE_FORMATS:
+            return Response(
+                {'error': f"layout debe ser uno de: {', '.join(PAGE_FORMATS)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        max_size = getattr(settings, 'ARFF_MAX_UPLOAD_SIZE', None)
+        if max_size and arff_file.size > max_size:
+            return Response(
+                {'error': f'El archivo es demasiado grande (máximo {max_size // (1024 * 1024)} MB)'}, 
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        
+        dataset_cache = get_dataset_cache()
+        entry = None
+        
         try:
-            # Leer contenido del archivo
-            file_content = arff_file.read().decode('utf-8')
+            # Hash del contenido sobre los bytes crudos, bloque a bloque (el mismo que calcula el navegador)
+            with stage('hash', nbytes=arff_file.size):
+                file_hash = ingest.hash_upload(arff_file)
             
-            # Crear hash único del archivo
-            file_hash = hashlib.md5(file_content.encode()).hexdigest()
-            cache_key = f'arff_full_{file_hash}'
+            # Verificar si ya está en caché o en el almacén (compartido entre workers)
+            with stage('cache'):
+                entry = dataset_cache.acquire(file_hash)
             
-            # Verificar si ya está en caché
-            cached_data = cache.get(cache_key)
+            if entry is None and settings.ARFF_ASYNC_INGEST:
+                # Parsear en el pool de procesos y responder enseguida con el trabajo
+                with stage('spool', nbytes=arff_file.size):
+                    path = ingest.spool_upload(arff_file, settings.ARFF_INGEST_SPOOL_DIR)
+                job = jobs.submit_job(path, file_hash, arff_file.name, arff_file.size)
+                logger.debug('Trabajo de ingesta %s en cola para %s', job['id'], arff_file.name)
+                return Response(
+                    job_payload(job, file_hash, arff_file.name, layout),
+                    status=status.HTTP_202_ACCEPTED
+                )
             
-            if cached_data is None:
-                print(" DEBUG - Procesando archivo (no en caché)...")
-                
-                # Parsear el archivo ARFF para extraer metadata
-                metadata = self.parse_arff_metadata(file_content)
-                
-                # Procesar los datos con manejo robusto de errores
-                data_start = file_content.find('@data')
-                if data_start == -1:
-                    # Si no es ARFF válido, intentar como CSV puro
-                    csv_content = file_content
-                    column_names = None
-                else:
-                    # Tomar solo la parte después de @data
-                    csv_content = file_content[data_start + 5:].strip()
-                    column_names = metadata.get('attributes')
-                
-                from io import StringIO
+            if entry is None:
+                logger.debug('Procesando archivo (no almacenado)...')
                 
-                # Intentar leer con diferentes configuraciones
-                df = self.robust_read_csv(csv_content, column_names)
-                
-                # Si no se pudo leer con nombres de columnas ARFF, usar genéricos
-                if df is None:
-                    print("⚠️ DEBUG - No se pudo leer con nombres ARFF, intentando con nombres genéricos...")
-                    df = self.robust_read_csv(csv_content, None)
+                try:
+                    # Lector ARFF tipado: cabecera una vez y datos por bloques; si el archivo
+                    # ya está en disco, la sección @data se parsea en paralelo por rangos
+                    with stage('parse', nbytes=arff_file.size) as s:
+                        if hasattr(arff_file, 'temporary_file_path'):
+                            header, df = read_arff_path(arff_file.temporary_file_path())
+                        else:
+                            header, df = arff_reader.read_arff_stream(ingest.open_text(arff_file))
+                        s.rows = len(df)
+                    metadata = header.to_metadata()
+                    logger.debug('Lector ARFF exitoso: %d filas, %d columnas', len(df), len(df.columns))
+                except arff_reader.InvalidRowError:
+                    # La lectura CSV tolerante descartaría o desordenaría la fila sin avisar
+                    raise
+                except arff_reader.ARFFError as e:
+                    logger.warning('Lector ARFF falló (%s), usando lectura CSV robusta...', e)
+                    with stage('decode', nbytes=arff_file.size):
+                        text = ingest.read_text(arff_file)
+                    metadata, df = self.legacy_parse(text)
                 
                 if df is None:
                     return Response(
@@ -68,52 +216,71 @@ class ARFFUploadAPI(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                # Limpiar valores NaN
-                df = self.clean_dataframe(df)
+                # Reducir cada columna al tipo más pequeño antes de guardarla
+                with stage('compact', rows=len(df)):
+                    df = compact_dataset(df, metadata)
                 
-                # Guardar en caché
-                cached_data = {
-                    'df': df,
-                    'metadata': metadata
-                }
-                cache.set(cache_key, cached_data, 3600)
-                print(f" DEBUG - DataFrame guardado en caché: {len(df)} filas")
+                # Guardar en el almacén columnar y en la caché del proceso
+                with stage('store', rows=len(df)):
+                    get_store().save(file_hash, df, metadata)
+                with stage('cache'):
+                    entry = dataset_cache.put(file_hash, df, metadata)
+                logger.debug('Dataset guardado en almacén: %d filas', len(df))
             else:
-                df = cached_data['df']
-                metadata = cached_data['metadata']
-                print(f" DEBUG - DataFrame recuperado de caché: {len(df)} filas")
+                df, metadata = entry.data, entry.metadata
+                logger.debug('Dataset recuperado de caché: %d filas', len(df))
             
-            # Convertir a diccionario limpiando valores NaN
-            data_dict = self.dataframe_to_dict(df.head(1000))
-            
-            # Retornar metadata + solo primeras 1000 filas
-            response_data = {
-                'success': True,
-                'filename': arff_file.name,
-                'columns': list(df.columns),
-                'data': data_dict,
-                'shape': {
-                    'rows': len(df),
-                    'columns': len(df.columns)
-                },
-                'description': metadata.get('description', 'Dataset procesado'),
-                'relation': metadata.get('relation', 'N/A'),
-                'cache_key': file_hash,
-                'has_more': len(df) > 1000
-            }
+            response_data = dataset_payload(df, metadata, file_hash, arff_file.name, layout)
             
-            print(f" DEBUG - Enviando respuesta: {len(df)} filas totales, {len(response_data['data'])} en respuesta inicial")
+            logger.debug(
+                'Enviando respuesta: %d filas totales, %d en respuesta inicial',
+                len(df), min(len(df), initial_page_rows(df)),
+            )
             return Response(response_data)
             
         except Exception as e:
-            print(f" DEBUG - Error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception('Error procesando la subida: %s', e)
             
             return Response(
                 {'error': f'Error procesando archivo: {str(e)}'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        finally:
+            dataset_cache.release(entry)
+    
+    def legacy_parse(self, file_content):
+        """Lectura CSV tolerante para archivos que el lector ARFF no acepta"""
+        # Parsear el archivo ARFF para extraer metadata
+        with stage('metadata'):
+            metadata = self.parse_arff_metadata(file_content)
+        
+        # Procesar los datos con manejo robusto de errores
+        data_start = file_content.find('@data')
+        if data_start == -1:
+            # Si no es ARFF válido, intentar como CSV puro
+            csv_content = file_content
+            column_names = None
+        else:
+            # Tomar solo la parte después de @data
+            csv_content = file_content[data_start + 5:].strip()
+            column_names = metadata.get('attributes')
+        
+        # Intentar leer con diferentes configuraciones
+        with stage('parse', nbytes=len(csv_content)) as s:
+            df = self.robust_read_csv(csv_content, column_names)
+            
+            # Si no se pudo leer con nombres de columnas ARFF, usar genéricos
+            if df is None:
+                logger.warning('No se pudo leer con nombres ARFF, intentando con nombres genéricos...')
+                df = self.robust_read_csv(csv_content, None)
+            s.rows = 0 if df is None else len(df)
+        
+        if df is not None:
+            # Limpiar valores NaN
+            with stage('clean', rows=len(df)):
+                df = self.clean_dataframe(df)
+        
+        return metadata, df
     
     def robust_read_csv(self, csv_content, column_names):
         """Lee CSV de manera robusta, manejando diferentes formatos"""
@@ -132,7 +299,7 @@ class ARFFUploadAPI(APIView):
         
         for i, config in enumerate(configs):
             try:
-                print(f" DEBUG - Intentando configuración {i+1}: {config}")
+                logger.debug('Intentando configuración %d: %s', i + 1, config)
                 
                 if column_names and len(column_names) > 0:
                    
@@ -147,9 +314,12 @@ class ARFFUploadAPI(APIView):
                     # Asignar nombres de columnas si coinciden
                     if len(column_names) == len(df.columns):
                         df.columns = column_names
-                        print(f" DEBUG - Configuración {i+1} exitosa con {len(df.columns)} columnas")
+                        logger.debug('Configuración %d exitosa con %d columnas', i + 1, len(df.columns))
                     else:
-                        print(f" DEBUG - Configuración {i+1}: columnas no coinciden ({len(column_names)} vs {len(df.columns)})")
+                        logger.debug(
+                            'Configuración %d: columnas no coinciden (%d vs %d)',
+                            i + 1, len(column_names), len(df.columns),
+                        )
                         # Usar nombres genéricos
                         df.columns = [f'column_{j+1}' for j in range(len(df.columns))]
                 else:
@@ -162,14 +332,14 @@ class ARFFUploadAPI(APIView):
                         on_bad_lines='skip'
                     )
                     df.columns = [f'column_{j+1}' for j in range(len(df.columns))]
-                    print(f"DEBUG - Configuración {i+1} exitosa con {len(df.columns)} columnas genéricas")
+                    logger.debug('Configuración %d exitosa con %d columnas genéricas', i + 1, len(df.columns))
                 
                 
                 if len(df) > 0:
                     return df
                     
             except Exception as e:
-                print(f"DEBUG - Configuración {i+1} falló: {str(e)}")
+                logger.debug('Configuración %d falló: %s', i + 1, e)
                 continue
         
        
@@ -178,7 +348,7 @@ class ARFFUploadAPI(APIView):
     def manual_csv_parse(self, csv_content, column_names):
         """Método manual para parsear CSV problemático"""
         try:
-            print(" DEBUG - Intentando parseo manual...")
+            logger.debug('Intentando parseo manual...')
             
             lines = csv_content.strip().split('\n')
             data = []
@@ -231,11 +401,11 @@ class ARFFUploadAPI(APIView):
             else:
                 df.columns = [f'column_{i+1}' for i in range(len(df.columns))]
             
-            print(f"DEBUG - Parseo manual exitoso: {len(df)} filas, {len(df.columns)} columnas")
+            logger.debug('Parseo manual exitoso: %d filas, %d columnas', len(df), len(df.columns))
             return df
             
         except Exception as e:
-            print(f"DEBUG - Parseo manual falló: {str(e)}")
+            logger.warning('Parseo manual falló: %s', e)
             return None
     
     def parse_arff_metadata(self, file_content):
@@ -274,55 +444,71 @@ class ARFFUploadAPI(APIView):
                         attr_name = attr_match.group(1).strip()
                         metadata['attributes'].append(attr_name)
                     else:
-                        print(f"⚠️ DEBUG - No se pudo extraer atributo de: {line}")
+                        logger.warning('No se pudo extraer atributo de: %s', line)
                 
                 # Detener cuando encontramos @data
                 elif line.lower().startswith('@data'):
                     break
             
-            print(f" DEBUG - Metadata extraída:")
-            print(f"   Relación: {metadata['relation']}")
-            print(f"   Atributos encontrados: {len(metadata['attributes'])}")
-            if metadata['attributes']:
-                print(f"   Primeros 5: {metadata['attributes'][:5]}")
+            logger.debug(
+                'Metadata extraída: relación %s, %d atributos, primeros 5: %s',
+                metadata['relation'], len(metadata['attributes']), metadata['attributes'][:5],
+            )
             
         except Exception as e:
-            print(f"⚠️ DEBUG - Error parseando metadata: {str(e)}")
+            logger.warning('Error parseando metadata: %s', e)
         
         return metadata
     
     def clean_dataframe(self, df):
-        """Limpia valores NaN del DataFrame"""
-        # Reemplazar NaN con None (que se convierte a null en JSON)
-        df_cleaned = df.replace({np.nan: None})
-        
-        # También manejar otros tipos de valores no finitos
-        df_cleaned = df_cleaned.replace({np.inf: None, -np.inf: None})
-        
-        return df_cleaned
-    
-    def dataframe_to_dict(self, df):
-        """Convierte DataFrame a diccionario manejando valores NaN"""
-        # Usar orient='records' y luego limpiar cualquier NaN residual
-        data = df.to_dict('records')
-        
-        # Limpiar cualquier valor NaN que pueda haber quedado
-        for row in data:
-            for key, value in row.items():
-                if pd.isna(value):
-                    row[key] = None
-        
-        return data
+        """Convierte los infinitos en NaN; los nulos se quedan como NaN (null en JSON)"""
+        numeric = df.select_dtypes(include='number').columns
+        if len(numeric):
+            df[numeric] = df[numeric].replace([np.inf, -np.inf], np.nan)
+        return df
 
 
+# Solo se comprimen las páginas y exportaciones: son datos del dataset, sin
+# tokens CSRF ni secretos que un atacante pueda adivinar por el tamaño (BREACH)
+@method_decorator(gzip_page, name='dispatch')
 class ARFFDataAPI(APIView):
     """Endpoint para obtener datos paginados"""
     
+    # JSON por defecto; buffers binarios por columna si el cliente los pide en Accept
+    renderer_classes = [InstrumentedJSONRenderer, ColumnBuffersRenderer]
+    
     def get(self, request):
-        cache_key_hash = request.GET.get('cache_key')
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 1000))
-        search = request.GET.get('search', '').lower()
+        cursor = request.GET.get('cursor')
+        
+        # Formato de la página: 'records' (filas, por compatibilidad) o 'columns'
+        layout = request.GET.get('layout') or RECORDS_FORMAT
+        if layout not in PAGE_FORMATS:
+            return Response(
+                {'error': f"layout debe ser uno de: {', '.join(PAGE_FORMATS)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if cursor:
+            # El cursor opaco contiene dataset, consulta, desplazamiento y tamaño de página
+            try:
+                cache_key_hash, query, start_idx, page_size = decode_cursor(cursor)
+            except InvalidCursor as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            page = start_idx // page_size + 1
+        else:
+            cache_key_hash = request.GET.get('cache_key')
+            page = int(request.GET.get('page', 1))
+            page_size = int(request.GET.get('page_size', 1000))
+            try:
+                filters = json.loads(request.GET.get('filters') or '[]')
+            except ValueError:
+                return Response({'error': 'filters debe ser JSON válido'}, status=status.HTTP_400_BAD_REQUEST)
+            query = {
+                'search': request.GET.get('search', '').lower(),
+                'filters': filters,
+                'sort': request.GET.get('sort', ''),
+            }
+            start_idx = (page - 1) * page_size
         
         if not cache_key_hash:
             return Response(
@@ -330,57 +516,574 @@ class ARFFDataAPI(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        cache_key = f'arff_full_{cache_key_hash}'
-        cached_data = cache.get(cache_key)
+        # Página inmutable: si el navegador ya la tiene no se toca el dataset
+        etag = make_page_etag(cache_key_hash, query, start_idx, page_size, [layout, request.accepted_media_type])
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            self.set_page_cache_headers(not_modified, etag)
+            return not_modified
+        
+        dataset_cache = get_dataset_cache()
+        with stage('cache'):
+            entry = dataset_cache.acquire(cache_key_hash) if is_valid_key(cache_key_hash) else None
         
-        if cached_data is None:
+        if entry is None:
+            # Aún en ingesta: servir las filas ya publicadas
+            partial = get_store().load_partial(cache_key_hash)
+            if partial is not None:
+                try:
+                    return self.partial_page(request, partial, cache_key_hash, query, start_idx, page_size, layout)
+                except OSError:
+                    # La ingesta terminó mientras se leía: el dataset ya está en el almacén
+                    entry = dataset_cache.acquire(cache_key_hash)
+        
+        if entry is None:
             return Response(
                 {'error': 'Datos no encontrados. Por favor sube el archivo nuevamente.'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        df = cached_data['df']
+        try:
+            df = entry.data
+            if isinstance(df, SparseFrame) and page_size > sparse_page_rows(df):
+                # Cada página se densifica: mismo límite de celdas que la primera página
+                page_size = sparse_page_rows(df)
+                if cursor:
+                    page = start_idx // page_size + 1
+                else:
+                    start_idx = (page - 1) * page_size
+            end_idx = start_idx + page_size
+            result_id = None
+            
+            try:
+                query = normalize_query(query, list(df.columns))
+                if query:
+                    # Los índices filtrados se calculan una vez y se reutilizan en cada página
+                    with stage('query', rows=len(df)):
+                        result = get_result_cache().get_or_create(
+                            cache_key_hash, query, lambda: query_row_ids(dataset_cache, entry, query)
+                        )
+            except QueryError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            if query:
+                result_id = result.result_id
+                total_rows = len(result)
+                page_ids = result.slice(start_idx, end_idx)
+                page_data = df.take(page_ids) if isinstance(df, SparseFrame) else df.iloc[page_ids]
+            else:
+                total_rows = len(df)
+                # En datasets dispersos solo se densifican las filas de la página
+                page_data = df.page(start_idx, end_idx) if isinstance(df, SparseFrame) else df.iloc[start_idx:end_idx]
+            
+            has_next = end_idx < total_rows
+            has_previous = start_idx > 0
+            response_data = {
+                'success': True,
+                'page': page,
+                'page_size': page_size,
+                'total_rows': total_rows,
+                'total_pages': (total_rows + page_size - 1) // page_size,
+                'has_next': has_next,
+                'has_previous': has_previous,
+                'result_id': result_id,
+                'rows_ready': len(df),
+                'complete': True,
+                'next_cursor': encode_cursor(cache_key_hash, query, end_idx, page_size) if has_next else None,
+                'previous_cursor': (
+                    encode_cursor(cache_key_hash, query, max(0, start_idx - page_size), page_size)
+                    if has_previous else None
+                ),
+            }
+            
+            if isinstance(request.accepted_renderer, ColumnBuffersRenderer):
+                # Buffers binarios por columna, sin conversión por celda
+                with stage('encode', rows=len(page_data)):
+                    chunks = encode_buffers(page_data, response_data)
+            else:
+                # Codificar la página directamente desde los buffers de cada columna
+                response_data['data'] = _encode_timed(page_data, layout)
+                response_data['layout'] = layout
+                chunks = None
+        finally:
+            dataset_cache.release(entry)
+        
+        logger.debug('Página %d: enviando filas %d-%d de %d', page, start_idx, end_idx, total_rows)
         
-        # Aplicar búsqueda si existe
-        if search:
-            mask = df.astype(str).apply(lambda x: x.str.contains(search, case=False)).any(axis=1)
-            filtered_df = df[mask]
+        if chunks is not None:
+            response = StreamingHttpResponse(chunks, content_type=COLUMN_BUFFERS_MEDIA_TYPE)
+            response['Content-Length'] = sum(len(chunk) for chunk in chunks)
         else:
-            filtered_df = df
-        
-        # Calcular paginación
-        total_rows = len(filtered_df)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
+            response = Response(response_data)
+        self.set_page_cache_headers(response, etag)
+        return response
+    
+    def partial_page(self, request, partial, cache_key_hash, query, start_idx, page_size, layout):
+        """Página de un dataset en ingesta: solo filas ya publicadas, sin consultas ni caché"""
+        try:
+            query = normalize_query(query, partial.columns)
+        except QueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        page_data = filtered_df.iloc[start_idx:end_idx]
+        if query:
+            # Búsqueda, filtros y orden necesitan el dataset completo
+            return Response(
+                {
+                    'error': 'El dataset aún se está procesando; la búsqueda estará disponible al terminar',
+                    'rows_ready': partial.rows_ready,
+                    'complete': False,
+                },
+                status=status.HTTP_409_CONFLICT
+            )
         
-        # Limpiar datos para JSON
-        data_dict = self.dataframe_to_dict(page_data)
+        end_idx = start_idx + page_size
+        with stage('partial', rows=page_size):
+            page_data = partial.rows(start_idx, end_idx)
         
+        total_rows = partial.rows_ready
+        has_previous = start_idx > 0
         response_data = {
             'success': True,
-            'data': data_dict,
-            'page': page,
+            'page': start_idx // page_size + 1,
             'page_size': page_size,
             'total_rows': total_rows,
             'total_pages': (total_rows + page_size - 1) // page_size,
-            'has_next': end_idx < total_rows,
-            'has_previous': page > 1
+            # Quedan filas por parsear: siempre puede haber una página siguiente
+            'has_next': True,
+            'has_previous': has_previous,
+            'result_id': None,
+            'rows_ready': total_rows,
+            'complete': False,
+            'next_cursor': encode_cursor(cache_key_hash, query, end_idx, page_size),
+            'previous_cursor': (
+                encode_cursor(cache_key_hash, query, max(0, start_idx - page_size), page_size)
+                if has_previous else None
+            ),
         }
         
-        print(f" DEBUG - Página {page}: enviando filas {start_idx}-{end_idx} de {total_rows}")
+        logger.debug('Página parcial: filas %d-%d de %d listas', start_idx, min(end_idx, total_rows), total_rows)
+        
+        if isinstance(request.accepted_renderer, ColumnBuffersRenderer):
+            with stage('encode', rows=len(page_data)):
+                chunks = encode_buffers(page_data, response_data)
+            response = StreamingHttpResponse(chunks, content_type=COLUMN_BUFFERS_MEDIA_TYPE)
+            response['Content-Length'] = sum(len(chunk) for chunk in chunks)
+        else:
+            response_data['data'] = _encode_timed(page_data, layout)
+            response_data['layout'] = layout
+            response = Response(response_data)
+        
+        # El total y has_next cambian mientras avanza la ingesta: ni ETag ni caché
+        patch_cache_control(response, no_store=True)
+        patch_vary_headers(response, ['Accept'])
+        return response
+    
+    def set_page_cache_headers(self, response, etag):
+        """ETag, caché larga en el navegador y Vary por la representación negociada"""
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=settings.ARFF_PAGE_CACHE_MAX_AGE, immutable=True)
+        patch_vary_headers(response, ['Accept'])
+
+
+@method_decorator(gzip_page, name='dispatch')
+class ARFFExportAPI(APIView):
+    """Descarga en streaming del dataset completo o filtrado, como NDJSON o CSV"""
+    
+    def get(self, request):
+        cache_key_hash = request.GET.get('cache_key')
+        
+        if not cache_key_hash:
+            return Response(
+                {'error': 'cache_key requerido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # 'format' lo reserva DRF para elegir renderer
+        export_format = request.GET.get('output') or NDJSON_FORMAT
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {'error': f"output debe ser uno de: {', '.join(EXPORT_CONTENT_TYPES)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start = max(0, int(request.GET.get('start', 0)))
+            filters = json.loads(request.GET.get('filters') or '[]')
+        except ValueError:
+            return Response(
+                {'error': 'start debe ser un entero y filters JSON válido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        query = {
+            'search': request.GET.get('search', '').lower(),
+            'filters': filters,
+            'sort': request.GET.get('sort', ''),
+        }
+        columns = [name for name in request.GET.get('columns', '').split(',') if name] or None
+        
+        dataset_cache = get_dataset_cache()
+        with stage('cache'):
+            entry = dataset_cache.acquire(cache_key_hash) if is_valid_key(cache_key_hash) else None
+        
+        if entry is None:
+            return Response(
+                {'error': 'Datos no encontrados. Por favor sube el archivo nuevamente.'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            df = entry.data
+            
+            unknown = [name for name in columns or [] if name not in df.columns]
+            if unknown:
+                raise QueryError(f"Columnas desconocidas: {', '.join(unknown)}")
+            
+            query = normalize_query(query, list(df.columns))
+            row_ids = None
+            if query:
+                with stage('query', rows=len(df)):
+                    row_ids = get_result_cache().get_or_create(
+                        cache_key_hash, query, lambda: query_row_ids(dataset_cache, entry, query)
+                    ).row_ids
+        except QueryError as e:
+            dataset_cache.release(entry)
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            dataset_cache.release(entry)
+            raise
+        
+        total_rows = len(df) if row_ids is None else len(row_ids)
+        logger.debug('Exportando %d filas como %s', max(0, total_rows - start), export_format)
+        
+        # Una sola petición y una sola búsqueda en caché; la entrada queda fijada hasta terminar
+        chunks = iter_export(export_format, iter_blocks(df, row_ids, columns, start))
+        response = StreamingHttpResponse(
+            ReleasingStream(chunks, lambda: dataset_cache.release(entry)),
+            content_type=EXPORT_CONTENT_TYPES[export_format],
+        )
+        response['X-Total-Rows'] = str(total_rows)
+        if export_format != NDJSON_FORMAT:
+            response['Content-Disposition'] = f'attachment; filename="{cache_key_hash[:16]}.{export_format}"'
+        return response
+
+
+class DatasetStatsAPI(APIView):
+    """Estadísticas por columna (resumen, cuantiles, histogramas y valores frecuentes)"""
+    
+    def get(self, request):
+        cache_key_hash = request.GET.get('cache_key')
+        
+        if not cache_key_hash:
+            return Response(
+                {'error': 'cache_key requerido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            bins = int(request.GET.get('bins', HISTOGRAM_BINS))
+        except ValueError:
+            bins = 0
+        if not 1 <= bins <= MAX_HISTOGRAM_BINS:
+            return Response(
+                {'error': f'bins debe ser un entero entre 1 y {MAX_HISTOGRAM_BINS}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dataset_cache = get_dataset_cache()
+        with stage('cache'):
+            entry = dataset_cache.acquire(cache_key_hash) if is_valid_key(cache_key_hash) else None
+        
+        if entry is None:
+            return Response(
+                {'error': 'Datos no encontrados. Por favor sube el archivo nuevamente.'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            # Se calcula una vez por dataset y número de bins y se guarda con la entrada
+            with stage('compute', rows=len(entry.data)):
+                summary = dataset_cache.derived(
+                    entry, f'stats:{bins}',
+                    lambda: dataset_summary(entry.data, entry.metadata, bins)
+                )
+        finally:
+            dataset_cache.release(entry)
+        
+        response = Response(dict(
+            summary, success=True, cache_key=cache_key_hash, bins=bins,
+            memory=entry.metadata.get('memory'),
+        ))
+        patch_cache_control(response, private=True, max_age=settings.ARFF_PAGE_CACHE_MAX_AGE, immutable=True)
+        return response
+
+
+class DatasetCorrelationAPI(APIView):
+    """Matriz de correlación de columnas numéricas y V de Cramér entre nominales"""
+    
+    def get(self, request):
+        cache_key_hash = request.GET.get('cache_key')
+        
+        if not cache_key_hash:
+            return Response(
+                {'error': 'cache_key requerido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        method = request.GET.get('method') or 'pearson'
+        columns = [name for name in request.GET.get('columns', '').split(',') if name] or None
+        
+        dataset_cache = get_dataset_cache()
+        with stage('cache'):
+            entry = dataset_cache.acquire(cache_key_hash) if is_valid_key(cache_key_hash) else None
+        
+        if entry is None:
+            return Response(
+                {'error': 'Datos no encontrados. Por favor sube el archivo nuevamente.'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            # Se calcula por bloques una vez por método y selección de columnas
+            with stage('compute', rows=len(entry.data)):
+                summary = dataset_cache.derived(
+                    entry, f"correlation:{method}:{','.join(columns or [])}",
+                    lambda: association_summary(entry.data, entry.metadata, method, columns)
+                )
+        except QueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            dataset_cache.release(entry)
+        
+        response = Response(dict(summary, success=True, cache_key=cache_key_hash))
+        patch_cache_control(response, private=True, max_age=settings.ARFF_PAGE_CACHE_MAX_AGE, immutable=True)
+        return response
+
+
+class DatasetPlotAPI(APIView):
+    """Datos de gráficos x/y reducidos: densidad 2D por bins o serie LTTB"""
+    
+    def get(self, request):
+        cache_key_hash = request.GET.get('cache_key')
+        x_name = request.GET.get('x')
+        y_name = request.GET.get('y')
+        
+        if not cache_key_hash or not x_name or not y_name:
+            return Response(
+                {'error': 'cache_key, x e y son requeridos'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        mode = request.GET.get('mode') or 'bins'
+        color_name = request.GET.get('color') or None
+        
+        # Resolución: bins por eje (densidad) o puntos por serie (LTTB)
+        if mode == 'lttb':
+            param, default, maximum = 'points', DEFAULT_POINTS, MAX_POINTS
+        else:
+            param, default, maximum = 'bins', DEFAULT_BINS, MAX_BINS
+        try:
+            resolution = int(request.GET.get(param, default))
+        except ValueError:
+            resolution = 0
+        if not 1 <= resolution <= maximum:
+            return Response(
+                {'error': f'{param} debe ser un entero entre 1 y {maximum}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dataset_cache = get_dataset_cache()
+        with stage('cache'):
+            entry = dataset_cache.acquire(cache_key_hash) if is_valid_key(cache_key_hash) else None
+        
+        if entry is None:
+            return Response(
+                {'error': 'Datos no encontrados. Por favor sube el archivo nuevamente.'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        df = entry.data
+        
+        def build():
+            order = None
+            if mode == 'lttb' and x_name in df.columns:
+                # Misma permutación por x que usa la ordenación de /api/data/
+                order = dataset_cache.derived(
+                    entry, f'sort:{x_name}',
+                    lambda: sort_permutation(df, [(x_name, False)], entry.metadata)
+                )
+            return plot_data(df, entry.metadata, x_name, y_name, mode, resolution, color_name, order)
+        
+        try:
+            # Cacheado por (dataset, columnas, modo, resolución)
+            with stage('compute', rows=len(df)):
+                result = dataset_cache.derived(
+                    entry, f'plot:{mode}:{x_name}:{y_name}:{color_name or ""}:{resolution}', build
+                )
+        except QueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            dataset_cache.release(entry)
+        
+        response = Response(dict(result, success=True, cache_key=cache_key_hash))
+        patch_cache_control(response, private=True, max_age=settings.ARFF_PAGE_CACHE_MAX_AGE, immutable=True)
+        return response
+
+
+class DatasetLookupAPI(APIView):
+    """
+    Consulta por hash de contenido (ingest.BlockHasher) si el servidor ya
+    tiene un dataset, para que el cliente no tenga que volver a subirlo.
+    HEAD solo comprueba su existencia; GET devuelve la misma respuesta que
+    la subida, o 202 con el trabajo si aún se está procesando.
+    """
+    
+    def get(self, request, dataset_hash):
+        dataset_hash = dataset_hash.lower()
+        
+        if not is_valid_key(dataset_hash):
+            return Response(
+                {'error': 'Hash de dataset inválido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        layout = request.GET.get('layout') or RECORDS_FORMAT
+        if layout not in PAGE_FORMATS:
+            return Response(
+                {'error': f"layout debe ser uno de: {', '.join(PAGE_FORMATS)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dataset_cache = get_dataset_cache()
+        
+        if request.method == 'HEAD':
+            # Sin cargar el dataset: basta con que esté en caché o en el almacén
+            if dataset_hash in dataset_cache or get_store().exists(dataset_hash):
+                return Response(status=status.HTTP_200_OK)
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        
+        with stage('cache'):
+            entry = dataset_cache.acquire(dataset_hash)
+        
+        if entry is None:
+            job = jobs.get_job_store().find_active(dataset_hash)
+            if job is not None:
+                return Response(
+                    job_payload(job, dataset_hash, job['filename'], layout),
+                    status=status.HTTP_202_ACCEPTED
+                )
+            return Response(
+                {'error': 'Dataset no encontrado'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            filename = request.GET.get('filename') or dataset_hash
+            response_data = dataset_payload(entry.data, entry.metadata, dataset_hash, filename, layout)
+        finally:
+            dataset_cache.release(entry)
+        
+        logger.debug('Dataset %s encontrado por hash, subida omitida', dataset_hash[:12])
         return Response(response_data)
+
+
+class JobStatusAPI(APIView):
+    """Estado y progreso de un trabajo de ingesta; al terminar incluye la primera página"""
     
-    def dataframe_to_dict(self, df):
-        """Convierte DataFrame a diccionario manejando valores NaN"""
-        # Usar orient='records' y luego limpiar cualquier NaN residual
-        data = df.to_dict('records')
-        
-        # Limpiar cualquier valor NaN que pueda haber quedado
-        for row in data:
-            for key, value in row.items():
-                if pd.isna(value):
-                    row[key] = None
-        
-        return data
\ No newline at end of file
+    def get(self, request, job_id):
+        job = jobs.get_job_store().get(job_id)
+        
+        if job is None:
+            return Response(
+                {'error': 'Trabajo no encontrado'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        layout = request.GET.get('layout') or RECORDS_FORMAT
+        if layout not in PAGE_FORMATS:
+            return Response(
+                {'error': f"layout debe ser uno de: {', '.join(PAGE_FORMATS)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        response_data = {
+            'success': job['status'] != jobs.STATUS_ERROR,
+            'job_id': job['id'],
+            'status': job['status'],
+            'stage': job['stage'],
+            'cache_key': job['cache_key'],
+            'filename': job['filename'],
+            'bytes_total': job['bytes_total'],
+            'bytes_read': job['bytes_read'],
+            'rows': job['rows'],
+            'progress': jobs.job_progress(job),
+            'error': job['error'],
+            'rows_ready': 0,
+        }
+        
+        if job['status'] in (jobs.STATUS_QUEUED, jobs.STATUS_RUNNING):
+            # Filas ya publicadas que /api/data/ puede servir
+            partial = get_store().load_partial(job['cache_key'])
+            if partial is not None:
+                response_data['rows_ready'] = partial.rows_ready
+        
+        if job['status'] == jobs.STATUS_DONE:
+            dataset_cache = get_dataset_cache()
+            with stage('cache'):
+                entry = dataset_cache.acquire(job['cache_key'])
+            
+            if entry is None:
+                return Response(
+                    {'error': 'Datos no encontrados. Por favor sube el archivo nuevamente.'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            try:
+                response_data['result'] = dataset_payload(
+                    entry.data, entry.metadata, job['cache_key'], job['filename'], layout
+                )
+                response_data['rows_ready'] = len(entry.data)
+            finally:
+                dataset_cache.release(entry)
+        
+        response = Response(response_data)
+        # El estado cambia en cada consulta
+        patch_cache_control(response, no_store=True)
+        return response
+
+
+class DatasetCacheStatsAPI(APIView):
+    """Endpoint con los contadores de la caché de datasets del proceso"""
+    
+    def get(self, request):
+        stats = get_dataset_cache().stats()
+        stats['result_sets'] = get_result_cache().stats()
+        return Response(stats)
+
+
+class MetricsAPI(APIView):
+    """Métricas del proceso en formato de texto de Prometheus"""
+    
+    def get(self, request):
+        if not is_enabled():
+            return Response(
+                {'error': 'Métricas desactivadas'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Valores instantáneos de las cachés del proceso junto a los histogramas
+        cache_stats = get_dataset_cache().stats()
+        result_stats = get_result_cache().stats()
+        gauges = [
+            ('arff_dataset_cache_hits_total', 'Aciertos de la caché de datasets.', 'counter', cache_stats['hits']),
+            ('arff_dataset_cache_misses_total', 'Fallos de la caché de datasets.', 'counter', cache_stats['misses']),
+            ('arff_dataset_cache_loads_total', 'Datasets cargados desde el almacén.', 'counter', cache_stats['loads']),
+            ('arff_dataset_cache_evictions_total', 'Datasets desalojados de la caché.', 'counter', cache_stats['evictions']),
+            ('arff_dataset_cache_entries', 'Datasets residentes en la caché.', 'gauge', cache_stats['entries']),
+            ('arff_dataset_cache_resident_bytes', 'Bytes residentes en la caché de datasets.', 'gauge', cache_stats['resident_bytes']),
+            ('arff_dataset_cache_max_bytes', 'Presupuesto de la caché de datasets.', 'gauge', cache_stats['max_bytes']),
+            ('arff_result_cache_hits_total', 'Aciertos de la caché de resultados filtrados.', 'counter', result_stats['hits']),
+            ('arff_result_cache_misses_total', 'Fallos de la caché de resultados filtrados.', 'counter', result_stats['misses']),
+            ('arff_result_cache_resident_bytes', 'Bytes de la caché de resultados filtrados.', 'gauge', result_stats['resident_bytes']),
+        ]
+        return HttpResponse(get_registry().render(gauges), content_type=PROMETHEUS_CONTENT_TYPE)
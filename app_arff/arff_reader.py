@@ -0,0 +1,710 @@
+"""
+Lector ARFF tipado.
+
+Lee las declaraciones @attribute una sola vez y parsea la sección @data en
+una sola pasada (motor C de pandas) directamente a columnas tipadas:
+numéricas como float64/Int64, nominales como categóricas, fechas como
+datetime64 y '?' como valor faltante.
+"""
+import io
+import logging
+import re
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_TYPE = 'numeric'
+NUMERIC_ALIASES = ('numeric', 'real')
+INTEGER_TYPE = 'integer'
+NOMINAL_TYPE = 'nominal'
+STRING_TYPE = 'string'
+DATE_TYPE = 'date'
+
+MISSING_VALUE = '?'
+
+# Tamaño de la muestra usada para detectar el carácter de comillas
+QUOTE_SAMPLE_SIZE = 64 * 1024
+
+# Filas parseadas por bloque; cada bloque se convierte a arrays tipados
+PARSE_CHUNK_ROWS = 50000
+
+# Equivalencias entre el formato SimpleDateFormat de Java (ARFF) y strftime
+JAVA_DATE_TOKENS = [
+    ('yyyy', '%Y'),
+    ('yy', '%y'),
+    ('MM', '%m'),
+    ('dd', '%d'),
+    ('HH', '%H'),
+    ('mm', '%M'),
+    ('ss', '%S'),
+    ('SSS', '%f'),
+    ('Z', '%z'),
+]
+
+
+class ARFFError(ValueError):
+    """Error de formato en un archivo ARFF"""
+
+
+class InvalidRowError(ARFFError):
+    """
+    Fila de datos mal formada. A diferencia de otros ARFFError no se recurre
+    a la lectura CSV tolerante, que descartaría o desordenaría la fila.
+    """
+
+
+class BadLineError(InvalidRowError):
+    """
+    Fila de datos con más valores que atributos. `line` es la línea del
+    archivo; un valor entre comillas con saltos de línea cuenta como una.
+    """
+
+    def __init__(self, line, expected, seen):
+        self.line = line
+        self.expected = expected
+        self.seen = seen
+        super().__init__(f'Línea {line}: se esperaban {expected} valores y hay {seen}')
+
+    def __reduce__(self):
+        return type(self), (self.line, self.expected, self.seen)
+
+
+Attribute = namedtuple('Attribute', ['name', 'type', 'values', 'date_format'])
+
+
+class ARFFHeader:
+    """Cabecera de un archivo ARFF: relación y atributos declarados"""
+
+    def __init__(self, relation='N/A', attributes=None, data_line=1):
+        self.relation = relation
+        self.attributes = attributes or []
+        # Línea del archivo donde empieza la sección de datos
+        self.data_line = data_line
+
+    @property
+    def names(self):
+        return [attr.name for attr in self.attributes]
+
+    def to_metadata(self):
+        """Convierte la cabecera al diccionario de metadata que usan las vistas"""
+        return {
+            'relation': self.relation,
+            'attributes': self.names,
+            'attribute_types': [
+                {'name': attr.name, 'type': attr.type, 'values': attr.values}
+                for attr in self.attributes
+            ],
+            'description': 'Dataset ARFF',
+        }
+
+
+def split_quoted(text, sep=','):
+    """Divide un texto por `sep` respetando comillas simples/dobles y escapes"""
+    fields = []
+    current = []
+    quote = None
+    escaped = False
+
+    for char in text:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif quote:
+            if char == quote:
+                quote = None
+            else:
+                current.append(char)
+        elif char in ('"', "'"):
+            quote = char
+        elif char == sep:
+            fields.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+
+    fields.append(''.join(current).strip())
+    return fields
+
+
+def _read_token(text):
+    """Devuelve el primer token (posiblemente entre comillas) y el resto del texto"""
+    text = text.lstrip()
+    if not text:
+        return '', ''
+
+    if text[0] in ('"', "'"):
+        quote = text[0]
+        i = 1
+        token = []
+        while i < len(text):
+            char = text[i]
+            if char == '\\' and i + 1 < len(text):
+                token.append(text[i + 1])
+                i += 2
+                continue
+            if char == quote:
+                return ''.join(token), text[i + 1:]
+            token.append(char)
+            i += 1
+        raise ARFFError(f'Comillas sin cerrar en: {text}')
+
+    match = re.match(r'[^\s{]+', text)
+    if not match:
+        return '', text
+    return match.group(0), text[match.end():]
+
+
+def parse_attribute(line):
+    """Parsea una línea @attribute y devuelve un Attribute"""
+    rest = line.strip()[len('@attribute'):]
+    name, rest = _read_token(rest)
+    rest = rest.strip()
+
+    if not name or not rest:
+        raise ARFFError(f'Declaración de atributo inválida: {line.strip()}')
+
+    if rest.startswith('{'):
+        end = rest.rfind('}')
+        if end == -1:
+            raise ARFFError(f'Atributo nominal sin cerrar: {line.strip()}')
+        values = [value for value in split_quoted(rest[1:end]) if value != '']
+        return Attribute(name, NOMINAL_TYPE, values, None)
+
+    type_name, type_rest = _read_token(rest)
+    type_name = type_name.lower()
+
+    if type_name in NUMERIC_ALIASES:
+        return Attribute(name, NUMERIC_TYPE, None, None)
+    if type_name == INTEGER_TYPE:
+        return Attribute(name, INTEGER_TYPE, None, None)
+    if type_name == DATE_TYPE:
+        date_format, _ = _read_token(type_rest)
+        return Attribute(name, DATE_TYPE, None, date_format or None)
+
+    # string, relational y tipos desconocidos se tratan como texto
+    return Attribute(name, STRING_TYPE, None, None)
+
+
+def parse_header(lines):
+    """
+    Consume líneas hasta encontrar @data y devuelve la cabecera.
+
+    `lines` puede ser cualquier iterable de líneas; al volver, el iterador
+    queda posicionado justo después de la línea @data.
+    """
+    header = ARFFHeader()
+
+    for number, raw_line in enumerate(lines, 1):
+        line = raw_line.strip()
+
+        if not line or line.startswith('%'):
+            continue
+
+        lowered = line.lower()
+        if lowered.startswith('@relation'):
+            relation, _ = _read_token(line[len('@relation'):])
+            header.relation = relation or 'N/A'
+        elif lowered.startswith('@attribute'):
+            header.attributes.append(parse_attribute(line))
+        elif lowered.startswith('@data'):
+            if not header.attributes:
+                raise ARFFError('El archivo no declara atributos')
+            header.data_line = number + 1
+            return header
+
+    raise ARFFError('No se encontró la sección @data')
+
+
+# Comilla al principio de un valor (inicio de línea o tras una coma)
+QUOTE_OPENER = re.compile(r'(?:^|,)[ \t]*(["\'])', re.MULTILINE)
+
+
+def detect_quotechar(sample):
+    """
+    Elige el carácter de comillas usado en la sección de datos según las
+    comillas que abren valores (un apóstrofo dentro de "O'Brien" no cuenta).
+    Devuelve None si la muestra mezcla valores entre comillas simples y dobles.
+    """
+    openers = set(QUOTE_OPENER.findall(sample))
+    if len(openers) > 1:
+        return None
+    if openers == {'"'}:
+        return '"'
+    return "'"
+
+
+def _requote_rows(lines):
+    """
+    Reescribe las filas de datos con comillas dobles en los valores que iban
+    entre comillas simples o dobles (como split_quoted, valor a valor), para
+    parsear con un único quotechar los archivos que mezclan ambas.
+    """
+    fields = []
+    current = []
+    quoted = False
+    quote = None
+    escaped = False
+
+    def field():
+        value = ''.join(current).strip()
+        if quoted:
+            return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        return value
+
+    for line in lines:
+        if quote is None and not fields and not current:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('%'):
+                # Línea vacía en lugar de omitirla, para conservar la numeración
+                yield '\n'
+                continue
+
+        for char in line:
+            if escaped:
+                current.append(char)
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif quote:
+                if char == quote:
+                    quote = None
+                else:
+                    current.append(char)
+            elif char in ('"', "'"):
+                quote = char
+                quoted = True
+            elif char == ',':
+                fields.append(field())
+                current = []
+                quoted = False
+            elif char == '\n':
+                fields.append(field())
+                yield ','.join(fields) + '\n'
+                fields = []
+                current = []
+                quoted = False
+            else:
+                current.append(char)
+
+    if fields or current:
+        fields.append(field())
+        yield ','.join(fields) + '\n'
+
+
+# Línea de comentario: % como primer carácter no blanco
+COMMENT_LINE = re.compile(r'^[ \t]*%[^\n]*', re.MULTILINE)
+
+# Bytes leídos del flujo original en cada lectura de _CommentFilter
+COMMENT_FILTER_READ_SIZE = 256 * 1024
+
+
+def blank_comment_lines(text):
+    """Vacía las líneas de comentario de un texto de líneas completas (conserva la numeración)"""
+    if '%' not in text:
+        return text
+    return COMMENT_LINE.sub('', text)
+
+
+class _CommentFilter:
+    """
+    Flujo de texto que vacía las líneas de comentario (%) antes del parser.
+    Un % en medio de una línea es parte del valor, como en el lector original.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer = ''
+        # Línea incompleta al final de la última lectura
+        self._pending = ''
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._buffer + blank_comment_lines(self._pending + self._stream.read())
+            self._buffer = self._pending = ''
+            return data
+
+        while len(self._buffer) < size:
+            chunk = self._stream.read(max(size, COMMENT_FILTER_READ_SIZE))
+            if not chunk:
+                self._buffer += blank_comment_lines(self._pending)
+                self._pending = ''
+                break
+            text = self._pending + chunk
+            cut = text.rfind('\n') + 1
+            self._pending = text[cut:]
+            self._buffer += blank_comment_lines(text[:cut])
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def __iter__(self):
+        for line in self._stream:
+            yield blank_comment_lines(line)
+
+
+class _LineStream:
+    """Flujo de texto con read() sobre un iterador de líneas"""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ''
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data, self._buffer = self._buffer + ''.join(self._lines), ''
+            return data
+
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            parts.append(line)
+            length += len(line)
+
+        data = ''.join(parts)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def java_to_strftime(date_format):
+    """Convierte un formato de fecha SimpleDateFormat de Java a strftime"""
+    result = []
+    i = 0
+    while i < len(date_format):
+        char = date_format[i]
+        if char == "'":
+            end = date_format.find("'", i + 1)
+            if end == -1:
+                end = len(date_format)
+            result.append(date_format[i + 1:end])
+            i = end + 1
+            continue
+        for java_token, py_token in JAVA_DATE_TOKENS:
+            if date_format.startswith(java_token, i):
+                result.append(py_token)
+                i += len(java_token)
+                break
+        else:
+            result.append(char.replace('%', '%%'))
+            i += 1
+    return ''.join(result)
+
+
+def _column_dtypes(header):
+    """Tipos de pandas usados al leer cada atributo"""
+    dtypes = {}
+    for attr in header.attributes:
+        if attr.type == NUMERIC_TYPE:
+            dtypes[attr.name] = 'float64'
+        elif attr.type == INTEGER_TYPE:
+            dtypes[attr.name] = 'Int64'
+        elif attr.type == NOMINAL_TYPE:
+            dtypes[attr.name] = 'category'
+        else:
+            dtypes[attr.name] = object
+    return dtypes
+
+
+def _rstrip_categories(column):
+    """
+    Quita los espacios finales de las categorías (skipinitialspace solo
+    quita los iniciales: 'c ,2' daría una categoría 'c ' junto a 'c').
+    """
+    categories = column.cat.categories
+    if categories.dtype != object or not len(categories):
+        return column
+
+    stripped = categories.str.rstrip()
+    if stripped.equals(categories):
+        return column
+
+    uniques = pd.Index(stripped.unique())
+    mapping = uniques.get_indexer(stripped)
+    codes = column.cat.codes.to_numpy()
+    codes = np.where(codes < 0, -1, mapping[codes])
+    return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=column.index)
+
+
+def _parse_dates(column, date_format, utc):
+    """
+    Convierte el texto de un bloque a datetime64[ns]. Sin desplazamientos
+    horarios las fechas quedan sin zona; si aparece alguno (o `utc` ya es
+    True por un bloque anterior) se pasan todas a UTC. Devuelve (valores
+    datetime64[ns] en UTC o sin zona, utc).
+    """
+    if not utc:
+        try:
+            with warnings.catch_warnings():
+                # pandas avisa (y en el futuro fallará) con desplazamientos mezclados
+                warnings.simplefilter('ignore', FutureWarning)
+                parsed = pd.to_datetime(column, format=date_format, errors='coerce')
+            if parsed.dtype.kind == 'M' and not isinstance(parsed.dtype, pd.DatetimeTZDtype):
+                return parsed.to_numpy(), False
+        except ValueError:
+            pass
+
+    if date_format == 'ISO8601':
+        # Con utc=True, 'ISO8601' aplica a las fechas sin zona el desplazamiento
+        # de la anterior; 'mixed' las interpreta como UTC
+        date_format = 'mixed'
+    parsed = pd.to_datetime(column, format=date_format, errors='coerce', utc=True)
+    return parsed.dt.tz_localize(None).to_numpy(), True
+
+
+def align_timezones(parts):
+    """
+    Si algún bloque de fechas tiene zona horaria (UTC), interpreta como UTC
+    los bloques sin zona, para concatenarlos sin acabar en objetos.
+    """
+    if not any(isinstance(part.dtype, pd.DatetimeTZDtype) for part in parts):
+        return parts
+    return [
+        part.dt.tz_localize('UTC') if part.dtype.kind == 'M' and part.dt.tz is None else part
+        for part in parts
+    ]
+
+
+class _ColumnAccumulator:
+    """
+    Convierte cada bloque parseado en arrays tipados por columna y los
+    concatena al final, de modo que en memoria solo conviven los arrays
+    finales y un bloque de texto.
+    """
+
+    def __init__(self, header):
+        self.header = header
+        self.parts = {attr.name: [] for attr in header.attributes}
+        # Categorías nominales: las declaradas más las encontradas en los datos
+        self.categories = {}
+        self.known = {}
+        for attr in header.attributes:
+            if attr.type == NOMINAL_TYPE:
+                self.categories[attr.name] = list(attr.values)
+                self.known[attr.name] = set(attr.values)
+        # Columnas de fecha con desplazamientos horarios: se guardan en UTC
+        self.utc_dates = set()
+
+    def add(self, chunk):
+        for attr in self.header.attributes:
+            column = chunk[attr.name]
+
+            if attr.type == NOMINAL_TYPE:
+                column = _rstrip_categories(column)
+                categories = self.categories[attr.name]
+                known = self.known[attr.name]
+                extra = [value for value in column.cat.categories if value not in known]
+                if extra:
+                    logger.warning("Valores no declarados en '%s': %s", attr.name, extra[:5])
+                    categories.extend(extra)
+                    known.update(extra)
+                values = column.cat.set_categories(categories).cat.codes.to_numpy()
+
+            elif attr.type == DATE_TYPE:
+                column = column.str.rstrip()
+                if attr.date_format:
+                    date_format = java_to_strftime(attr.date_format)
+                else:
+                    date_format = 'ISO8601'
+                values, utc = _parse_dates(column, date_format, attr.name in self.utc_dates)
+                if utc:
+                    self.utc_dates.add(attr.name)
+
+            elif attr.type == NUMERIC_TYPE:
+                values = column.to_numpy(dtype=np.float64, copy=True)
+                values[np.isinf(values)] = np.nan
+
+            elif attr.type == INTEGER_TYPE:
+                values = column.array
+
+            else:
+                values = column.str.rstrip().to_numpy(dtype=object)
+
+            self.parts[attr.name].append(values)
+
+    def last_block(self):
+        """DataFrame tipado con las filas del último bloque añadido"""
+        columns = {}
+        for attr in self.header.attributes:
+            values = self.parts[attr.name][-1]
+            if attr.type == NOMINAL_TYPE:
+                values = pd.Categorical.from_codes(values, categories=self.categories[attr.name])
+            elif attr.name in self.utc_dates:
+                values = pd.DatetimeIndex(values).tz_localize('UTC').array
+            columns[attr.name] = values
+        return pd.DataFrame(columns, copy=False)
+
+    def build(self):
+        columns = {}
+        for attr in self.header.attributes:
+            parts = self.parts.pop(attr.name)
+
+            if attr.type == INTEGER_TYPE:
+                if parts:
+                    values = type(parts[0])._concat_same_type(parts)
+                else:
+                    values = pd.array([], dtype='Int64')
+            elif parts:
+                values = np.concatenate(parts)
+            else:
+                values = np.empty(0, dtype=object)
+            del parts
+
+            if attr.type == NOMINAL_TYPE:
+                codes = values if values.size else np.empty(0, dtype=np.int8)
+                values = pd.Categorical.from_codes(codes, categories=self.categories[attr.name])
+            elif attr.type == NUMERIC_TYPE and not values.size:
+                values = values.astype(np.float64)
+            elif attr.name in self.utc_dates:
+                # Los bloques anteriores al primer desplazamiento se toman como UTC
+                values = pd.DatetimeIndex(values).tz_localize('UTC').array
+
+            columns[attr.name] = values
+
+        # copy=False evita consolidar las columnas en un único bloque (otra copia)
+        return pd.DataFrame(columns, copy=False)
+
+
+# Mensaje del parser C de pandas para una fila con valores de más
+BAD_LINE_MESSAGE = re.compile(r'Expected (\d+) fields in line (\d+), saw (\d+)')
+
+
+def read_data(buffer, header, quotechar="'", progress=None, max_rows=None, on_block=None, first_line=None):
+    """
+    Parsea la sección @data desde `buffer` (objeto de texto tipo archivo)
+    en un DataFrame tipado, en una sola pasada y por bloques de filas.
+    `progress(filas)` se llama después de cada bloque y `on_block(df)` con
+    las filas tipadas de cada bloque. `max_rows` limita las filas leídas.
+    Con quotechar=None (comillas simples y dobles mezcladas) las filas se
+    normalizan antes con _requote_rows, más lento.
+
+    Una fila con más valores que atributos lanza BadLineError con su número
+    de línea (`first_line` es la línea del archivo donde empieza `buffer`,
+    por defecto header.data_line); las filas con menos valores se completan
+    con nulos.
+    """
+    accumulator = _ColumnAccumulator(header)
+    rows = 0
+    first_line = header.data_line if first_line is None else first_line
+
+    buffer = _CommentFilter(buffer)
+    if quotechar is None:
+        buffer = _LineStream(_requote_rows(buffer))
+        quotechar = '"'
+
+    try:
+        reader = pd.read_csv(
+            buffer,
+            header=None,
+            names=header.names,
+            dtype=_column_dtypes(header),
+            sep=',',
+            quotechar=quotechar,
+            escapechar='\\',
+            na_values=[MISSING_VALUE, ''],
+            keep_default_na=False,
+            skipinitialspace=True,
+            skip_blank_lines=True,
+            on_bad_lines='error',
+            engine='c',
+            chunksize=PARSE_CHUNK_ROWS,
+            nrows=max_rows,
+        )
+        for chunk in reader:
+            accumulator.add(chunk)
+            rows += len(chunk)
+            del chunk
+            if on_block is not None:
+                on_block(accumulator.last_block())
+            if progress is not None:
+                progress(rows)
+    except pd.errors.ParserError as e:
+        match = BAD_LINE_MESSAGE.search(str(e))
+        if match is None:
+            raise ARFFError(f'No se pudo parsear la sección @data: {e}') from e
+        expected, line, seen = (int(group) for group in match.groups())
+        raise BadLineError(first_line + line - 1, expected, seen) from e
+    except (ValueError, TypeError) as e:
+        raise ARFFError(f'No se pudo parsear la sección @data: {e}') from e
+
+    return accumulator.build()
+
+
+def is_sparse_sample(sample):
+    """Indica si la primera fila de datos de la muestra está en formato disperso"""
+    for line in sample.splitlines():
+        line = line.strip()
+        if line and not line.startswith('%'):
+            return line.startswith('{')
+    return False
+
+
+class _PrefixedStream:
+    """Flujo de texto que entrega primero una muestra ya leída y luego el resto"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size=-1):
+        if not self._prefix:
+            return self._stream.read(size)
+        if size is None or size < 0:
+            data, self._prefix = self._prefix + self._stream.read(), ''
+            return data
+        data, self._prefix = self._prefix[:size], self._prefix[size:]
+        return data
+
+    def __iter__(self):
+        if self._prefix:
+            yield from io.StringIO(self._prefix)
+            self._prefix = ''
+        yield from iter(self._stream.readline, '')
+
+
+def read_arff_stream(stream, progress=None, max_rows=None, on_block=None):
+    """
+    Lee un ARFF desde un objeto de texto tipo archivo y devuelve (cabecera, datos).
+
+    El flujo se consume de forma incremental: la cabecera línea a línea hasta
+    @data y los datos por bloques, sin cargar el archivo completo en memoria.
+    Los datos son un DataFrame tipado, o un SparseFrame si el archivo usa el
+    formato disperso. `progress(filas)` informa de las filas parseadas y
+    `max_rows` limita las filas leídas; `on_block(df)` recibe cada bloque
+    tipado (solo en formato denso).
+    """
+    header = parse_header(iter(stream.readline, ''))
+
+    # Muestra de líneas completas para detectar el formato y las comillas
+    sample_lines = []
+    sample_size = 0
+    while sample_size < QUOTE_SAMPLE_SIZE:
+        line = stream.readline()
+        if not line:
+            break
+        sample_lines.append(line)
+        sample_size += len(line)
+    sample = ''.join(sample_lines)
+    data = _PrefixedStream(sample, stream)
+
+    if is_sparse_sample(sample):
+        from .sparse import read_sparse_data
+        return header, read_sparse_data(data, header, progress, max_rows=max_rows)
+
+    df = read_data(
+        data, header, quotechar=detect_quotechar(sample), progress=progress, max_rows=max_rows, on_block=on_block
+    )
+    return header, df
+
+
+def read_arff(text):
+    """Lee un archivo ARFF completo (str) y devuelve (cabecera, datos)"""
+    return read_arff_stream(io.StringIO(text))
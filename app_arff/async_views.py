@@ -0,0 +1,103 @@
+"""
+Variantes asíncronas de /api/upload/, /api/data/ y /api/export/ para el
+punto de entrada ASGI (visualizacion/asgi.py, p. ej. con uvicorn).
+
+Las vistas DRF son síncronas: servidas por ASGI, Django las ejecuta en un
+hilo por petición sin límite y consume entero el contenido de un
+StreamingHttpResponse síncrono antes de enviarlo. Aquí cada vista DRF se
+ejecuta en un pool de hilos acotado (settings.ARFF_ASYNC_CPU_WORKERS), de
+modo que el bucle de eventos sigue atendiendo a los demás clientes mientras
+se parsea o se filtra, y las respuestas en streaming se convierten en
+iteradores asíncronos: cada bloque se produce en el pool solo cuando el
+anterior se ha enviado, así que un cliente lento no acumula la exportación
+en memoria.
+
+Es un pool de hilos y no de procesos porque las consultas trabajan sobre la
+caché de datasets del proceso; el parseo pesado de las subidas ya va a los
+procesos de jobs.py.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .api_views import ARFFDataAPI, ARFFExportAPI, ARFFUploadAPI
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_DONE = object()
+
+
+def get_executor():
+    """Pool de hilos acotado para el trabajo bloqueante de las vistas asíncronas"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ARFF_ASYNC_CPU_WORKERS,
+                thread_name_prefix='arff-async',
+            )
+        return _executor
+
+
+async def offload(func, *args):
+    """
+    Ejecuta func(*args) en el pool sin bloquear el bucle de eventos. El
+    contexto se copia para que las etapas medidas (instrumentation.stage)
+    se sumen a la petición en curso.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args))
+
+
+class AsyncStream:
+    """Iterador asíncrono sobre bloques síncronos, producidos de uno en uno en el pool"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await offload(next, self._chunks, _DONE)
+        if chunk is _DONE:
+            raise StopAsyncIteration
+        return chunk
+
+
+def async_variant(view_class):
+    """Vista asíncrona que ejecuta la vista DRF `view_class` en el pool acotado"""
+    sync_view = view_class.as_view()
+
+    def call(request, args, kwargs):
+        response = sync_view(request, *args, **kwargs)
+        # Renderizar el JSON también fuera del bucle de eventos
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+        return response
+
+    async def view(request, *args, **kwargs):
+        response = await offload(call, request, args, kwargs)
+        if response.streaming and not response.is_async:
+            # El cierre del contenido original (p. ej. liberar la entrada de
+            # la caché en la exportación) ya está registrado en la respuesta
+            response.streaming_content = AsyncStream(response.streaming_content)
+        return response
+
+    # csrf_exempt de Django 4.2 envolvería la corrutina en una función síncrona
+    view.csrf_exempt = True
+    view.view_class = view_class
+    view.__doc__ = view_class.__doc__
+    return view
+
+
+upload = async_variant(ARFFUploadAPI)
+data = async_variant(ARFFDataAPI)
+export = async_variant(ARFFExportAPI)
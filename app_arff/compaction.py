@@ -0,0 +1,171 @@
+"""
+Compactación de tipos de un DataFrame después del parseo.
+
+Las lecturas CSV de respaldo (manual_csv_parse, read_csv sin tipos) dejan
+columnas object con números como texto y None para los nulos. Antes de
+guardar el dataset cada columna se reduce al tipo más pequeño que conserva
+sus valores:
+
+- texto numérico a números, solo en columnas declaradas numéricas o sin
+  tipo declarado (lectura de respaldo): un atributo string como '00123'
+  se conserva tal cual;
+- enteros a int8/16/32 (Int8/16/32 con máscara si hay nulos), incluidos
+  los flotantes que solo contienen enteros si el atributo es integer o no
+  tiene tipo declarado: un atributo real/numeric sigue siendo flotante;
+- flotantes a float32 cuando la conversión no pierde precisión;
+- texto con pocos valores distintos a categórica.
+
+Los nulos quedan como NaN o como máscara de nulos, nunca como objetos None.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .arff_reader import INTEGER_TYPE, MISSING_VALUE, NUMERIC_ALIASES, NUMERIC_TYPE
+from .sparse import SparseFrame
+
+
+logger = logging.getLogger(__name__)
+
+# El texto pasa a categórica si distintos / no nulos no supera esta fracción
+CATEGORY_MAX_RATIO = 0.5
+
+INTEGER_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+
+# Textos que las lecturas de respaldo dejan en lugar de un nulo
+MISSING_TOKENS = (MISSING_VALUE, '')
+
+# Tipos ARFF declarados cuyo texto puede convertirse a números
+NUMERIC_DECLARED_TYPES = (NUMERIC_TYPE, INTEGER_TYPE) + NUMERIC_ALIASES
+
+
+def _smallest_integer(low, high):
+    for dtype in INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return None
+
+
+def _compact_integers(values, mask=None):
+    """Enteros (array int64 con máscara opcional) en el tipo más pequeño"""
+    present = values if mask is None else values[~mask]
+    if present.size:
+        dtype = _smallest_integer(present.min(), present.max())
+    else:
+        dtype = np.int8
+
+    if mask is None or not mask.any():
+        return values.astype(dtype, copy=False)
+    return pd.arrays.IntegerArray(values.astype(dtype), mask)
+
+
+def _compact_floats(values, to_integers=True):
+    """
+    Flotantes: a enteros si todos lo son y `to_integers`, si no a float32
+    cuando es exacto
+    """
+    mask = np.isnan(values)
+    finite = values[~mask]
+
+    if to_integers and finite.size and np.isfinite(finite).all() and (finite == np.round(finite)).all():
+        low, high = finite.min(), finite.max()
+        if _smallest_integer(low, high) not in (None, np.int64):
+            return _compact_integers(np.where(mask, 0, values).astype(np.int64), mask)
+
+    if values.dtype == np.float64:
+        narrowed = values.astype(np.float32)
+        with np.errstate(invalid='ignore'):
+            exact = (narrowed.astype(np.float64) == values) | mask
+        if exact.all():
+            return narrowed
+    return values
+
+
+def compact_column(column, declared_type=None):
+    """
+    Devuelve el array compactado de una Serie (o la misma Serie si no cambia).
+    `declared_type` es el tipo ARFF del atributo; None si no se conoce.
+    """
+    dtype = column.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype) or dtype.kind in 'bmM':
+        return column
+
+    if isinstance(column.array, pd.arrays.IntegerArray):
+        return _compact_integers(
+            column.to_numpy(dtype=np.int64, na_value=0), column.isna().to_numpy()
+        )
+
+    if dtype.kind in 'iu':
+        return _compact_integers(column.to_numpy(dtype=np.int64))
+
+    if dtype.kind == 'f':
+        return _compact_floats(
+            column.to_numpy(dtype=np.float64, na_value=np.nan),
+            to_integers=declared_type is None or declared_type == INTEGER_TYPE,
+        )
+
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        # '?' (valor faltante de ARFF) y las cadenas vacías son nulos
+        missing = column.isna() | column.isin(MISSING_TOKENS)
+        if missing.any():
+            column = column.mask(missing)
+
+        # Texto numérico: todos los valores no nulos se convierten a número
+        if declared_type is None or declared_type in NUMERIC_DECLARED_TYPES:
+            numbers = pd.to_numeric(column, errors='coerce')
+            if pd.api.types.is_numeric_dtype(numbers.dtype) and (numbers.isna() == missing).all():
+                return compact_column(numbers.astype(np.float64), declared_type)
+
+        present = int((~missing).sum())
+        if present and column.nunique(dropna=True) <= present * CATEGORY_MAX_RATIO:
+            return pd.Categorical(column)
+
+    return column
+
+
+def compact_frame(df, attribute_types=None):
+    """
+    Compacta todas las columnas del DataFrame y devuelve (DataFrame, informe).
+    `attribute_types` es metadata['attribute_types'] si la cabecera se leyó
+    con tipos. El informe lista por columna el tipo y los bytes antes y
+    después. Los SparseFrame se devuelven sin cambios.
+    """
+    if isinstance(df, SparseFrame):
+        return df, None
+
+    declared = {attr['name']: attr['type'] for attr in attribute_types or []}
+    columns = {}
+    report = []
+    for name in df.columns:
+        column = df[name]
+        compacted = pd.Series(compact_column(column, declared.get(name)), copy=False)
+        report.append({
+            'name': name,
+            'dtype_before': str(column.dtype),
+            'dtype_after': str(compacted.dtype),
+            'bytes_before': int(column.memory_usage(index=False, deep=True)),
+            'bytes_after': int(compacted.memory_usage(index=False, deep=True)),
+        })
+        columns[name] = compacted.array
+
+    compacted_df = pd.DataFrame(columns, index=df.index, copy=False) if columns else df
+    return compacted_df, {
+        'bytes_before': sum(entry['bytes_before'] for entry in report),
+        'bytes_after': sum(entry['bytes_after'] for entry in report),
+        'columns': report,
+    }
+
+
+def compact_dataset(df, metadata):
+    """Compacta los datos recién parseados y guarda el informe en metadata['memory']"""
+    df, report = compact_frame(df, metadata.get('attribute_types'))
+    if report is not None:
+        metadata['memory'] = report
+        logger.debug(
+            'Compactación de tipos: %.1f MB -> %.1f MB',
+            report['bytes_before'] / 1e6, report['bytes_after'] / 1e6,
+        )
+    return df
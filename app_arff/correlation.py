@@ -0,0 +1,198 @@
+"""
+Matrices de correlación (Pearson/Spearman) y de asociación (V de Cramér).
+
+El dataset se recorre por bloques de filas: para las columnas numéricas se
+leen del frame solo las filas del bloque y se acumulan por pares los conteos,
+sumas, sumas de cuadrados y productos cruzados (con productos de matrices
+sobre el bloque), y para las nominales las tablas de contingencia con
+bincount. Con Pearson la memoria extra depende del tamaño del bloque y del
+número de columnas, no del número de filas; Spearman necesita además los
+rangos de cada columna completa (float32) y las nominales sus códigos. Los
+nulos se excluyen por pares, como en DataFrame.corr().
+"""
+import numpy as np
+import pandas as pd
+
+from .query import QueryError, column_view
+from .sparse import SparseFrame
+
+
+CORRELATION_METHODS = ('pearson', 'spearman')
+
+# Filas por bloque
+CORRELATION_CHUNK_ROWS = 65536
+
+# Máximo de columnas analizadas por petición (k² pares)
+MAX_CORRELATION_COLUMNS = 200
+
+# Tablas de contingencia más grandes se omiten (V de Cramér = null)
+MAX_CONTINGENCY_CELLS = 1000000
+
+
+class _PairwiseMoments:
+    """Momentos por pares de columnas acumulados bloque a bloque"""
+
+    def __init__(self, k):
+        self.shift = None
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    def add(self, block):
+        present = ~np.isnan(block)
+
+        if self.shift is None:
+            # Desplazar por la media del primer bloque evita cancelaciones numéricas
+            with np.errstate(invalid='ignore'):
+                counts = present.sum(axis=0)
+                sums = np.where(present, block, 0.0).sum(axis=0)
+                self.shift = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+
+        values = np.where(present, block - self.shift, 0.0)
+        weights = present.astype(np.float64)
+
+        # [i, j] acumula sobre las filas donde i y j tienen valor
+        self.n += weights.T @ weights
+        self.sx += values.T @ weights
+        self.sxx += (values * values).T @ weights
+        self.sxy += values.T @ values
+
+    def correlation(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_i = self.sx / self.n
+            mean_j = self.sx.T / self.n
+            cov = self.sxy / self.n - mean_i * mean_j
+            var_i = self.sxx / self.n - mean_i ** 2
+            var_j = self.sxx.T / self.n - mean_j ** 2
+            matrix = cov / np.sqrt(var_i * var_j)
+
+        matrix[(var_i <= 0) | (var_j <= 0) | (self.n < 2)] = np.nan
+        return np.clip(matrix, -1.0, 1.0)
+
+
+def _ranks(values):
+    """
+    Rangos promedio (empates) con NaN para los nulos, en float32. Se calculan
+    una vez por columna sobre todos sus valores no nulos (pandas vuelve a
+    calcularlos para cada par cuando hay nulos).
+    """
+    return pd.Series(values).rank(method='average').to_numpy(dtype=np.float32)
+
+
+def _chunks(n_rows, chunk_rows=None):
+    chunk_rows = chunk_rows or CORRELATION_CHUNK_ROWS
+    for start in range(0, n_rows, chunk_rows):
+        yield start, min(start + chunk_rows, n_rows)
+
+
+def is_numeric_column(data, name):
+    """True si column_view trataría la columna como numérica"""
+    if isinstance(data, SparseFrame):
+        return data.categories[data.columns.index(name)] is None
+    dtype = data[name].dtype
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype):
+        return False
+    return pd.api.types.is_numeric_dtype(dtype)
+
+
+def numeric_block(data, names, start, end):
+    """Filas [start, end) de las columnas numéricas `names` como float64 (NaN = nulo)"""
+    if isinstance(data, SparseFrame):
+        positions = [data.columns.index(name) for name in names]
+        return data.matrix[start:end][:, positions].toarray().astype(np.float64)
+    return np.column_stack([
+        data[name].iloc[start:end].to_numpy(dtype=np.float64, na_value=np.nan) for name in names
+    ])
+
+
+def correlation_matrix(data, names, method='pearson'):
+    """Matriz k×k de correlación entre las columnas numéricas `names` de un DataFrame o SparseFrame"""
+    n_rows = len(data)
+    moments = _PairwiseMoments(len(names))
+
+    if method == 'spearman':
+        # Los rangos dependen de la columna completa: se calculan columna a columna
+        ranks = [_ranks(numeric_block(data, [name], 0, n_rows).ravel()) for name in names]
+        for start, end in _chunks(n_rows):
+            moments.add(np.column_stack([values[start:end] for values in ranks]).astype(np.float64))
+    else:
+        for start, end in _chunks(n_rows):
+            moments.add(numeric_block(data, names, start, end))
+    return moments.correlation()
+
+
+def cramers_v(codes_a, codes_b, n_a, n_b, n_rows):
+    """V de Cramér entre dos columnas codificadas (-1 = nulo)"""
+    if n_a * n_b > MAX_CONTINGENCY_CELLS:
+        return np.nan
+
+    table = np.zeros(n_a * n_b, dtype=np.int64)
+    for start, end in _chunks(n_rows):
+        a = codes_a[start:end]
+        b = codes_b[start:end]
+        valid = (a >= 0) & (b >= 0)
+        table += np.bincount(a[valid].astype(np.int64) * n_b + b[valid], minlength=n_a * n_b)
+
+    table = table.reshape(n_a, n_b)
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    total = table.sum()
+    k = min(table.shape) - 1 if table.size else 0
+    if total == 0 or k < 1:
+        return np.nan
+
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / total
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    return float(np.sqrt(chi2 / total / k))
+
+
+def _matrix_json(matrix):
+    """Lista de listas con None en lugar de NaN"""
+    values = np.round(matrix, 6).astype(object)
+    values[np.isnan(matrix)] = None
+    return values.tolist()
+
+
+def association_summary(data, metadata=None, method='pearson', columns=None):
+    """
+    Correlaciones entre columnas numéricas y V de Cramér entre columnas
+    nominales/de texto, para todas las columnas o para `columns`.
+    """
+    if method not in CORRELATION_METHODS:
+        raise QueryError(f"method debe ser uno de: {', '.join(CORRELATION_METHODS)}")
+
+    names = list(data.columns) if columns is None else columns
+    unknown = [name for name in names if name not in data.columns]
+    if unknown:
+        raise QueryError(f"Columnas desconocidas: {', '.join(unknown)}")
+
+    if len(names) > MAX_CORRELATION_COLUMNS:
+        raise QueryError(
+            f'Demasiadas columnas ({len(names)}); selecciona como máximo '
+            f'{MAX_CORRELATION_COLUMNS} con el parámetro columns'
+        )
+
+    # Las columnas numéricas se leen por bloques; solo las demás se materializan
+    numeric = [name for name in names if is_numeric_column(data, name)]
+    views = [(name, column_view(data, name, metadata)) for name in names if name not in numeric]
+    nominal = [(name, view) for name, view in views if view.kind == 'category']
+
+    n_rows = len(data)
+    correlations = np.zeros((0, 0))
+    if numeric:
+        correlations = correlation_matrix(data, numeric, method)
+
+    associations = np.eye(len(nominal))
+    for i, (_, view_a) in enumerate(nominal):
+        for j in range(i + 1, len(nominal)):
+            view_b = nominal[j][1]
+            associations[i, j] = associations[j, i] = cramers_v(
+                view_a.values, view_b.values, len(view_a.categories), len(view_b.categories), n_rows
+            )
+
+    return {
+        'rows': n_rows,
+        'method': method,
+        'numeric': {'columns': numeric, 'matrix': _matrix_json(correlations)},
+        'nominal': {'columns': [name for name, _ in nominal], 'matrix': _matrix_json(associations)},
+    }
@@ -0,0 +1,202 @@
+"""
+Caché en proceso de datasets con presupuesto de memoria.
+
+Delante del almacén columnar se mantiene una caché LRU que mide el tamaño
+real de cada entrada (DataFrame.memory_usage(deep=True)) y desaloja por
+total de bytes en lugar de por número de entradas. Las entradas en uso por
+una petición quedan fijadas (pinned) y no se desalojan hasta liberarlas.
+Los contadores de aciertos, fallos y desalojos se exponen vía stats().
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from django.conf import settings
+
+from .dataset_store import get_store
+from .sparse import SparseFrame
+
+
+def measure_bytes(data):
+    """Bytes ocupados por un DataFrame o SparseFrame"""
+    if data is None:
+        return 0
+    if isinstance(data, SparseFrame):
+        return int(data.memory_usage())
+    return int(data.memory_usage(deep=True).sum())
+
+
+def measure_derived(value):
+    """Bytes aproximados de una estructura derivada: arrays, pandas, índices y dicts/listas anidados"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            measure_derived(key) + measure_derived(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(measure_derived(item) for item in value)
+
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    return sys.getsizeof(value)
+
+
+class DatasetEntry:
+    """Dataset residente en la caché, con sus estructuras derivadas"""
+
+    def __init__(self, key, data, metadata):
+        self.key = key
+        self.data = data
+        self.metadata = metadata
+        self.nbytes = measure_bytes(data)
+        self.pins = 0
+        # Estructuras construidas bajo demanda (índices, permutaciones...)
+        self.derived = {}
+
+
+class DatasetCache:
+    """Caché LRU de datasets acotada por bytes residentes"""
+
+    def __init__(self, max_bytes, loader=None):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.resident_bytes = 0
+
+    def __contains__(self, key):
+        """Indica si `key` está residente (sin cargarlo ni contar acierto/fallo)"""
+        with self._lock:
+            return key in self._entries
+
+    def acquire(self, key):
+        """
+        Devuelve la entrada fijada para `key`, cargándola con `loader` si no
+        está residente, o None si el dataset no existe. Debe liberarse con
+        release().
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                entry.pins += 1
+                return entry
+            self.misses += 1
+
+        if self.loader is None:
+            return None
+
+        loaded = self.loader(key)
+        if loaded is None:
+            return None
+
+        data, metadata = loaded
+        with self._lock:
+            self.loads += 1
+            return self._insert(key, data, metadata)
+
+    def put(self, key, data, metadata):
+        """Inserta un dataset recién procesado y devuelve su entrada fijada"""
+        with self._lock:
+            return self._insert(key, data, metadata)
+
+    def derived(self, entry, name, build):
+        """
+        Devuelve la estructura derivada `name` de la entrada, construyéndola
+        con `build()` la primera vez. Su tamaño (measure_derived) se suma al
+        de la entrada y puede desalojar otras entradas para respetar el
+        presupuesto de memoria.
+        """
+        value = entry.derived.get(name)
+        if value is not None:
+            return value
+
+        value = build()
+        size = measure_derived(value)
+        with self._lock:
+            if name in entry.derived:
+                return entry.derived[name]
+            entry.derived[name] = value
+            entry.nbytes += size
+            if self._entries.get(entry.key) is entry:
+                self.resident_bytes += size
+                self._evict()
+        return value
+
+    def release(self, entry):
+        """Libera una entrada obtenida con acquire() o put()"""
+        if entry is None:
+            return
+        with self._lock:
+            entry.pins = max(0, entry.pins - 1)
+            self._evict()
+
+    def _insert(self, key, data, metadata):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = DatasetEntry(key, data, metadata)
+            self._entries[key] = entry
+            self.resident_bytes += entry.nbytes
+        else:
+            self._entries.move_to_end(key)
+
+        entry.pins += 1
+        self._evict()
+        return entry
+
+    def _evict(self):
+        """Desaloja las entradas menos usadas recientemente que no estén fijadas"""
+        if self.resident_bytes <= self.max_bytes:
+            return
+
+        for key in list(self._entries):
+            if self.resident_bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.pins:
+                continue
+            del self._entries[key]
+            self.resident_bytes -= entry.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if not entry.pins]:
+                self.resident_bytes -= self._entries.pop(key).nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'pinned': sum(1 for entry in self._entries.values() if entry.pins),
+                'resident_bytes': self.resident_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_default_cache = None
+
+
+def get_dataset_cache():
+    """Caché del proceso, con el presupuesto de settings.ARFF_DATASET_CACHE_MAX_BYTES"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DatasetCache(
+            settings.ARFF_DATASET_CACHE_MAX_BYTES,
+            loader=get_store().load,
+        )
+    return _default_cache
@@ -0,0 +1,402 @@
+"""
+Almacén persistente de datasets en formato columnar.
+
+Cada dataset se guarda en disco bajo el hash del archivo (el mismo
+`cache_key` que reciben los clientes) como un directorio con un `.npy` por
+columna y un `manifest.json` con la metadata. Al cargarlo, las columnas se
+abren con memory-map, así que cualquier worker de gunicorn puede servir
+cualquier dataset sin deserializar nada, y los datos sobreviven a reinicios.
+
+Mientras un trabajo de ingesta parsea un archivo, las filas ya parseadas se
+publican en `<cache_key>.partial/` como segmentos con el mismo formato y un
+manifiesto que se reemplaza de forma atómica y siempre cubre un prefijo
+contiguo del archivo; así /api/data/ sirve las primeras páginas antes de
+que termine el parseo.
+"""
+import datetime
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from scipy import sparse as sp
+
+from django.conf import settings
+
+from .sparse import SparseFrame
+from .arff_reader import Attribute, align_timezones
+
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+# Sufijo del directorio con los segmentos de un dataset que aún se está ingiriendo
+PARTIAL_SUFFIX = '.partial'
+
+# Arrays de pandas con máscara de nulos que se guardan como valores + máscara
+MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.BooleanArray, pd.arrays.FloatingArray)
+
+# Los hashes válidos son hexadecimales; evita rutas arbitrarias en disco
+KEY_PATTERN = re.compile(r'^[0-9a-f]{16,128}$')
+
+# Zona horaria de desplazamiento fijo tal como la escribe str(tz)
+FIXED_OFFSET = re.compile(r'^UTC([+-])(\d{2}):?(\d{2})?$')
+
+
+def is_valid_key(key):
+    return bool(key) and bool(KEY_PATTERN.match(key))
+
+
+def _json_default(value):
+    """Serializa valores de NumPy/pandas que json no conoce"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _save(directory, filename, values):
+    """Guarda un array sin pickle: un array de objetos no se podría abrir con memory-map"""
+    if values.dtype == object:
+        raise ValueError(f'No se puede guardar un array de objetos en el almacén: {filename}')
+    np.save(os.path.join(directory, filename), values, allow_pickle=False)
+
+
+def _timezone(name):
+    """Zona horaria guardada con str(tz): nombre IANA o desplazamiento fijo ('UTC+02:00')"""
+    match = FIXED_OFFSET.match(name)
+    if match is None:
+        return name
+    sign, hours, minutes = match.groups()
+    offset = datetime.timedelta(hours=int(hours), minutes=int(minutes or 0))
+    return datetime.timezone(-offset if sign == '-' else offset)
+
+
+class DatasetStore:
+    """Guarda y carga datasets columnares en un directorio compartido"""
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def path(self, key):
+        if not is_valid_key(key):
+            raise ValueError(f'Clave de dataset inválida: {key!r}')
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return is_valid_key(key) and os.path.exists(os.path.join(self.path(key), MANIFEST_NAME))
+
+    def save(self, key, data, metadata):
+        """
+        Escribe el dataset en un directorio temporal y lo publica con un
+        rename atómico, de modo que los lectores nunca vean un dataset a medias.
+        """
+        target = self.path(key)
+        if self.exists(key):
+            return target
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f'.{key}-', dir=self.root)
+
+        try:
+            if isinstance(data, SparseFrame):
+                layout = self._write_sparse(tmp_dir, data)
+            else:
+                layout = self._write_frame(tmp_dir, data)
+
+            manifest = {
+                'version': FORMAT_VERSION,
+                'metadata': metadata,
+                'layout': layout,
+            }
+            with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, default=_json_default)
+
+            try:
+                os.rename(tmp_dir, target)
+            except OSError:
+                # Otro worker publicó el mismo dataset primero
+                if not self.exists(key):
+                    raise
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        return target
+
+    def load(self, key):
+        """Devuelve (datos, metadata) con las columnas en memory-map, o None"""
+        if not self.exists(key):
+            return None
+
+        directory = self.path(key)
+        with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if manifest.get('version') != FORMAT_VERSION:
+            return None
+
+        layout = manifest['layout']
+        if layout['kind'] == 'sparse':
+            data = self._read_sparse(directory, layout)
+        else:
+            data = self._read_frame(directory, layout)
+
+        return data, manifest['metadata']
+
+    def delete(self, key):
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+    # Datasets parciales (ingesta en curso)
+
+    def partial_path(self, key):
+        return self.path(key) + PARTIAL_SUFFIX
+
+    def save_segment(self, key, name, df):
+        """Escribe un bloque de filas del dataset en curso; devuelve su entrada para publish_partial"""
+        directory = self.partial_path(key)
+        os.makedirs(directory, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f'.{name}-', dir=directory)
+
+        try:
+            layout = self._write_frame(tmp_dir, df)
+            with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+                json.dump({'version': FORMAT_VERSION, 'layout': layout}, f, default=_json_default)
+
+            target = os.path.join(directory, name)
+            shutil.rmtree(target, ignore_errors=True)
+            os.rename(tmp_dir, target)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        return {'name': name, 'rows': len(df)}
+
+    def publish_partial(self, key, metadata, segments):
+        """Reemplaza de forma atómica la lista de segmentos visibles del dataset en curso"""
+        directory = self.partial_path(key)
+        manifest = {
+            'version': FORMAT_VERSION,
+            'metadata': metadata,
+            'segments': segments,
+            'rows': sum(segment['rows'] for segment in segments),
+        }
+
+        fd, tmp_path = tempfile.mkstemp(prefix='.manifest-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, default=_json_default)
+            os.replace(tmp_path, os.path.join(directory, MANIFEST_NAME))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def load_partial(self, key):
+        """PartialDataset con las filas ya publicadas de un dataset en curso, o None"""
+        if not is_valid_key(key):
+            return None
+
+        directory = self.partial_path(key)
+        try:
+            with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if manifest.get('version') != FORMAT_VERSION:
+            return None
+        return PartialDataset(self, directory, manifest)
+
+    def delete_partial(self, key):
+        shutil.rmtree(self.partial_path(key), ignore_errors=True)
+
+    def _read_segment(self, directory):
+        with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+            layout = json.load(f)['layout']
+        return self._read_frame(directory, layout)
+
+    # Escritura y lectura de DataFrames
+
+    def _write_frame(self, directory, df):
+        columns = []
+
+        for i, name in enumerate(df.columns):
+            column = df[name]
+            dtype = column.dtype
+            entry = {'name': name}
+
+            if isinstance(dtype, pd.CategoricalDtype):
+                entry['kind'] = 'category'
+                entry['categories'] = dtype.categories.tolist()
+                _save(directory, f'{i}.codes.npy', column.cat.codes.to_numpy())
+
+            elif isinstance(column.array, MASKED_ARRAYS):
+                # Enteros/booleanos/flotantes con nulos (Int64, boolean...): valores + máscara
+                entry['kind'] = 'masked'
+                entry['array'] = type(column.array).__name__
+                _save(directory, f'{i}.values.npy', column.to_numpy(dtype=dtype.numpy_dtype, na_value=0))
+                _save(directory, f'{i}.mask.npy', column.isna().to_numpy())
+
+            elif isinstance(dtype, pd.DatetimeTZDtype):
+                # Fechas con zona horaria: instantes UTC en datetime64 y la zona en el manifiesto
+                entry['kind'] = 'datetime_tz'
+                entry['tz'] = str(dtype.tz)
+                _save(directory, f'{i}.npy', column.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy())
+
+            elif dtype.kind in 'biufmM':
+                entry['kind'] = 'numpy'
+                _save(directory, f'{i}.npy', column.to_numpy())
+
+            else:
+                # Texto y objetos: codificación por diccionario
+                codes, uniques = pd.factorize(column, use_na_sentinel=True)
+                entry['kind'] = 'string'
+                entry['categories'] = [
+                    value if isinstance(value, (str, int, float)) else _json_default(value) for value in uniques
+                ]
+                _save(directory, f'{i}.codes.npy', codes.astype(_codes_dtype(len(uniques))))
+
+            columns.append(entry)
+
+        return {'kind': 'frame', 'rows': len(df), 'columns': columns}
+
+    def _read_frame(self, directory, layout):
+        arrays = {}
+
+        for i, entry in enumerate(layout['columns']):
+            kind = entry['kind']
+
+            if kind in ('category', 'string'):
+                codes = self._mmap(directory, f'{i}.codes.npy')
+                values = pd.Categorical.from_codes(codes, categories=entry['categories'])
+
+            elif kind == 'datetime_tz':
+                utc = pd.DatetimeIndex(self._mmap(directory, f'{i}.npy')).tz_localize('UTC')
+                values = utc.tz_convert(_timezone(entry['tz'])).array
+
+            elif kind == 'masked':
+                array_class = getattr(pd.arrays, entry['array'])
+                values = array_class(
+                    self._mmap(directory, f'{i}.values.npy'),
+                    self._mmap(directory, f'{i}.mask.npy'),
+                )
+
+            else:
+                values = self._mmap(directory, f'{i}.npy')
+
+            arrays[entry['name']] = values
+
+        if not arrays:
+            return pd.DataFrame(index=range(layout['rows']))
+        return pd.DataFrame(arrays, copy=False)
+
+    # Escritura y lectura de matrices dispersas
+
+    def _write_sparse(self, directory, frame):
+        matrix = frame.matrix
+        _save(directory, 'data.npy', matrix.data)
+        _save(directory, 'indices.npy', matrix.indices)
+        _save(directory, 'indptr.npy', matrix.indptr)
+
+        return {
+            'kind': 'sparse',
+            'shape': list(matrix.shape),
+            'attributes': [list(attr) for attr in frame.attributes],
+            'categories': frame.categories,
+        }
+
+    def _read_sparse(self, directory, layout):
+        matrix = sp.csr_matrix(
+            (
+                self._mmap(directory, 'data.npy'),
+                self._mmap(directory, 'indices.npy'),
+                self._mmap(directory, 'indptr.npy'),
+            ),
+            shape=tuple(layout['shape']),
+            copy=False,
+        )
+        attributes = [Attribute(*attr) for attr in layout['attributes']]
+        return SparseFrame(matrix, attributes, layout['categories'])
+
+    def _mmap(self, directory, filename):
+        return np.load(os.path.join(directory, filename), mmap_mode='r')
+
+
+class PartialDataset:
+    """
+    Prefijo ya parseado de un dataset en ingesta. Los segmentos se leen con
+    memory-map al pedir filas; si la ingesta termina entretanto y borra el
+    directorio, rows() lanza OSError y el dataset completo ya está en el almacén.
+    """
+
+    def __init__(self, store, directory, manifest):
+        self.store = store
+        self.directory = directory
+        self.metadata = manifest['metadata']
+        self.segments = manifest['segments']
+        self.rows_ready = manifest['rows']
+
+    @property
+    def columns(self):
+        return list(self.metadata.get('attributes', []))
+
+    def __len__(self):
+        return self.rows_ready
+
+    def rows(self, start, stop):
+        """DataFrame con las filas [start, stop) ya publicadas"""
+        stop = min(stop, self.rows_ready)
+        frames = []
+        offset = 0
+
+        for segment in self.segments:
+            end = offset + segment['rows']
+            if end > start and offset < stop:
+                frame = self.store._read_segment(os.path.join(self.directory, segment['name']))
+                frames.append(frame.iloc[max(0, start - offset):stop - offset])
+            offset = end
+            if offset >= stop:
+                break
+
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return _concat_rows(frames)
+
+
+def _concat_rows(frames):
+    """Concatena bloques de filas; las categorías de cada segmento pueden diferir"""
+    if len(frames) == 1:
+        return frames[0]
+
+    columns = {}
+    for name in frames[0].columns:
+        parts = align_timezones([frame[name] for frame in frames])
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[name] = union_categoricals(parts)
+        else:
+            columns[name] = pd.concat(parts, ignore_index=True).array
+    return pd.DataFrame(columns, copy=False)
+
+
+def _codes_dtype(n_categories):
+    """Tipo entero más pequeño que admite los códigos (incluido -1 para nulos)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+_default_store = None
+
+
+def get_store():
+    """Almacén configurado en settings.ARFF_DATASET_STORE_DIR"""
+    global _default_store
+    if _default_store is None:
+        _default_store = DatasetStore(settings.ARFF_DATASET_STORE_DIR)
+    return _default_store
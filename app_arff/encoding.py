@@ -0,0 +1,225 @@
+"""
+Codificación de páginas de datos para las respuestas de /api/data/.
+
+El formato por columnas (`layout=columns`) se construye directamente desde
+los buffers de NumPy de cada columna: un array de valores por columna, los
+nulos como un bitmap en base64 y las columnas nominales codificadas por
+diccionario. El coste depende del número de columnas y no de celdas, porque
+la conversión a listas de Python ocurre en C con `ndarray.tolist()`.
+
+El formato por filas (`layout=records`, el de siempre) sigue disponible
+para compatibilidad. Los clientes que lo piden en la cabecera Accept
+reciben la página como buffers binarios por columna (encode_buffers).
+"""
+import base64
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+
+RECORDS_FORMAT = 'records'
+COLUMNS_FORMAT = 'columns'
+PAGE_FORMATS = (RECORDS_FORMAT, COLUMNS_FORMAT)
+
+# Formato binario de buffers por columna (ver encode_buffers)
+COLUMN_BUFFERS_MEDIA_TYPE = 'application/vnd.arff.columns'
+BUFFER_MAGIC = b'ARFB'
+BUFFER_VERSION = 1
+BUFFER_ALIGNMENT = 8
+
+
+def null_bitmap(mask):
+    """Bitmap de nulos en base64 (bit i = fila i, LSB primero) o None si no hay nulos"""
+    if not mask.any():
+        return None
+    return base64.b64encode(np.packbits(mask, bitorder='little').tobytes()).decode('ascii')
+
+
+def page_dictionary(codes, categories):
+    """
+    Reduce el diccionario a las categorías presentes en la página.
+    Devuelve (códigos renumerados, lista de categorías); el nulo sigue siendo -1.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    used, remapped = np.unique(codes, return_inverse=True)
+    remapped = remapped.reshape(-1)
+    if used.size and used[0] < 0:
+        remapped = remapped - 1
+        used = used[1:]
+    return remapped, np.asarray(categories, dtype=object)[used].tolist()
+
+
+def _encode_dictionary(name, codes, categories):
+    """Columna por diccionario con solo las categorías presentes en la página"""
+    codes, dictionary = page_dictionary(codes, categories)
+    return {'name': name, 'type': 'nominal', 'dictionary': dictionary, 'codes': codes.tolist()}
+
+
+def encode_column(name, column):
+    """Codifica una Serie como un objeto de columna del formato por columnas"""
+    dtype = column.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _encode_dictionary(name, column.cat.codes.to_numpy(), dtype.categories)
+
+    mask = column.isna().to_numpy()
+
+    if dtype.kind == 'M':
+        values = np.datetime_as_string(column.to_numpy(dtype='datetime64[ms]'), unit='ms').astype(object)
+        values[mask] = None
+        return {'name': name, 'type': 'datetime', 'values': values.tolist(), 'nulls': null_bitmap(mask)}
+
+    if pd.api.types.is_bool_dtype(dtype):
+        values = column.to_numpy(dtype=bool, na_value=False)
+        return {'name': name, 'type': 'boolean', 'values': values.tolist(), 'nulls': null_bitmap(mask)}
+
+    if pd.api.types.is_integer_dtype(dtype):
+        values = column.to_numpy(dtype=np.int64, na_value=0)
+        return {'name': name, 'type': 'integer', 'values': values.tolist(), 'nulls': null_bitmap(mask)}
+
+    if pd.api.types.is_numeric_dtype(dtype):
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        # JSON no admite NaN ni infinitos: se envían como 0 marcados en el bitmap
+        mask = mask | ~np.isfinite(values)
+        values = np.where(mask, 0.0, values)
+        return {'name': name, 'type': 'numeric', 'values': values.tolist(), 'nulls': null_bitmap(mask)}
+
+    # Texto y objetos: diccionario de los valores distintos de la página
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    column_data = _encode_dictionary(name, codes, uniques)
+    column_data['type'] = 'string'
+    return column_data
+
+
+def encode_columns(df):
+    """Página en formato por columnas"""
+    return {
+        'format': COLUMNS_FORMAT,
+        'length': len(df),
+        'columns': [encode_column(name, df.iloc[:, j]) for j, name in enumerate(df.columns)],
+    }
+
+
+def column_values(column):
+    """Valores de una Serie como lista de Python con None para los nulos"""
+    dtype = column.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        lookup = np.append(dtype.categories.to_numpy(dtype=object), None)
+        return lookup[column.cat.codes.to_numpy()].tolist()
+
+    if pd.api.types.is_integer_dtype(dtype):
+        values = column.to_numpy(dtype=np.int64, na_value=0).astype(object)
+        values[column.isna().to_numpy()] = None
+        return values.tolist()
+
+    if pd.api.types.is_float_dtype(dtype):
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        mask = ~np.isfinite(values)
+        if not mask.any():
+            return values.tolist()
+        values = values.astype(object)
+        values[mask] = None
+        return values.tolist()
+
+    values = column.to_numpy(dtype=object)
+    mask = column.isna().to_numpy()
+    if mask.any():
+        values = values.copy()
+        values[mask] = None
+    return values.tolist()
+
+
+def encode_records(df):
+    """Página en formato por filas ([{columna: valor}]), con None para los nulos"""
+    names = list(df.columns)
+    columns = [column_values(df.iloc[:, j]) for j in range(len(names))]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def encode_page(df, page_format=RECORDS_FORMAT):
+    """Codifica una página en el formato pedido"""
+    if page_format == COLUMNS_FORMAT:
+        return encode_columns(df)
+    return encode_records(df)
+
+
+def _buffer_column(column):
+    """(tipo, array little-endian, diccionario) de una columna para el formato binario"""
+    dtype = column.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes, dictionary = page_dictionary(column.cat.codes.to_numpy(), dtype.categories)
+        return 'nominal', codes.astype('<i4'), dictionary
+
+    if dtype.kind == 'M':
+        # Milisegundos desde epoch, NaN para los nulos
+        values = column.to_numpy(dtype='datetime64[ms]').view(np.int64).astype('<f8')
+        values[column.isna().to_numpy()] = np.nan
+        return 'datetime', values, None
+
+    if pd.api.types.is_numeric_dtype(dtype):
+        # Enteros, booleanos y flotantes como float64 con NaN para los nulos
+        if pd.api.types.is_bool_dtype(dtype):
+            kind = 'boolean'
+        elif pd.api.types.is_integer_dtype(dtype):
+            kind = 'integer'
+        else:
+            kind = 'numeric'
+        return kind, column.to_numpy(dtype='<f8', na_value=np.nan), None
+
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    codes, dictionary = page_dictionary(codes, uniques)
+    return 'string', codes.astype('<i4'), dictionary
+
+
+def encode_buffers(df, meta=None):
+    """
+    Codifica una página en el formato binario autodescriptivo
+    `application/vnd.arff.columns` y devuelve la lista de bloques a enviar.
+
+    Estructura (little-endian):
+        'ARFB' | uint32 longitud de cabecera | cabecera JSON | buffers
+
+    La cabecera JSON describe cada columna (nombre, tipo, dtype, offset y
+    longitud de su buffer relativos al inicio de los buffers, diccionario
+    para las nominales y de texto) y lleva `meta` (paginación). Cabecera y
+    buffers se alinean a 8 bytes para que el cliente pueda crear
+    Float64Array/Int32Array directamente sobre la respuesta sin copiar.
+    Los valores numéricos salen de los buffers de la columna sin conversión
+    por celda; los nulos son NaN o el código -1.
+    """
+    columns = []
+    buffers = []
+    offset = 0
+
+    for j, name in enumerate(df.columns):
+        kind, values, dictionary = _buffer_column(df.iloc[:, j])
+        values = np.ascontiguousarray(values)
+        column = {
+            'name': name,
+            'type': kind,
+            'dtype': 'int32' if values.dtype.kind == 'i' else 'float64',
+            'offset': offset,
+            'byte_length': values.nbytes,
+        }
+        if dictionary is not None:
+            column['dictionary'] = dictionary
+        columns.append(column)
+
+        padding = -values.nbytes % BUFFER_ALIGNMENT
+        buffers.append(memoryview(values).cast('B'))
+        if padding:
+            buffers.append(bytes(padding))
+        offset += values.nbytes + padding
+
+    header = json.dumps(
+        {'version': BUFFER_VERSION, 'length': len(df), 'meta': meta or {}, 'columns': columns},
+        separators=(',', ':'), default=str,
+    ).encode('utf-8')
+    prefix_size = len(BUFFER_MAGIC) + 4
+    header += b' ' * (-(prefix_size + len(header)) % BUFFER_ALIGNMENT)
+
+    return [BUFFER_MAGIC + struct.pack('<I', len(header)) + header] + buffers
@@ -0,0 +1,112 @@
+"""
+Exportación en streaming de un dataset completo (o de una consulta).
+
+Las filas se recorren por bloques de tamaño fijo y cada bloque se
+serializa con los escritores en C de pandas (to_json / to_csv), así que la
+memoria del servidor no depende del tamaño del dataset: solo hay un bloque
+denso a la vez.
+"""
+import numpy as np
+
+from .sparse import SparseFrame
+
+
+NDJSON_FORMAT = 'ndjson'
+CSV_FORMAT = 'csv'
+
+EXPORT_CONTENT_TYPES = {
+    NDJSON_FORMAT: 'application/x-ndjson',
+    CSV_FORMAT: 'text/csv; charset=utf-8',
+}
+
+# Filas por bloque serializado
+EXPORT_BLOCK_ROWS = 5000
+
+# Máximo de celdas densificadas por bloque en datasets dispersos
+SPARSE_MAX_BLOCK_CELLS = 1000000
+
+
+def block_rows_for(data):
+    """Filas por bloque; en datasets dispersos anchos se limita por celdas"""
+    if isinstance(data, SparseFrame):
+        return max(1, min(EXPORT_BLOCK_ROWS, SPARSE_MAX_BLOCK_CELLS // max(1, len(data.columns))))
+    return EXPORT_BLOCK_ROWS
+
+
+def iter_blocks(data, row_ids=None, columns=None, start=0):
+    """
+    Genera DataFrames densos de como mucho block_rows_for(data) filas.
+
+    `row_ids` es el orden de filas de una consulta (None = todas en orden),
+    `columns` la proyección (None = todas) y `start` las filas a omitir.
+    """
+    total = len(data) if row_ids is None else len(row_ids)
+    step = block_rows_for(data)
+    sparse = isinstance(data, SparseFrame)
+
+    # En datos densos la proyección se aplica antes de copiar las filas
+    positions = slice(None)
+    if columns is not None and not sparse:
+        positions = data.columns.get_indexer(columns)
+
+    for begin in range(start, total, step):
+        end = min(begin + step, total)
+
+        if row_ids is None:
+            block = data.page(begin, end) if sparse else data.iloc[begin:end, positions]
+        else:
+            ids = np.asarray(row_ids[begin:end])
+            block = data.take(ids) if sparse else data.iloc[ids, positions]
+
+        if columns is not None and sparse:
+            block = block[columns]
+        yield block
+
+
+def iter_ndjson(blocks):
+    """Un objeto JSON por línea; NaN se escribe como null y las fechas en ISO"""
+    for block in blocks:
+        if not len(block):
+            continue
+        text = block.to_json(orient='records', lines=True, date_format='iso')
+        # Según la versión de pandas la última línea puede no terminar en salto de línea
+        yield text if text.endswith('\n') else text + '\n'
+
+
+def iter_csv(blocks):
+    """CSV con cabecera solo en el primer bloque; los nulos quedan vacíos"""
+    header = True
+    for block in blocks:
+        yield block.to_csv(index=False, header=header)
+        header = False
+
+
+def iter_export(export_format, blocks):
+    if export_format == CSV_FORMAT:
+        return iter_csv(blocks)
+    return iter_ndjson(blocks)
+
+
+class ReleasingStream:
+    """
+    Contenido de un StreamingHttpResponse que ejecuta `on_close` cuando la
+    respuesta termina o se aborta (Django llama a close() en ambos casos),
+    para liberar la entrada fijada en la caché mientras dura el envío.
+    """
+
+    def __init__(self, chunks, on_close):
+        self.chunks = chunks
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        close_chunks = getattr(self.chunks, 'close', None)
+        if close_chunks is not None:
+            close_chunks()
+        self.on_close()
@@ -3,9 +3,9 @@ from django import forms
 class ARFFUploadForm(forms.Form):
     arff_file = forms.FileField(
         label='subir archivo ARFF',
-        help_text='Formatos aceptados: .arff',
+        help_text='Formatos aceptados: .arff, .arff.gz, .arff.bz2, .zip',
         widget=forms.FileInput(attrs={
-            'accept': '.arff',
+            'accept': '.arff,.gz,.bz2,.zip',
             'class': 'form-control'
             
             })
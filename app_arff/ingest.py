@@ -0,0 +1,250 @@
+"""
+Lectura incremental de archivos subidos.
+
+Los archivos se consumen con UploadedFile.chunks(), de modo que nunca se
+tiene el archivo completo como str de Python: el hash se calcula sobre los
+bytes crudos y el parser recibe un flujo de texto que se decodifica por
+bloques. Los archivos comprimidos (gzip, bz2, zip, detectados por sus bytes
+mágicos) se descomprimen en el mismo flujo, sin materializar el contenido.
+"""
+import bz2
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+
+
+# Tamaño de bloque al leer archivos desde disco
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Bloque del hash de contenido; debe coincidir con HASH_BLOCK_SIZE de upload.js
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+GZIP_COMPRESSION = 'gzip'
+BZ2_COMPRESSION = 'bz2'
+ZIP_COMPRESSION = 'zip'
+
+# Bytes mágicos al inicio de cada formato comprimido
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', GZIP_COMPRESSION),
+    (b'BZh', BZ2_COMPRESSION),
+    (b'PK\x03\x04', ZIP_COMPRESSION),
+)
+
+# Límite del contenido descomprimido (protege frente a "bombas" de compresión)
+MAX_DECOMPRESSED_SIZE = 4 * 1024 * 1024 * 1024
+
+
+class ChunkStream(io.RawIOBase):
+    """Flujo binario de solo lectura sobre un iterable de bloques de bytes"""
+
+    def __init__(self, chunks, hasher=None):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+        self.hasher = hasher
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            if self.hasher is not None:
+                self.hasher.update(chunk)
+            self.bytes_read += len(chunk)
+            self._buffer = chunk
+
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class BlockHasher:
+    """
+    Hash del contenido del archivo: SHA-256 de la concatenación de los
+    SHA-256 de cada bloque de HASH_BLOCK_SIZE bytes. Se calcula de forma
+    incremental con bloques de entrada de cualquier tamaño, y el navegador
+    obtiene el mismo valor con WebCrypto sin cargar el archivo entero.
+    """
+
+    def __init__(self):
+        self._digests = hashlib.sha256()
+        self._block = hashlib.sha256()
+        self._block_bytes = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        while len(view):
+            take = min(len(view), HASH_BLOCK_SIZE - self._block_bytes)
+            self._block.update(view[:take])
+            self._block_bytes += take
+            view = view[take:]
+            if self._block_bytes == HASH_BLOCK_SIZE:
+                self._finish_block()
+
+    def _finish_block(self):
+        self._digests.update(self._block.digest())
+        self._block = hashlib.sha256()
+        self._block_bytes = 0
+
+    def hexdigest(self):
+        if self._block_bytes:
+            self._finish_block()
+        return self._digests.hexdigest()
+
+
+def hash_upload(uploaded_file):
+    """Calcula el hash (BlockHasher) de los bytes crudos del archivo, bloque a bloque"""
+    hasher = BlockHasher()
+    uploaded_file.seek(0)
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+class LimitedStream(io.RawIOBase):
+    """Flujo de solo lectura que falla si se leen más de `limit` bytes"""
+
+    def __init__(self, stream, limit=MAX_DECOMPRESSED_SIZE):
+        self._stream = stream
+        self.limit = limit
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        size = self._stream.readinto(target)
+        self.bytes_read += size
+        if self.bytes_read > self.limit:
+            raise ValueError(
+                f'El archivo descomprimido supera el máximo de {self.limit // (1024 * 1024)} MB'
+            )
+        return size
+
+
+def detect_compression(f):
+    """Formato de compresión según los bytes mágicos del inicio de `f`, o None"""
+    position = f.tell()
+    head = f.read(4)
+    f.seek(position)
+
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _zip_member(archive):
+    """Primer .arff del zip, o su primer archivo si no hay ninguno"""
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    if not members:
+        raise ValueError('El archivo zip está vacío')
+    for info in members:
+        if info.filename.lower().endswith('.arff'):
+            return info
+    return members[0]
+
+
+def decompress(stream, compression):
+    """
+    Flujo binario descomprimido sobre `stream`. gzip y bz2 se leen de forma
+    secuencial; zip necesita un archivo con seek() para leer su directorio.
+    """
+    if compression == GZIP_COMPRESSION:
+        decompressed = gzip.GzipFile(fileobj=stream, mode='rb')
+    elif compression == BZ2_COMPRESSION:
+        decompressed = bz2.BZ2File(stream, mode='rb')
+    elif compression == ZIP_COMPRESSION:
+        archive = zipfile.ZipFile(stream)
+        decompressed = archive.open(_zip_member(archive))
+    else:
+        raise ValueError(f'Compresión no soportada: {compression}')
+
+    return io.BufferedReader(LimitedStream(decompressed))
+
+
+def open_text(uploaded_file, encoding='utf-8'):
+    """
+    Abre el archivo subido como flujo de texto decodificado por bloques,
+    descomprimiéndolo si es gzip, bz2 o zip.
+    """
+    uploaded_file.seek(0)
+    compression = detect_compression(uploaded_file)
+
+    if compression is None:
+        return open_chunks(uploaded_file.chunks(), encoding)
+    if compression == ZIP_COMPRESSION:
+        return io.TextIOWrapper(decompress(uploaded_file, compression), encoding=encoding)
+
+    raw = io.BufferedReader(ChunkStream(uploaded_file.chunks()))
+    return io.TextIOWrapper(decompress(raw, compression), encoding=encoding)
+
+
+def open_file_text(f, on_bytes=None, encoding='utf-8'):
+    """
+    Igual que open_text() para un archivo en disco abierto en binario.
+    `on_bytes(n)` recibe los bytes leídos del archivo (comprimidos).
+    """
+    compression = detect_compression(f)
+
+    if compression == ZIP_COMPRESSION:
+        return io.TextIOWrapper(decompress(f, compression), encoding=encoding)
+
+    chunks = file_chunks(f, on_chunk=on_bytes)
+    if compression is None:
+        return open_chunks(chunks, encoding)
+
+    raw = io.BufferedReader(ChunkStream(chunks))
+    return io.TextIOWrapper(decompress(raw, compression), encoding=encoding)
+
+
+def open_chunks(chunks, encoding='utf-8'):
+    """Flujo de texto decodificado por bloques sobre un iterable de bytes"""
+    raw = io.BufferedReader(ChunkStream(chunks))
+    return io.TextIOWrapper(raw, encoding=encoding)
+
+
+def read_text(uploaded_file, encoding='utf-8'):
+    """Lee el archivo completo como str (solo para la lectura CSV tolerante)"""
+    return open_text(uploaded_file, encoding).read()
+
+
+def file_chunks(f, chunk_size=UPLOAD_CHUNK_SIZE, on_chunk=None):
+    """Bloques de bytes de un archivo abierto en binario; `on_chunk(n)` tras cada uno"""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        if on_chunk is not None:
+            on_chunk(len(chunk))
+        yield chunk
+
+
+def spool_upload(uploaded_file, directory):
+    """
+    Copia el archivo subido a `directory` bloque a bloque, para que un
+    trabajo en segundo plano lo procese después de terminar la petición.
+    Devuelve la ruta de la copia.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix='.arff', dir=directory)
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            uploaded_file.seek(0)
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+
+    uploaded_file.seek(0)
+    return path
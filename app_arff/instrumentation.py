@@ -0,0 +1,316 @@
+"""
+Instrumentación ligera por etapas.
+
+Cada petición (TimingMiddleware) o trabajo de ingesta abre un registro de
+tiempos en una ContextVar; el código marca sus etapas con
+
+    with stage('parse', nbytes=size) as s:
+        ...
+        s.rows = len(df)
+
+Fuera de un registro (o con settings.ARFF_METRICS_ENABLED desactivado)
+stage() devuelve un objeto vacío sin medir nada. Al terminar la petición
+los tiempos se envían en la cabecera Server-Timing, se escriben como una
+línea JSON en el logger 'app_arff.metrics' y se acumulan en histogramas del
+proceso que /metrics sirve en formato de texto de Prometheus.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+
+logger = logging.getLogger('app_arff.metrics')
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Límites (segundos) de los histogramas de duración
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Vista usada como etiqueta cuando la URL no resuelve (evita una serie por ruta)
+UNMATCHED_VIEW = 'unmatched'
+
+_current = ContextVar('arff_timings', default=None)
+
+
+def is_enabled():
+    return settings.ARFF_METRICS_ENABLED
+
+
+class Timings:
+    """Duración, filas y bytes acumulados por etapa de una petición o trabajo"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # nombre -> [segundos, filas, bytes], en orden de primera aparición
+        self.stages = {}
+
+    def add(self, name, seconds, rows=None, nbytes=None):
+        totals = self.stages.get(name)
+        if totals is None:
+            totals = self.stages[name] = [0.0, 0, 0]
+        totals[0] += seconds
+        if rows:
+            totals[1] += int(rows)
+        if nbytes:
+            totals[2] += int(nbytes)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Valor de la cabecera Server-Timing (milisegundos por etapa y total)"""
+        parts = [f'{name};dur={totals[0] * 1000:.1f}' for name, totals in self.stages.items()]
+        parts.append(f'total;dur={self.elapsed() * 1000:.1f}')
+        return ', '.join(parts)
+
+    def as_dict(self):
+        summary = {}
+        for name, (seconds, rows, nbytes) in self.stages.items():
+            summary[name] = {'ms': round(seconds * 1000, 3)}
+            if rows:
+                summary[name]['rows'] = rows
+            if nbytes:
+                summary[name]['bytes'] = nbytes
+        return summary
+
+
+class _Stage:
+    __slots__ = ('timings', 'name', 'rows', 'nbytes', 'start')
+
+    def __init__(self, timings, name, rows, nbytes):
+        self.timings = timings
+        self.name = name
+        self.rows = rows
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timings.add(self.name, time.perf_counter() - self.start, self.rows, self.nbytes)
+        return False
+
+
+class _NullStage:
+    """Etapa que no mide nada; admite asignar rows/nbytes igual que _Stage"""
+
+    rows = None
+    nbytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, rows=None, nbytes=None):
+    """Context manager que suma la duración de la etapa `name` al registro actual"""
+    timings = _current.get()
+    if timings is None:
+        return _NULL_STAGE
+    return _Stage(timings, name, rows, nbytes)
+
+
+@contextmanager
+def recording():
+    """Abre un registro de tiempos para el contexto actual; None si la instrumentación está desactivada"""
+    if not is_enabled():
+        yield None
+        return
+
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def log_timings(event, timings, **fields):
+    """Línea de log estructurada (JSON) con la duración total y las etapas"""
+    if timings is None or not logger.isEnabledFor(logging.INFO):
+        return
+    record = {'event': event}
+    record.update(fields)
+    record['duration_ms'] = round(timings.elapsed() * 1000, 3)
+    record['stages'] = timings.as_dict()
+    logger.info(json.dumps(record, default=str))
+
+
+# Métricas en formato Prometheus
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # etiquetas -> [conteos por bucket (el último es +Inf), suma]
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = (('le', _number(bound)),)
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Histogramas y contadores del proceso alimentados con los Timings de cada petición"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Histogram(
+            'arff_request_duration_seconds', 'Duración de las peticiones HTTP.', ('view', 'method', 'status')
+        )
+        self.stages = Histogram(
+            'arff_stage_duration_seconds', 'Duración de cada etapa de una petición o trabajo.', ('view', 'stage')
+        )
+        self.rows = Counter('arff_rows_processed_total', 'Filas procesadas por etapa.', ('view', 'stage'))
+        self.bytes = Counter('arff_bytes_processed_total', 'Bytes procesados por etapa.', ('view', 'stage'))
+
+    def observe_stages(self, view, stages):
+        """Acumula {etapa: [segundos, filas, bytes]} (Timings.stages) bajo la vista `view`"""
+        with self._lock:
+            for name, (seconds, rows, nbytes) in stages.items():
+                labels = (view, name)
+                self.stages.observe(labels, seconds)
+                if rows:
+                    self.rows.inc(labels, rows)
+                if nbytes:
+                    self.bytes.inc(labels, nbytes)
+
+    def observe_request(self, view, method, status_code, timings):
+        self.observe_stages(view, timings.stages)
+        with self._lock:
+            self.requests.observe((view, method, str(status_code)), timings.elapsed())
+
+    def render(self, gauges=()):
+        """
+        Texto de Prometheus con las métricas acumuladas y los valores
+        instantáneos `gauges` [(nombre, ayuda, tipo, valor)].
+        """
+        lines = []
+        with self._lock:
+            for metric in (self.requests, self.stages, self.rows, self.bytes):
+                lines.extend(metric.render())
+        for name, documentation, kind, value in gauges:
+            lines.extend([f'# HELP {name} {documentation}', f'# TYPE {name} {kind}', f'{name} {_number(value)}'])
+        return '\n'.join(lines) + '\n'
+
+
+_default_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Registro de métricas del proceso"""
+    global _default_registry
+    with _registry_lock:
+        if _default_registry is None:
+            _default_registry = MetricsRegistry()
+        return _default_registry
+
+
+class TimingMiddleware:
+    """
+    Mide cada petición: cabecera Server-Timing, línea de log y métricas.
+    Django la descarta al arrancar si settings.ARFF_METRICS_ENABLED es False.
+    Funciona en modo síncrono (WSGI) y asíncrono (ASGI) sin adaptadores.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with recording() as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        with recording() as timings:
+            response = await self.get_response(request)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        match = request.resolver_match
+        view = match.url_name if match is not None and match.url_name else UNMATCHED_VIEW
+
+        response['Server-Timing'] = timings.server_timing()
+        get_registry().observe_request(view, request.method, response.status_code, timings)
+        log_timings('request', timings, view=view, method=request.method, path=request.path,
+                    status=response.status_code)
+        return response
@@ -0,0 +1,454 @@
+"""
+Trabajos de ingesta en segundo plano.
+
+La subida copia el archivo a disco y devuelve enseguida un id de trabajo;
+el parseo y el guardado en el almacén columnar se ejecutan en un
+ProcessPoolExecutor local, fuera del worker web. El estado y el progreso
+(bytes leídos, filas parseadas, etapa) se guardan en una tabla SQLite en
+el mismo disco que el almacén, así que cualquier worker puede responder a
+/api/jobs/<id>/ sin broker externo.
+
+Con settings.ARFF_PROGRESSIVE_INGEST la subida parsea antes las primeras
+filas (publish_preview) y el trabajo va publicando cada bloque parseado
+como dataset parcial en el almacén, de modo que la primera página no
+depende del tamaño del archivo y /api/data/ sirve las filas ya listas.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from . import arff_reader, ingest, parallel_reader
+from .compaction import compact_dataset
+from .dataset_store import get_store
+from .instrumentation import get_registry, log_timings, recording, stage
+from .parallel_reader import read_arff_path
+from .sparse import SparseFrame
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+STAGE_QUEUED = 'queued'
+STAGE_PARSING = 'parsing'
+STAGE_SAVING = 'saving'
+STAGE_DONE = 'done'
+
+# Intervalo mínimo entre escrituras de progreso en la tabla
+PROGRESS_INTERVAL = 0.5
+
+# Filas de la vista previa publicada al aceptar la subida (la primera página)
+PREVIEW_ROWS = 1000
+
+# Nombre del segmento de la vista previa dentro del dataset parcial
+PREVIEW_SEGMENT = 'preview'
+
+# Un trabajo en marcha sin latido en este tiempo se considera abandonado
+# (p. ej. el proceso que lo ejecutaba murió) y no se reutiliza
+STALE_JOB_SECONDS = 300
+
+# Intervalo del latido de un trabajo en marcha (menor que STALE_JOB_SECONDS)
+HEARTBEAT_SECONDS = 30
+
+# Un trabajo en cola no recibe actualizaciones mientras espera a que el pool
+# quede libre; solo se da por perdido (el worker que lo encoló se reinició)
+# pasado este tiempo desde su creación
+QUEUED_JOB_SECONDS = 6 * 60 * 60
+
+JOB_FIELDS = (
+    'id', 'cache_key', 'filename', 'status', 'stage', 'bytes_total',
+    'bytes_read', 'rows', 'error', 'created', 'updated',
+)
+
+
+class JobStore:
+    """Tabla de trabajos en SQLite, compartida entre procesos"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._execute('PRAGMA journal_mode=WAL')
+        self._execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY, cache_key TEXT, filename TEXT,'
+            ' status TEXT, stage TEXT, bytes_total INTEGER, bytes_read INTEGER,'
+            ' rows INTEGER, error TEXT, created REAL, updated REAL)'
+        )
+        self._execute('CREATE INDEX IF NOT EXISTS jobs_cache_key ON jobs (cache_key)')
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _execute(self, sql, params=()):
+        connection = self._connect()
+        try:
+            with connection:
+                return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def create_or_get_active(self, cache_key, filename, bytes_total):
+        """
+        Crea un trabajo para `cache_key` salvo que ya haya uno en curso, en una
+        sola transacción (BEGIN IMMEDIATE toma el bloqueo de escritura antes de
+        consultar, así dos subidas simultáneas del mismo archivo no crean dos
+        trabajos). Devuelve (trabajo, creado).
+        """
+        connection = self._connect()
+        connection.isolation_level = None
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                rows = connection.execute(*self._active_query(cache_key)).fetchall()
+                if rows:
+                    job, created = dict(rows[0]), False
+                else:
+                    job, created = self._new_job(cache_key, filename, bytes_total), True
+                    connection.execute(*self._insert_query(job))
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+            return job, created
+        finally:
+            connection.close()
+
+    def _new_job(self, cache_key, filename, bytes_total):
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'cache_key': cache_key,
+            'filename': filename,
+            'status': STATUS_QUEUED,
+            'stage': STAGE_QUEUED,
+            'bytes_total': bytes_total,
+            'bytes_read': 0,
+            'rows': 0,
+            'error': None,
+            'created': now,
+            'updated': now,
+        }
+        return job
+
+    def _insert_query(self, job):
+        return (
+            f"INSERT INTO jobs ({', '.join(JOB_FIELDS)}) VALUES ({', '.join('?' for _ in JOB_FIELDS)})",
+            [job[field] for field in JOB_FIELDS],
+        )
+
+    def _active_query(self, cache_key):
+        now = time.time()
+        return (
+            'SELECT * FROM jobs WHERE cache_key = ?'
+            ' AND ((status = ? AND created > ?) OR (status = ? AND updated > ?))'
+            ' ORDER BY created DESC LIMIT 1',
+            (cache_key, STATUS_QUEUED, now - QUEUED_JOB_SECONDS, STATUS_RUNNING, now - STALE_JOB_SECONDS),
+        )
+
+    def update(self, job_id, **fields):
+        fields['updated'] = time.time()
+        assignments = ', '.join(f'{field} = ?' for field in fields)
+        self._execute(f'UPDATE jobs SET {assignments} WHERE id = ?', list(fields.values()) + [job_id])
+
+    def get(self, job_id):
+        rows = self._execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def find_active(self, cache_key):
+        """Trabajo en curso (no abandonado) para el mismo archivo, o None"""
+        rows = self._execute(*self._active_query(cache_key))
+        return dict(rows[0]) if rows else None
+
+
+def job_progress(job):
+    """Fracción leída del archivo (0..1) según los bytes consumidos"""
+    if job['status'] == STATUS_DONE:
+        return 1.0
+    if not job['bytes_total']:
+        return 0.0
+    return min(1.0, job['bytes_read'] / job['bytes_total'])
+
+
+class _ProgressReporter:
+    """Acumula bytes y filas y los escribe en la tabla como mucho cada PROGRESS_INTERVAL"""
+
+    def __init__(self, jobs, job_id):
+        self.jobs = jobs
+        self.job_id = job_id
+        self.bytes_read = 0
+        self.rows = 0
+        self.last_write = 0.0
+
+    def add_bytes(self, n):
+        self.bytes_read += n
+        self._maybe_write()
+
+    def set_rows(self, rows):
+        self.rows = rows
+        self._maybe_write()
+
+    def _maybe_write(self):
+        now = time.monotonic()
+        if now - self.last_write >= PROGRESS_INTERVAL:
+            self.last_write = now
+            self.jobs.update(self.job_id, bytes_read=self.bytes_read, rows=self.rows)
+
+
+class _Heartbeat:
+    """Hilo que renueva `updated` del trabajo cada HEARTBEAT_SECONDS mientras está en marcha"""
+
+    def __init__(self, jobs, job_id):
+        self.jobs = jobs
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            try:
+                self.jobs.update(self.job_id)
+            except sqlite3.Error as e:
+                logger.warning('Latido del trabajo %s fallido: %s', self.job_id, e)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def publish_preview(path, cache_key, rows=PREVIEW_ROWS):
+    """
+    Parsea las primeras `rows` filas de `path` y las publica como dataset
+    parcial. Devuelve el número de filas publicadas, o None si el archivo
+    es disperso o el lector tipado no lo acepta (se espera al trabajo).
+    """
+    store = get_store()
+    store.delete_partial(cache_key)
+
+    try:
+        with stage('preview') as s, open(path, 'rb') as f:
+            header, df = arff_reader.read_arff_stream(ingest.open_file_text(f), max_rows=rows)
+            s.rows = len(df)
+    except (arff_reader.ARFFError, UnicodeDecodeError, ValueError) as e:
+        logger.warning('Sin vista previa para %s: %s', cache_key[:12], e)
+        return None
+
+    if isinstance(df, SparseFrame) or not len(df):
+        return None
+
+    try:
+        segment = store.save_segment(cache_key, PREVIEW_SEGMENT, df)
+        store.publish_partial(cache_key, header.to_metadata(), [segment])
+    except OSError as e:
+        logger.warning('No se pudo publicar la vista previa: %s', e)
+        store.delete_partial(cache_key)
+        return None
+    return len(df)
+
+
+class _PartialPublisher:
+    """
+    Publica en el almacén cada bloque parseado por el trabajo. La vista
+    previa sigue visible hasta que los bloques cubren al menos sus filas.
+    """
+
+    def __init__(self, store, cache_key, partial):
+        self.store = store
+        self.cache_key = cache_key
+        self.metadata = partial.metadata
+        self.preview_rows = partial.rows_ready
+        self.segments = []
+        self.rows = 0
+        self.failed = False
+
+    def add(self, df):
+        if self.failed or not len(df):
+            return
+
+        try:
+            with stage('publish', rows=len(df)):
+                self.segments.append(self.store.save_segment(self.cache_key, f'{len(self.segments):06d}', df))
+                self.rows += len(df)
+                if self.rows >= self.preview_rows:
+                    self.store.publish_partial(self.cache_key, self.metadata, self.segments)
+        except OSError as e:
+            # Publicar es opcional: el trabajo sigue y el dataset completo se guarda al final
+            logger.warning('No se pudo publicar el bloque parcial: %s', e)
+            self.failed = True
+
+
+def run_ingest_job(job_id, path, cache_key):
+    """
+    Parsea el archivo copiado en `path` y lo guarda en el almacén con
+    `cache_key`. Se ejecuta en un proceso del pool y devuelve los tiempos
+    por etapa (Timings.stages) para las métricas del worker web, o None.
+    """
+    with recording() as timings:
+        with _Heartbeat(get_job_store(), job_id):
+            _ingest(job_id, path, cache_key)
+        log_timings('ingest_job', timings, job_id=job_id, cache_key=cache_key)
+    return None if timings is None else timings.stages
+
+
+def _ingest(job_id, path, cache_key):
+    jobs = get_job_store()
+    store = get_store()
+    reporter = _ProgressReporter(jobs, job_id)
+    jobs.update(job_id, status=STATUS_RUNNING, stage=STAGE_PARSING)
+    size = os.path.getsize(path)
+
+    # Solo se publican bloques si la subida dejó una vista previa con la metadata
+    partial = store.load_partial(cache_key)
+    on_block = _PartialPublisher(store, cache_key, partial).add if partial is not None else None
+
+    try:
+        try:
+            with stage('parse', nbytes=size) as s:
+                header, df = read_arff_path(
+                    path, progress=reporter.set_rows, on_bytes=reporter.add_bytes, on_block=on_block
+                )
+                s.rows = len(df)
+            metadata = header.to_metadata()
+        except arff_reader.InvalidRowError:
+            # La lectura CSV tolerante descartaría o desordenaría la fila sin avisar
+            raise
+        except arff_reader.ARFFError as e:
+            logger.warning('Lector ARFF falló (%s), usando lectura CSV robusta...', e)
+            from .api_views import ARFFUploadAPI
+
+            with stage('decode', nbytes=size), open(path, 'rb') as f:
+                text = ingest.open_file_text(f).read()
+            metadata, df = ARFFUploadAPI().legacy_parse(text)
+
+        if df is None:
+            raise ValueError('No se pudo procesar el archivo. Formato de datos incompatible.')
+
+        jobs.update(job_id, stage=STAGE_SAVING, bytes_read=size, rows=len(df))
+        with stage('compact', rows=len(df)):
+            df = compact_dataset(df, metadata)
+        with stage('store', rows=len(df)):
+            store.save(cache_key, df, metadata)
+
+        jobs.update(job_id, status=STATUS_DONE, stage=STAGE_DONE)
+        logger.debug('Trabajo %s terminado: %d filas', job_id, len(df))
+    except Exception as e:
+        logger.exception('Trabajo %s falló: %s', job_id, e)
+        jobs.update(job_id, status=STATUS_ERROR, error=f'Error procesando archivo: {str(e)}')
+    finally:
+        # El dataset completo ya está en el almacén (o el trabajo falló)
+        store.delete_partial(cache_key)
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _init_worker(settings_module):
+    """Inicializa Django en los procesos del pool (necesario si se lanzan con spawn)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    # Cada proceso de ingesta parsea con su parte de los workers de parseo
+    parallel_reader.limit_workers(settings.ARFF_PARSE_WORKERS // settings.ARFF_INGEST_WORKERS)
+
+
+_default_jobs = None
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_job_store():
+    """Tabla de trabajos en settings.ARFF_JOB_DB_PATH"""
+    global _default_jobs
+    if _default_jobs is None:
+        _default_jobs = JobStore(settings.ARFF_JOB_DB_PATH)
+    return _default_jobs
+
+
+def get_executor():
+    """Pool de procesos del worker web, creado en el primer uso"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.ARFF_INGEST_WORKERS,
+                # Sin fork: el worker web tiene hilos en marcha
+                mp_context=parallel_reader.process_context(),
+                initializer=_init_worker,
+                initargs=(settings.SETTINGS_MODULE,),
+            )
+        return _executor
+
+
+def _reset_executor(executor):
+    """Descarta un pool roto (un proceso murió) para que el siguiente trabajo cree otro"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def submit_job(path, cache_key, filename, bytes_total):
+    """
+    Registra y lanza el trabajo de ingesta de `path`. Si ya hay uno en curso
+    para el mismo archivo se reutiliza y se descarta la copia nueva.
+    Con ingesta progresiva publica antes la vista previa (publish_preview).
+    """
+    jobs = get_job_store()
+
+    job, created = jobs.create_or_get_active(cache_key, filename, bytes_total)
+    if not created:
+        os.unlink(path)
+        return job
+
+    if settings.ARFF_PROGRESSIVE_INGEST:
+        # Primera página lista antes de encolar el trabajo, sea cual sea el tamaño del archivo
+        publish_preview(path, cache_key)
+
+    executor = get_executor()
+
+    try:
+        future = executor.submit(run_ingest_job, job['id'], path, cache_key)
+    except Exception as e:
+        _reset_executor(executor)
+        os.unlink(path)
+        jobs.update(job['id'], status=STATUS_ERROR, error=f'No se pudo iniciar el procesamiento: {str(e)}')
+        return jobs.get(job['id'])
+
+    def on_done(future):
+        # run_ingest_job captura sus errores; aquí solo llegan fallos del pool
+        error = future.exception()
+        if error is not None:
+            logger.error('Trabajo %s abortado: %r', job['id'], error)
+            jobs.update(job['id'], status=STATUS_ERROR, error=f'El procesamiento se interrumpió: {error!r}')
+            _reset_executor(executor)
+            get_store().delete_partial(cache_key)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        elif future.result():
+            # Las etapas medidas en el proceso del pool se acumulan en las métricas de este worker
+            get_registry().observe_stages('ingest_job', future.result())
+
+    future.add_done_callback(on_done)
+    return job
@@ -0,0 +1,321 @@
+"""
+Parseo en paralelo de la sección @data de un ARFF en disco.
+
+La sección de datos se divide en rangos de bytes que empiezan y terminan en
+un salto de línea fuera de comillas (un valor entre comillas puede contener
+saltos de línea), cada rango se parsea en un proceso distinto con el mismo
+lector tipado (arff_reader.read_data) y los bloques de columnas se
+concatenan en orden. Todos los rangos parten de las categorías nominales
+declaradas en la cabecera, así que sus códigos coinciden; los valores no
+declarados se unen al final con union_categoricals.
+
+Los rangos se reparten en un pool de procesos compartido por todo el
+proceso (get_parse_executor), lanzado con forkserver: el worker web tiene
+hilos (caché, vistas asíncronas, SQLite) y un fork los copiaría a medias.
+Dentro de los procesos de los trabajos de ingesta el pool se reduce
+(limit_workers) para no multiplicar trabajos × workers de parseo.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+from django.conf import settings
+from pandas.api.types import union_categoricals
+
+from . import arff_reader, ingest
+
+
+logger = logging.getLogger(__name__)
+
+# Tamaño mínimo de cada rango: por debajo no compensa repartir el trabajo
+MIN_RANGE_BYTES = 16 * 1024 * 1024
+
+# Bloque de lectura al contar comillas hasta cada frontera
+SCAN_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+class _RangeReader(io.RawIOBase):
+    """Flujo binario de solo lectura sobre los bytes [start, end) de un archivo"""
+
+    def __init__(self, f, start, end):
+        self._file = f
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        size = min(len(target), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._file.read(size)
+        target[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def _quote_count(data, quote, escaped):
+    """Comillas no escapadas de un bloque de bytes"""
+    return data.count(quote) - data.count(escaped)
+
+
+def _quote_parity(data, quote, escaped, odd):
+    """
+    Paridad de comillas tras `data` (líneas completas) partiendo de `odd`.
+    Como en el lector, las líneas que empiezan por % son comentarios y sus
+    comillas no cuentan; un % en medio de una línea es parte del valor.
+    """
+    if b'%' not in data:
+        return odd ^ bool(_quote_count(data, quote, escaped) % 2)
+
+    for line in data.splitlines(keepends=True):
+        if not line.lstrip(b' \t').startswith(b'%'):
+            odd ^= bool(_quote_count(line, quote, escaped) % 2)
+    return odd
+
+
+def split_data_ranges(f, start, end, n_ranges, quotechar="'"):
+    """
+    Fronteras [start, ..., end] que reparten [start, end) en como mucho
+    `n_ranges` rangos de tamaño parecido. Cada frontera interior queda justo
+    después de un salto de línea con un número par de comillas no escapadas
+    desde `start`, es decir, fuera de cualquier valor entre comillas. Las
+    comillas de los comentarios (%) no cuentan.
+    """
+    quote = quotechar.encode('ascii')
+    escaped = b'\\' + quote
+
+    boundaries = [start]
+    position = start
+    odd = False
+
+    for i in range(1, n_ranges):
+        target = start + (end - start) * i // n_ranges
+        if target <= position:
+            continue
+
+        # Paridad de comillas hasta el punto de corte aproximado, por bloques
+        # completados hasta el final de línea (un comentario o una comilla
+        # escapada nunca quedan partidos entre dos bloques)
+        f.seek(position)
+        while position < target:
+            block = f.read(min(SCAN_BLOCK_BYTES, target - position))
+            if not block:
+                break
+            if not block.endswith(b'\n'):
+                block += f.readline()
+            odd = _quote_parity(block, quote, escaped, odd)
+            position += len(block)
+
+        # Avanzar hasta el final de una línea que no quede dentro de comillas
+        f.seek(position)
+        while odd and position < end:
+            line = f.readline()
+            if not line:
+                position = end
+                break
+            odd = _quote_parity(line, quote, escaped, odd)
+            position += len(line)
+
+        if position >= end:
+            break
+        boundaries.append(position)
+
+    boundaries.append(end)
+    return boundaries
+
+
+def _count_rows(f, start, end, quotechar):
+    """
+    Líneas de [start, end) tal como las numera el parser: las que terminan
+    fuera de comillas (un valor con saltos de línea cuenta como una).
+    """
+    quote = quotechar.encode('ascii')
+    escaped = b'\\' + quote
+    odd = False
+    count = 0
+    f.seek(start)
+    position = start
+    while position < end:
+        line = f.readline()
+        if not line:
+            break
+        odd = _quote_parity(line, quote, escaped, odd)
+        count += not odd
+        position += len(line)
+    return count
+
+
+def parse_range(path, start, end, header, quotechar="'", progress=None, data_start=None):
+    """
+    Parsea los bytes [start, end) de la sección @data en un DataFrame tipado.
+    `data_start` (offset de @data) sirve para dar la línea del archivo en
+    los errores de filas.
+    """
+    with open(path, 'rb') as f:
+        raw = io.BufferedReader(_RangeReader(f, start, end))
+        buffer = io.TextIOWrapper(raw, encoding='utf-8')
+        try:
+            return arff_reader.read_data(
+                buffer, header, quotechar=quotechar, progress=progress, first_line=header.data_line
+            )
+        except arff_reader.BadLineError as e:
+            if not data_start:
+                raise
+            # Solo ante un error se cuentan las líneas anteriores al rango
+            line = e.line + _count_rows(f, data_start, start, quotechar)
+            raise arff_reader.BadLineError(line, e.expected, e.seen) from None
+
+
+_parse_executor = None
+_parse_executor_lock = threading.Lock()
+
+# Límite de workers de parseo fijado por limit_workers (None = settings)
+_worker_limit = None
+
+
+def limit_workers(n):
+    """Limita los workers de parseo de este proceso (p. ej. en los procesos de ingesta)"""
+    global _worker_limit
+    _worker_limit = max(1, n)
+
+
+def parse_workers():
+    """Workers de parseo de este proceso"""
+    if _worker_limit is not None:
+        return _worker_limit
+    return settings.ARFF_PARSE_WORKERS
+
+
+def process_context():
+    """forkserver donde existe (los hijos no heredan los hilos del padre); si no, spawn"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # El servidor importa el lector una vez; cada hijo lo hereda ya cargado
+        context.set_forkserver_preload(['app_arff.arff_reader'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def get_parse_executor():
+    """Pool de parseo del proceso, creado en el primer uso"""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            _parse_executor = ProcessPoolExecutor(max_workers=parse_workers(), mp_context=process_context())
+        return _parse_executor
+
+
+def _reset_parse_executor(executor):
+    """Descarta un pool roto para que la siguiente lectura cree otro"""
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is executor:
+            _parse_executor = None
+    executor.shutdown(wait=False)
+
+
+def concat_frames(frames, header):
+    """Concatena en orden los DataFrames de cada rango, unificando las categorías nominales"""
+    if len(frames) == 1:
+        return frames[0]
+
+    columns = {}
+    for attr in header.attributes:
+        parts = [frame[attr.name] for frame in frames]
+        if attr.type == arff_reader.DATE_TYPE:
+            parts = arff_reader.align_timezones(parts)
+        if attr.type == arff_reader.NOMINAL_TYPE:
+            # Las categorías declaradas son un prefijo común: solo se recodifican los valores extra
+            columns[attr.name] = union_categoricals(parts)
+        else:
+            columns[attr.name] = pd.concat(parts, ignore_index=True).array
+        del parts
+
+    return pd.DataFrame(columns, copy=False)
+
+
+def _read_header(f):
+    """Lee la cabecera desde un archivo binario y devuelve (cabecera, offset de @data)"""
+    lines = (line.decode('utf-8') for line in iter(f.readline, b''))
+    header = arff_reader.parse_header(lines)
+    return header, f.tell()
+
+
+def read_arff_path(path, progress=None, on_bytes=None, workers=None, on_block=None):
+    """
+    Lee un ARFF desde `path` y devuelve (cabecera, datos).
+
+    Los datos densos se parsean en como mucho `workers` rangos (por defecto
+    parse_workers()) en el pool compartido; los archivos pequeños,
+    comprimidos, con un solo worker o en formato disperso se leen con el
+    lector por flujo.
+    `progress(filas)` y `on_bytes(n)` informan del avance; `on_block(df)`
+    recibe los bloques tipados en el orden del archivo.
+    """
+    workers = workers or parse_workers()
+
+    with open(path, 'rb') as f:
+        if ingest.detect_compression(f) is not None:
+            # Un archivo comprimido solo se puede leer en orden
+            return arff_reader.read_arff_stream(
+                ingest.open_file_text(f, on_bytes), progress=progress, on_block=on_block
+            )
+
+        header, data_start = _read_header(f)
+        end = os.fstat(f.fileno()).st_size
+        sample = f.read(arff_reader.QUOTE_SAMPLE_SIZE).decode('utf-8', errors='ignore')
+
+        n_ranges = min(workers, max(1, (end - data_start) // MIN_RANGE_BYTES))
+        quotechar = arff_reader.detect_quotechar(sample)
+        # Con comillas mezcladas no se pueden buscar fronteras por paridad de una sola comilla
+        if n_ranges < 2 or arff_reader.is_sparse_sample(sample) or quotechar is None:
+            f.seek(0)
+            return arff_reader.read_arff_stream(
+                ingest.open_file_text(f, on_bytes), progress=progress, on_block=on_block
+            )
+
+        boundaries = split_data_ranges(f, data_start, end, n_ranges, quotechar)
+
+    if on_bytes is not None:
+        on_bytes(data_start)
+
+    frames = [None] * (len(boundaries) - 1)
+    rows = 0
+    # Rangos ya entregados a on_block: solo se entrega el prefijo contiguo
+    published = 0
+    executor = get_parse_executor()
+    futures = {
+        executor.submit(parse_range, path, start, stop, header, quotechar, data_start=data_start): i
+        for i, (start, stop) in enumerate(zip(boundaries, boundaries[1:]))
+    }
+    try:
+        for future in as_completed(futures):
+            i = futures[future]
+            frames[i] = future.result()
+            rows += len(frames[i])
+            if on_bytes is not None:
+                on_bytes(boundaries[i + 1] - boundaries[i])
+            if progress is not None:
+                progress(rows)
+            while on_block is not None and published < len(frames) and frames[published] is not None:
+                on_block(frames[published])
+                published += 1
+    except BrokenProcessPool:
+        _reset_parse_executor(executor)
+        raise
+    except Exception:
+        # Los rangos pendientes no se parsean; el pool sigue sirviendo a otras lecturas
+        for future in futures:
+            future.cancel()
+        raise
+
+    logger.debug('@data parseada en paralelo: %d rangos, %d filas', len(frames), rows)
+    return header, concat_frames(frames, header)
+
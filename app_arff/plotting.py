@@ -0,0 +1,203 @@
+"""
+Datos de gráficos reducidos para datasets grandes.
+
+En lugar de enviar todas las filas al navegador, /api/plot/ devuelve:
+
+- `bins`: un histograma 2D (densidad) de x/y sobre una rejilla fija,
+  calculado con un único bincount; solo se envían las celdas no vacías.
+- `lttb`: la serie x/y ordenada por x y reducida con Largest-Triangle-
+  Three-Buckets a un número acotado de puntos que conserva la forma visual.
+
+Opcionalmente una columna nominal `color` separa los conteos o las series
+por categoría. El tamaño de la respuesta depende de la resolución pedida,
+no del número de filas.
+"""
+import numpy as np
+
+from .query import QueryError, column_view
+
+
+PLOT_MODES = ('bins', 'lttb')
+
+DEFAULT_BINS = 100
+MAX_BINS = 1000
+
+DEFAULT_POINTS = 2000
+MAX_POINTS = 20000
+
+# Máximo de categorías de la columna de color
+MAX_COLOR_CATEGORIES = 32
+
+# Nanosegundos por milisegundo: las fechas se envían como ms desde epoch
+NS_PER_MS = 1000000
+
+
+def _axis_view(data, name, metadata):
+    if name not in data.columns:
+        raise QueryError(f"Columna desconocida: '{name}'")
+    view = column_view(data, name, metadata)
+    if view.kind == 'category':
+        raise QueryError(f"La columna '{name}' no es numérica ni de fecha")
+    return view
+
+
+def _color_view(data, name, metadata):
+    if name not in data.columns:
+        raise QueryError(f"Columna desconocida: '{name}'")
+    view = column_view(data, name, metadata)
+    if view.kind != 'category':
+        raise QueryError(f"La columna de color '{name}' debe ser nominal")
+    if len(view.categories) > MAX_COLOR_CATEGORIES:
+        raise QueryError(
+            f"La columna de color '{name}' tiene demasiadas categorías (máximo {MAX_COLOR_CATEGORIES})"
+        )
+    return view
+
+
+def _axis_values(view, values):
+    """Valores listos para JSON; las fechas pasan a milisegundos desde epoch"""
+    if view.kind == 'datetime':
+        values = values / NS_PER_MS
+    return values.tolist()
+
+
+def binned_density(x, y, bins, color=None, n_colors=0):
+    """
+    Conteos de una rejilla bins×bins sobre los puntos (x, y) no nulos.
+    Devuelve (bordes x, bordes y, índices de celda x, y, color y conteos)
+    solo para las celdas no vacías.
+    """
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    if color is not None:
+        valid &= color >= 0
+    x = x[valid]
+    y = y[valid]
+
+    if not x.size:
+        empty = np.zeros(0, dtype=np.int64)
+        return np.zeros(0), np.zeros(0), empty, empty, empty, empty
+
+    edges = []
+    cells = []
+    for values in (x, y):
+        low, high = values.min(), values.max()
+        if high <= low:
+            low, high = low - 0.5, high + 0.5
+        edges.append(np.linspace(low, high, bins + 1))
+        # La última celda incluye el máximo
+        cells.append(np.minimum(((values - low) / (high - low) * bins).astype(np.int64), bins - 1))
+
+    flat = cells[0] * bins + cells[1]
+    n_groups = 1
+    if color is not None:
+        flat = color[valid].astype(np.int64) * bins * bins + flat
+        n_groups = n_colors
+
+    counts = np.bincount(flat, minlength=n_groups * bins * bins)
+    occupied = np.flatnonzero(counts)
+    group, rest = np.divmod(occupied, bins * bins)
+    cell_x, cell_y = np.divmod(rest, bins)
+    return edges[0], edges[1], cell_x, cell_y, group, counts[occupied]
+
+
+def lttb(x, y, threshold):
+    """
+    Índices de los puntos elegidos por Largest-Triangle-Three-Buckets sobre
+    una serie ordenada por x. El bucle recorre los buckets (como mucho
+    `threshold`); dentro de cada bucket el cálculo es vectorizado.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bordes de los threshold-2 buckets intermedios; el primer y último punto se conservan
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def plot_data(data, metadata, x_name, y_name, mode='bins', resolution=None, color_name=None, order=None):
+    """
+    Datos reducidos del gráfico x/y. `order` es la permutación de filas por x
+    (necesaria para lttb), normalmente la cacheada con el dataset.
+    """
+    if mode not in PLOT_MODES:
+        raise QueryError(f"mode debe ser uno de: {', '.join(PLOT_MODES)}")
+
+    x_view = _axis_view(data, x_name, metadata)
+    y_view = _axis_view(data, y_name, metadata)
+    color_view = _color_view(data, color_name, metadata) if color_name else None
+    colors = color_view.categories.tolist() if color_view is not None else None
+
+    result = {
+        'mode': mode,
+        'x': {'column': x_name, 'type': x_view.kind},
+        'y': {'column': y_name, 'type': y_view.kind},
+        'color': {'column': color_name, 'categories': colors} if color_view is not None else None,
+        'rows': len(data),
+    }
+
+    if mode == 'bins':
+        bins = resolution or DEFAULT_BINS
+        x_edges, y_edges, cell_x, cell_y, group, counts = binned_density(
+            x_view.values, y_view.values, bins,
+            color_view.values if color_view is not None else None, len(colors or []),
+        )
+        result['bins'] = bins
+        result['x']['edges'] = _axis_values(x_view, x_edges)
+        result['y']['edges'] = _axis_values(y_view, y_edges)
+        result['cells'] = {
+            'x': cell_x.tolist(),
+            'y': cell_y.tolist(),
+            'count': counts.tolist(),
+        }
+        if color_view is not None:
+            result['cells']['color'] = group.tolist()
+        return result
+
+    points = resolution or DEFAULT_POINTS
+    if order is None:
+        order = np.argsort(x_view.values, kind='stable')
+
+    # Filas ordenadas por x sin nulos en x ni en y
+    x_sorted = x_view.values[order]
+    y_sorted = y_view.values[order]
+    valid = ~np.isnan(x_sorted) & ~np.isnan(y_sorted)
+
+    groups = [(None, valid)]
+    if color_view is not None:
+        color_sorted = color_view.values[order]
+        groups = [(code, valid & (color_sorted == code)) for code in range(len(colors))]
+
+    series = []
+    for code, mask in groups:
+        xs = x_sorted[mask]
+        ys = y_sorted[mask]
+        chosen = lttb(xs, ys, points)
+        entry = {'x': _axis_values(x_view, xs[chosen]), 'y': _axis_values(y_view, ys[chosen])}
+        if code is not None:
+            entry['color'] = colors[code]
+        series.append(entry)
+
+    result['points'] = points
+    result['series'] = series
+    return result
@@ -0,0 +1,286 @@
+"""
+Ordenación multi-columna y filtros tipados para /api/data/.
+
+Los filtros se evalúan con operaciones vectorizadas de NumPy según el tipo
+declarado en la cabecera ARFF (numérico, nominal, texto, fecha) y las
+permutaciones de orden se calculan con un único lexsort por especificación
+de orden, para guardarlas junto al dataset y reutilizarlas en cada página.
+"""
+import numpy as np
+import pandas as pd
+
+from .arff_reader import NOMINAL_TYPE
+from .search_index import SearchIndex
+from .sparse import SparseFrame
+
+
+class QueryError(ValueError):
+    """Parámetros de ordenación o filtrado inválidos"""
+
+
+# Operadores de filtro admitidos y si necesitan un valor
+FILTER_OPERATORS = {
+    'eq': True,
+    'ne': True,
+    'lt': True,
+    'lte': True,
+    'gt': True,
+    'gte': True,
+    'between': True,
+    'in': True,
+    'not_in': True,
+    'is_null': False,
+    'not_null': False,
+}
+
+RANGE_OPERATORS = ('lt', 'lte', 'gt', 'gte', 'between')
+
+
+class ColumnView:
+    """
+    Vista numérica de una columna para filtrar y ordenar.
+
+    `values` es float64 con NaN para los nulos (columnas numéricas y fechas)
+    o los códigos enteros con -1 para los nulos (columnas categóricas, cuyos
+    textos están en `categories`).
+    """
+
+    def __init__(self, kind, values, categories=None, ordered=False):
+        self.kind = kind
+        self.values = values
+        self.categories = categories
+        # True si el orden de las categorías es el declarado (nominal ARFF)
+        self.ordered = ordered
+
+    @property
+    def is_null(self):
+        if self.kind == 'category':
+            return self.values < 0
+        return np.isnan(self.values)
+
+
+def _column_types(metadata):
+    return {attr['name']: attr['type'] for attr in (metadata or {}).get('attribute_types', [])}
+
+
+def column_view(data, name, metadata=None):
+    """Construye la ColumnView de la columna `name` de un DataFrame o SparseFrame"""
+    declared = _column_types(metadata).get(name)
+
+    if isinstance(data, SparseFrame):
+        j = data.columns.index(name)
+        values = data.matrix[:, j].toarray().ravel()
+        categories = data.categories[j]
+        if categories is None:
+            return ColumnView('numeric', values)
+        codes = np.where(np.isnan(values), -1, values).astype(np.int64)
+        return ColumnView('category', codes, pd.Index(categories).astype(str),
+                          ordered=declared == NOMINAL_TYPE)
+
+    column = data[name]
+    dtype = column.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        return ColumnView('category', column.cat.codes.to_numpy(),
+                          dtype.categories.astype(str), ordered=declared == NOMINAL_TYPE)
+
+    if dtype.kind == 'M':
+        # to_numpy con dtype pasa las fechas con zona horaria a instantes UTC
+        values = column.to_numpy(dtype='datetime64[ns]').view(np.int64).astype(np.float64)
+        values[column.isna().to_numpy()] = np.nan
+        return ColumnView('datetime', values)
+
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        return ColumnView('numeric', column.to_numpy(dtype=np.float64, na_value=np.nan))
+
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    return ColumnView('category', codes, pd.Index(uniques).astype(str))
+
+
+def parse_sort(text, columns):
+    """Convierte 'col1,-col2' en [(col1, False), (col2, True)]"""
+    keys = []
+    for part in (text or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        descending = part.startswith('-')
+        name = part[1:] if descending or part.startswith('+') else part
+        if name not in columns:
+            raise QueryError(f"Columna de orden desconocida: '{name}'")
+        keys.append((name, descending))
+    return keys
+
+
+def normalize_filters(filters, columns):
+    """Valida la lista de filtros [{'column', 'op', 'value'}] y la normaliza"""
+    if not filters:
+        return []
+    if not isinstance(filters, list):
+        raise QueryError('filters debe ser una lista')
+
+    normalized = []
+    for item in filters:
+        if not isinstance(item, dict):
+            raise QueryError('Cada filtro debe ser un objeto {column, op, value}')
+
+        name = item.get('column')
+        op = item.get('op')
+        if name not in columns:
+            raise QueryError(f"Columna de filtro desconocida: '{name}'")
+        if op not in FILTER_OPERATORS:
+            raise QueryError(f"Operador de filtro desconocido: '{op}'")
+
+        value = item.get('value')
+        if FILTER_OPERATORS[op] and value is None:
+            raise QueryError(f"El operador '{op}' requiere un valor")
+        if op == 'between' and (not isinstance(value, list) or len(value) != 2):
+            raise QueryError("'between' requiere una lista [mínimo, máximo]")
+        if op in ('in', 'not_in') and not isinstance(value, list):
+            value = [value]
+
+        normalized.append({'column': name, 'op': op, 'value': value if FILTER_OPERATORS[op] else None})
+    return normalized
+
+
+def _to_number(view, value):
+    """Convierte el valor de un filtro al espacio numérico de la columna"""
+    try:
+        if view.kind == 'datetime':
+            return float(pd.Timestamp(value).as_unit('ns').value)
+        return float(value)
+    except (TypeError, ValueError) as e:
+        raise QueryError(f'Valor no válido para la columna: {value!r}') from e
+
+
+def _predicate(view, op, value):
+    values = view.values
+
+    if op == 'is_null':
+        return view.is_null
+    if op == 'not_null':
+        return ~view.is_null
+
+    if view.kind == 'category':
+        if op in RANGE_OPERATORS:
+            raise QueryError(f"El operador '{op}' solo aplica a columnas numéricas o de fecha")
+        targets = value if op in ('in', 'not_in') else [value]
+        codes = view.categories.get_indexer([str(target) for target in targets])
+        member = np.isin(values, codes[codes >= 0])
+        if op in ('eq', 'in'):
+            return member
+        return ~member & (values >= 0)
+
+    if op in ('in', 'not_in'):
+        member = np.isin(values, [_to_number(view, target) for target in value])
+        return member if op == 'in' else ~member & ~np.isnan(values)
+
+    if op == 'between':
+        low, high = (_to_number(view, bound) for bound in value)
+        return (values >= low) & (values <= high)
+
+    number = _to_number(view, value)
+    with np.errstate(invalid='ignore'):
+        if op == 'eq':
+            return values == number
+        if op == 'ne':
+            return (values != number) & ~np.isnan(values)
+        if op == 'lt':
+            return values < number
+        if op == 'lte':
+            return values <= number
+        if op == 'gt':
+            return values > number
+        return values >= number
+
+
+def filter_mask(data, filters, metadata=None):
+    """Máscara booleana de las filas que cumplen todos los filtros (los nulos nunca cumplen)"""
+    mask = np.ones(len(data), dtype=bool)
+    for item in filters:
+        view = column_view(data, item['column'], metadata)
+        mask &= _predicate(view, item['op'], item['value'])
+    return mask
+
+
+def _sort_key(view, descending):
+    """Clave float64 para lexsort; los nulos (NaN) quedan siempre al final"""
+    if view.kind == 'category':
+        if view.ordered:
+            ranks = np.arange(len(view.categories), dtype=np.float64)
+        else:
+            ranks = np.empty(len(view.categories), dtype=np.float64)
+            ranks[np.argsort(np.asarray(view.categories, dtype=object), kind='stable')] = np.arange(
+                len(view.categories)
+            )
+        key = np.append(ranks, np.nan)[view.values]
+    else:
+        key = view.values
+    return -key if descending else key
+
+
+def sort_permutation(data, sort_keys, metadata=None):
+    """Permutación estable de filas para la lista [(columna, descendente)]"""
+    keys = [_sort_key(column_view(data, name, metadata), descending) for name, descending in sort_keys]
+    # lexsort ordena por la última clave primero
+    permutation = np.lexsort(keys[::-1])
+    if len(data) < np.iinfo(np.int32).max:
+        permutation = permutation.astype(np.int32)
+    return permutation
+
+
+def sort_spec(sort_keys):
+    """Representación canónica de una ordenación, usada como clave de caché"""
+    return ','.join(f"{'-' if descending else ''}{name}" for name, descending in sort_keys)
+
+
+def normalize_query(query, columns):
+    """Valida la consulta y la deja en forma canónica (solo claves no vacías)"""
+    search = str(query.get('search') or '').lower()
+    filters = normalize_filters(query.get('filters'), columns)
+    sort = sort_spec(parse_sort(query.get('sort'), columns))
+
+    normalized = {}
+    if search:
+        normalized['search'] = search
+    if filters:
+        normalized['filters'] = filters
+    if sort:
+        normalized['sort'] = sort
+    return normalized
+
+
+def query_row_ids(dataset_cache, entry, query):
+    """Índices de las filas de la entrada que cumplen la consulta, en el orden pedido"""
+    df = entry.data
+    search = query.get('search')
+    filters = query.get('filters')
+    sort = query.get('sort')
+    mask = None
+
+    if search:
+        if isinstance(df, SparseFrame):
+            row_ids = df.search(search)
+        else:
+            # Índice construido una vez por dataset y guardado con la entrada
+            index = dataset_cache.derived(entry, 'search_index', lambda: SearchIndex(df))
+            row_ids = index.search(search)
+        mask = np.zeros(len(df), dtype=bool)
+        mask[row_ids] = True
+
+    if filters:
+        # Predicados tipados evaluados de forma vectorizada
+        filtered = filter_mask(df, filters, entry.metadata)
+        mask = filtered if mask is None else mask & filtered
+
+    if sort:
+        # Permutación calculada una vez por especificación de orden
+        permutation = dataset_cache.derived(
+            entry, f'sort:{sort}',
+            lambda: sort_permutation(df, parse_sort(sort, list(df.columns)), entry.metadata)
+        )
+        return permutation if mask is None else permutation[mask[permutation]]
+
+    if mask is None:
+        return np.arange(len(df))
+    return np.flatnonzero(mask)
@@ -0,0 +1,37 @@
+"""
+Renderers de DRF para la negociación de contenido de /api/data/.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .encoding import COLUMN_BUFFERS_MEDIA_TYPE
+from .instrumentation import stage
+
+
+class InstrumentedJSONRenderer(JSONRenderer):
+    """JSONRenderer que mide la serialización como etapa 'render' de la petición"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with stage('render') as s:
+            content = super().render(data, accepted_media_type, renderer_context)
+            s.nbytes = len(content)
+        return content
+
+
+class ColumnBuffersRenderer(BaseRenderer):
+    """
+    Acepta `Accept: application/vnd.arff.columns` en la negociación.
+
+    Las páginas se envían desde la vista como StreamingHttpResponse con
+    encode_buffers(); cualquier otra respuesta (errores) se renderiza como
+    JSON para que el cliente siempre pueda leer el mensaje.
+    """
+    media_type = COLUMN_BUFFERS_MEDIA_TYPE
+    format = 'arff-columns'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data, renderer_context=renderer_context)
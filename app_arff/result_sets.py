@@ -0,0 +1,172 @@
+"""
+Conjuntos de resultados filtrados con paginación por cursor.
+
+Una consulta (búsqueda, filtros, orden) sobre un dataset se materializa una
+sola vez como un array de índices de fila. Las páginas siguientes se sirven
+cortando ese array, identificado por un `result_id` estable, y el cliente
+avanza con un cursor opaco. Los conjuntos viven en una caché propia con TTL
+y LRU acotada por bytes.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+# Cambiar si cambia la codificación de las páginas, para invalidar las ETags
+PAGE_ETAG_VERSION = 1
+
+
+class InvalidCursor(ValueError):
+    """Cursor mal formado o manipulado"""
+
+
+def make_result_id(dataset_key, query):
+    """Identificador estable de una consulta sobre un dataset"""
+    payload = json.dumps([dataset_key, query], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def make_page_etag(dataset_key, query, offset, page_size, representation):
+    """
+    ETag fuerte de una página: el dataset es inmutable para su clave, así que
+    la respuesta solo depende de la consulta, el rango y la representación.
+    """
+    payload = json.dumps(
+        [PAGE_ETAG_VERSION, dataset_key, query, offset, page_size, representation],
+        sort_keys=True, separators=(',', ':'),
+    )
+    return '"' + hashlib.sha1(payload.encode('utf-8')).hexdigest() + '"'
+
+
+def encode_cursor(dataset_key, query, offset, page_size):
+    """Cursor opaco con todo lo necesario para reconstruir la página"""
+    payload = json.dumps(
+        {'k': dataset_key, 'q': query, 'o': offset, 'n': page_size},
+        sort_keys=True, separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Devuelve (dataset_key, query, offset, page_size) de un cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        dataset_key = payload['k']
+        query = payload['q']
+        offset = int(payload['o'])
+        page_size = int(payload['n'])
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        raise InvalidCursor(f'Cursor inválido: {e}') from e
+
+    if not isinstance(query, dict) or offset < 0 or page_size < 1:
+        raise InvalidCursor('Cursor inválido')
+    return dataset_key, query, offset, page_size
+
+
+class ResultSet:
+    """Índices de fila materializados para una consulta"""
+
+    def __init__(self, result_id, dataset_key, query, row_ids):
+        self.result_id = result_id
+        self.dataset_key = dataset_key
+        self.query = query
+        self.row_ids = row_ids
+        self.created = time.monotonic()
+
+    @property
+    def nbytes(self):
+        return self.row_ids.nbytes
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def slice(self, start, end):
+        return self.row_ids[start:end]
+
+
+class ResultSetCache:
+    """Caché LRU con TTL de conjuntos de resultados"""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resident_bytes = 0
+
+    def get_or_create(self, dataset_key, query, compute):
+        """
+        Devuelve el ResultSet de la consulta, calculando los índices con
+        `compute()` solo si no está en caché o ha expirado.
+        """
+        result_id = make_result_id(dataset_key, query)
+
+        with self._lock:
+            result = self._results.get(result_id)
+            if result is not None and time.monotonic() - result.created <= self.ttl:
+                self.hits += 1
+                self._results.move_to_end(result_id)
+                return result
+            self.misses += 1
+
+        result = ResultSet(result_id, dataset_key, query, compute())
+
+        with self._lock:
+            previous = self._results.pop(result_id, None)
+            if previous is not None:
+                self.resident_bytes -= previous.nbytes
+            self._results[result_id] = result
+            self.resident_bytes += result.nbytes
+            self._evict()
+
+        return result
+
+    def _evict(self):
+        now = time.monotonic()
+        for result_id in list(self._results):
+            result = self._results[result_id]
+            expired = now - result.created > self.ttl
+            if not expired and self.resident_bytes <= self.max_bytes:
+                break
+            # La entrada más reciente se conserva aunque supere el presupuesto
+            if not expired and len(self._results) == 1:
+                break
+            del self._results[result_id]
+            self.resident_bytes -= result.nbytes
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._results),
+                'resident_bytes': self.resident_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+            }
+
+
+_default_cache = None
+
+
+def get_result_cache():
+    """Caché de resultados del proceso según los settings ARFF_RESULT_SET_*"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultSetCache(
+            settings.ARFF_RESULT_SET_MAX_BYTES,
+            settings.ARFF_RESULT_SET_TTL,
+        )
+    return _default_cache
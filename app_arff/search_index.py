@@ -0,0 +1,109 @@
+"""
+Índice de búsqueda por subcadena para datasets densos.
+
+Cada columna se codifica por diccionario (códigos por fila + valores
+distintos). Los textos de todos los valores distintos se concatenan en una
+sola cadena, de modo que una búsqueda recorre solo los valores distintos
+con un único escaneo en C y luego obtiene las filas con búsquedas
+vectorizadas sobre los códigos. El coste por consulta no depende del texto
+de cada celda sino del número de valores distintos.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Separador entre valores distintos en la cadena concatenada
+SEPARATOR = '\n'
+
+
+def _smallest_codes(codes, n_values):
+    """Reduce los códigos al entero más pequeño que los admite"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values < np.iinfo(dtype).max:
+            return codes.astype(dtype, copy=False)
+    return codes
+
+
+def _null_text(dtype):
+    """Texto de un nulo en una columna de tipo `dtype` (como lo muestra df.astype(str))"""
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iub':
+        # Los enteros y booleanos NumPy (p. ej. tras la compactación) no tienen nulos
+        return 'nan'
+    return str(pd.Series([None], dtype=dtype).astype(str).iloc[0]).lower()
+
+
+class SearchIndex:
+    """Índice de valores distintos por columna con búsqueda por subcadena"""
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.codes = []
+        self.offsets = []
+
+        texts = []
+        position = 0
+        for name in df.columns:
+            column = df[name]
+
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                codes = column.cat.codes.to_numpy()
+                uniques = pd.Series(column.cat.categories)
+            else:
+                codes, uniques = pd.factorize(column, use_na_sentinel=True)
+                codes = _smallest_codes(codes, len(uniques))
+                uniques = pd.Series(uniques, dtype=column.dtype)
+
+            # Mismo texto que muestra df.astype(str); el último valor representa los nulos
+            value_texts = uniques.astype(str).str.lower().tolist()
+            value_texts.append(_null_text(column.dtype))
+
+            self.codes.append(codes)
+            self.offsets.append(position)
+            texts.extend(value_texts)
+            position += len(value_texts)
+
+        self.n_values = position
+        self.text = SEPARATOR.join(text.replace(SEPARATOR, ' ') for text in texts)
+
+        # Posición inicial de cada valor distinto dentro de la cadena concatenada
+        lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+        self.starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(texts) else lengths
+
+    @property
+    def nbytes(self):
+        codes_bytes = sum(codes.nbytes for codes in self.codes)
+        return codes_bytes + self.starts.nbytes + len(self.text.encode('utf-8', 'ignore'))
+
+    def matching_values(self, text):
+        """Ids globales de los valores distintos cuyo texto contiene `text`"""
+        positions = np.fromiter(
+            (match.start() for match in re.finditer(re.escape(text.lower()), self.text)),
+            dtype=np.int64,
+        )
+        if not positions.size:
+            return positions
+        return np.unique(np.searchsorted(self.starts, positions, side='right') - 1)
+
+    def search(self, text):
+        """Índices (ordenados) de las filas con alguna celda que contiene `text`"""
+        value_ids = self.matching_values(text)
+        if not value_ids.size:
+            return np.empty(0, dtype=np.int64)
+
+        matched = np.zeros(self.n_rows, dtype=bool)
+        bounds = self.offsets + [self.n_values]
+
+        for j, codes in enumerate(self.codes):
+            start, end = bounds[j], bounds[j + 1]
+            column_ids = value_ids[(value_ids >= start) & (value_ids < end)] - start
+            if not column_ids.size:
+                continue
+
+            # Tabla booleana por código; el código -1 (nulo) usa la última posición
+            lookup = np.zeros(end - start, dtype=bool)
+            lookup[column_ids] = True
+            matched |= lookup[codes]
+
+        return np.flatnonzero(matched)
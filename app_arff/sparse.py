@@ -0,0 +1,300 @@
+"""
+Soporte para ARFF disperso ({0 1.5, 17 X, 203 1}) respaldado por scipy.sparse.
+
+Las filas se parsean por bloques directamente a una matriz CSR, sin crear
+nunca una copia densa del dataset. Los atributos nominales y de texto se
+guardan como índices de categoría (el valor omitido es la categoría 0, como
+en Weka) y '?' se guarda como NaN explícito. Solo las filas de la página
+solicitada se densifican.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .arff_reader import (
+    ARFFError, InvalidRowError, MISSING_VALUE, NOMINAL_TYPE, NUMERIC_TYPE, INTEGER_TYPE, split_quoted,
+)
+
+
+# Filas que se acumulan antes de convertir un bloque a arrays de NumPy
+PARSE_BLOCK_ROWS = 10000
+
+
+def is_sparse_line(line):
+    """Indica si una línea de @data está en formato disperso"""
+    return line.lstrip().startswith('{')
+
+
+class SparseFrame:
+    """Dataset ARFF disperso: matriz CSR más metadata de columnas"""
+
+    def __init__(self, matrix, attributes, categories):
+        self.matrix = matrix
+        self.attributes = attributes
+        # Lista de categorías por columna (None para columnas numéricas)
+        self.categories = categories
+
+    @property
+    def columns(self):
+        return [attr.name for attr in self.attributes]
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def nnz(self):
+        return self.matrix.nnz
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def memory_usage(self):
+        """Bytes ocupados por los buffers de la matriz CSR"""
+        matrix = self.matrix
+        return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+    def _to_dataframe(self, block):
+        """Convierte una submatriz CSR a un DataFrame denso decodificando categorías"""
+        df = pd.DataFrame(block.toarray(), columns=self.columns)
+
+        for j, categories in enumerate(self.categories):
+            if categories is None:
+                continue
+            values = df.iloc[:, j].to_numpy()
+            codes = np.where(np.isnan(values), -1, values).astype(np.int64)
+            df.isetitem(j, pd.Categorical.from_codes(codes, categories=categories))
+
+        return df
+
+    def page(self, start, end):
+        """Densifica solo las filas [start, end)"""
+        return self._to_dataframe(self.matrix[start:end])
+
+    def head(self, n):
+        return self.page(0, n)
+
+    def take(self, row_ids):
+        """Densifica solo las filas indicadas, en ese orden"""
+        return self._to_dataframe(self.matrix[np.asarray(row_ids, dtype=np.int64)])
+
+    def _cell_text(self, j, value):
+        """Texto con el que se muestra un valor almacenado de la columna j"""
+        categories = self.categories[j]
+        if categories is None or np.isnan(value):
+            return str(value).lower()
+        return str(categories[int(value)]).lower()
+
+    def search(self, text):
+        """
+        Devuelve los índices de las filas que contienen `text` en alguna celda.
+
+        Solo se examinan los valores almacenados (agrupados por valor único) y,
+        para los valores omitidos, se cuenta cuántas entradas tiene cada fila
+        en las columnas cuyo valor implícito coincide.
+        """
+        text = text.lower()
+        matrix = self.matrix
+        n_rows = len(self)
+        columns = matrix.indices
+        entry_rows = np.repeat(np.arange(n_rows), np.diff(matrix.indptr))
+        entry_match = np.zeros(matrix.nnz, dtype=bool)
+
+        numeric = np.array([categories is None for categories in self.categories], dtype=bool)
+        numeric_entries = numeric[columns]
+        if numeric_entries.any():
+            uniques, inverse = np.unique(matrix.data[numeric_entries], return_inverse=True)
+            unique_match = np.array([text in str(value).lower() for value in uniques], dtype=bool)
+            entry_match[numeric_entries] = unique_match[inverse]
+
+        for j in np.flatnonzero(~numeric):
+            positions = np.flatnonzero(columns == j)
+            if not positions.size:
+                continue
+            values = matrix.data[positions]
+            codes = np.where(np.isnan(values), -1, values).astype(np.int64)
+            code_match = np.array(
+                [text in str(value).lower() for value in self.categories[j]] + [text in 'nan'],
+                dtype=bool,
+            )
+            entry_match[positions] = code_match[codes]
+
+        matched = np.zeros(n_rows, dtype=bool)
+        matched[entry_rows[entry_match]] = True
+
+        # Valores omitidos: 0.0 en columnas numéricas, categoría 0 en el resto
+        implicit_match = np.array(
+            [text in self._cell_text(j, 0.0) for j in range(len(self.categories))], dtype=bool
+        )
+        if implicit_match.any():
+            stored = np.bincount(entry_rows[implicit_match[columns]], minlength=n_rows)
+            matched |= stored < implicit_match.sum()
+
+        return np.flatnonzero(matched)
+
+
+class _SparseBuilder:
+    """Acumula filas dispersas por bloques y construye la matriz CSR"""
+
+    def __init__(self, attributes):
+        self.attributes = attributes
+        self.n_columns = len(attributes)
+        self.numeric = np.array(
+            [attr.type in (NUMERIC_TYPE, INTEGER_TYPE) for attr in attributes], dtype=bool
+        )
+
+        # Diccionarios valor -> código para columnas nominales y de texto
+        self.lookups = []
+        self.categories = []
+        for attr in attributes:
+            if attr.type in (NUMERIC_TYPE, INTEGER_TYPE):
+                self.lookups.append(None)
+                self.categories.append(None)
+            elif attr.type == NOMINAL_TYPE:
+                self.lookups.append({value: i for i, value in enumerate(attr.values)})
+                self.categories.append(list(attr.values))
+            else:
+                # El valor omitido de un atributo de texto es la cadena vacía
+                self.lookups.append({'': 0})
+                self.categories.append([''])
+
+        self.row_counts = []
+        # Filas ya convertidas por flush (las pendientes empiezan aquí)
+        self.flushed_rows = 0
+        self.pending_columns = []
+        self.pending_values = []
+        self.data_blocks = []
+        self.index_blocks = []
+
+    def add_line(self, line):
+        line = line.strip()
+
+        if is_sparse_line(line):
+            # Descartar el peso de instancia opcional: {...},{peso}
+            if line.endswith('}') and '},{' in line:
+                line = line[:line.rindex(',{')]
+            body = line[1:line.rindex('}')] if '}' in line else line[1:]
+            if '"' in body or "'" in body:
+                entries = split_quoted(body)
+            else:
+                entries = body.split(',')
+
+            count = 0
+            for entry in entries:
+                entry = entry.strip()
+                if not entry:
+                    continue
+                parts = entry.split(None, 1)
+                if len(parts) != 2:
+                    raise ARFFError(f'Entrada dispersa inválida: {entry}')
+                self.pending_columns.append(parts[0])
+                self.pending_values.append(parts[1].strip().strip('\'"'))
+                count += 1
+        else:
+            # Fila densa dentro de un archivo disperso
+            values = split_quoted(line)
+            if len(values) != self.n_columns:
+                raise ARFFError(f'Fila densa con {len(values)} valores en archivo disperso')
+            self.pending_columns.extend(str(j) for j in range(len(values)))
+            self.pending_values.extend(values)
+            count = len(values)
+
+        self.row_counts.append(count)
+        if len(self.row_counts) % PARSE_BLOCK_ROWS == 0:
+            self.flush()
+
+    def flush(self):
+        """Convierte las entradas pendientes en arrays tipados"""
+        if not self.pending_columns:
+            return
+
+        try:
+            columns = np.array(self.pending_columns, dtype=np.int64)
+        except ValueError as e:
+            raise ARFFError(f'Índice de columna inválido: {e}') from e
+
+        rows = np.repeat(np.arange(self.flushed_rows, len(self.row_counts)), self.row_counts[self.flushed_rows:])
+        invalid = (columns < 0) | (columns >= self.n_columns)
+        if invalid.any():
+            position = np.flatnonzero(invalid)[0]
+            raise InvalidRowError(
+                f'Índice de columna {columns[position]} fuera de rango en la fila {rows[position] + 1}'
+            )
+
+        # Un índice repetido en la misma fila sumaría sus valores en la matriz CSR
+        order = np.lexsort((columns, rows))
+        repeated = (np.diff(rows[order]) == 0) & (np.diff(columns[order]) == 0)
+        if repeated.any():
+            position = order[np.flatnonzero(repeated)[0]]
+            raise InvalidRowError(f'Índice de columna {columns[position]} repetido en la fila {rows[position] + 1}')
+
+        raw_values = np.array(self.pending_values, dtype=object)
+        data = np.empty(len(columns), dtype=np.float64)
+
+        numeric = self.numeric[columns]
+        if numeric.any():
+            data[numeric] = pd.to_numeric(
+                pd.Series(raw_values[numeric]).replace(MISSING_VALUE, np.nan), errors='coerce'
+            ).to_numpy(dtype=np.float64)
+
+        for position in np.flatnonzero(~numeric):
+            value = raw_values[position]
+            if value == MISSING_VALUE:
+                data[position] = np.nan
+                continue
+            j = columns[position]
+            lookup = self.lookups[j]
+            code = lookup.get(value)
+            if code is None:
+                code = len(self.categories[j])
+                lookup[value] = code
+                self.categories[j].append(value)
+            data[position] = code
+
+        self.data_blocks.append(data)
+        self.index_blocks.append(columns.astype(np.int32))
+        self.flushed_rows = len(self.row_counts)
+        self.pending_columns = []
+        self.pending_values = []
+
+    def build(self):
+        self.flush()
+
+        indptr = np.zeros(len(self.row_counts) + 1, dtype=np.int64)
+        np.cumsum(self.row_counts, out=indptr[1:])
+
+        if self.data_blocks:
+            data = np.concatenate(self.data_blocks)
+            indices = np.concatenate(self.index_blocks)
+        else:
+            data = np.empty(0, dtype=np.float64)
+            indices = np.empty(0, dtype=np.int32)
+        self.data_blocks = []
+        self.index_blocks = []
+
+        matrix = sparse.csr_matrix(
+            (data, indices, indptr), shape=(len(self.row_counts), self.n_columns)
+        )
+        matrix.sort_indices()
+        return SparseFrame(matrix, self.attributes, self.categories)
+
+
+def read_sparse_data(lines, header, progress=None, max_rows=None):
+    """
+    Parsea filas ARFF dispersas desde un iterable de líneas a un SparseFrame.
+    `progress(filas)` se llama cada PARSE_BLOCK_ROWS filas; `max_rows` limita
+    las filas leídas.
+    """
+    builder = _SparseBuilder(header.attributes)
+
+    for line in lines:
+        if max_rows is not None and len(builder.row_counts) >= max_rows:
+            break
+        stripped = line.strip()
+        if not stripped or stripped.startswith('%'):
+            continue
+        builder.add_line(stripped)
+        if progress is not None and len(builder.row_counts) % PARSE_BLOCK_ROWS == 0:
+            progress(len(builder.row_counts))
+
+    return builder.build()
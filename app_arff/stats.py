@@ -0,0 +1,144 @@
+"""
+Estadísticas resumen por columna para /api/stats/.
+
+Cada columna se analiza según su tipo ARFF (ver query.column_view) con
+operaciones vectorizadas de NumPy sobre el frame en caché: conteos, nulos,
+mínimo, máximo, media, desviación típica, cuantiles e histograma de bins
+fijos para las numéricas y fechas, y los valores más frecuentes para las
+nominales y de texto. El resultado ocupa unos pocos KB y se guarda junto
+al dataset, así que solo se calcula una vez.
+"""
+import numpy as np
+import pandas as pd
+
+from .query import ColumnView, column_view
+from .sparse import SparseFrame
+
+
+# Bins del histograma por defecto y máximo permitido
+HISTOGRAM_BINS = 20
+MAX_HISTOGRAM_BINS = 200
+
+# Valores más frecuentes devueltos para columnas categóricas
+TOP_VALUES = 10
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _number(value):
+    """float de Python, o None si no es finito (JSON no admite NaN)"""
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _timestamp(value):
+    """Fecha ISO de un valor en nanosegundos desde epoch"""
+    if value is None:
+        return None
+    return pd.Timestamp(int(value)).isoformat()
+
+
+def numeric_summary(values, bins=HISTOGRAM_BINS):
+    """Resumen de un array float64 con NaN para los nulos"""
+    finite = values[np.isfinite(values)]
+    summary = {
+        'count': int(finite.size),
+        'nulls': int(values.size - finite.size),
+    }
+
+    if not finite.size:
+        summary.update({'min': None, 'max': None, 'mean': None, 'std': None,
+                        'quantiles': {}, 'histogram': {'edges': [], 'counts': []}})
+        return summary
+
+    low = finite.min()
+    high = finite.max()
+    counts, edges = np.histogram(finite, bins=bins, range=(low, high) if high > low else (low - 0.5, low + 0.5))
+
+    summary.update({
+        'min': _number(low),
+        'max': _number(high),
+        'mean': _number(finite.mean()),
+        'std': _number(finite.std(ddof=1)) if finite.size > 1 else None,
+        'quantiles': {
+            str(q): _number(value) for q, value in zip(QUANTILES, np.quantile(finite, QUANTILES))
+        },
+        'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+    })
+    return summary
+
+
+def category_summary(codes, categories, top=TOP_VALUES):
+    """Resumen de una columna codificada (-1 = nulo) con los `top` valores más frecuentes"""
+    valid = codes[codes >= 0]
+    counts = np.bincount(valid, minlength=len(categories))
+
+    order = np.argsort(-counts, kind='stable')[:top]
+    order = order[counts[order] > 0]
+
+    return {
+        'count': int(valid.size),
+        'nulls': int(codes.size - valid.size),
+        'distinct': int(np.count_nonzero(counts)),
+        'top': [
+            {'value': str(categories[i]), 'count': int(counts[i])} for i in order
+        ],
+        'other': int(valid.size - counts[order].sum()),
+    }
+
+
+def column_summary(view, name, column_type=None, bins=HISTOGRAM_BINS):
+    """Resumen de una ColumnView según su tipo"""
+    if view.kind == 'category':
+        summary = category_summary(np.asarray(view.values), view.categories)
+    else:
+        summary = numeric_summary(np.asarray(view.values, dtype=np.float64), bins)
+
+        if view.kind == 'datetime':
+            # Fechas: los valores numéricos son nanosegundos desde epoch
+            summary['min'] = _timestamp(summary['min'])
+            summary['max'] = _timestamp(summary['max'])
+            summary['mean'] = _timestamp(summary['mean'])
+            summary['std'] = None
+            summary['quantiles'] = {q: _timestamp(value) for q, value in summary['quantiles'].items()}
+            summary['histogram']['edges'] = [_timestamp(edge) for edge in summary['histogram']['edges']]
+
+    result = {'name': name, 'type': column_type or view.kind}
+    result.update(summary)
+    return result
+
+
+def _sparse_views(frame):
+    """
+    ColumnViews de un SparseFrame a partir de una copia CSC temporal: cada
+    columna se densifica en O(filas) en lugar de recorrer toda la matriz CSR.
+    """
+    matrix = frame.matrix.tocsc()
+    n_rows = len(frame)
+
+    for j, name in enumerate(frame.columns):
+        start, end = matrix.indptr[j], matrix.indptr[j + 1]
+        values = np.zeros(n_rows, dtype=np.float64)
+        values[matrix.indices[start:end]] = matrix.data[start:end]
+
+        categories = frame.categories[j]
+        if categories is None:
+            yield name, ColumnView('numeric', values)
+        else:
+            codes = np.where(np.isnan(values), -1, values).astype(np.int64)
+            yield name, ColumnView('category', codes, pd.Index(categories).astype(str))
+
+
+def dataset_summary(data, metadata=None, bins=HISTOGRAM_BINS):
+    """Estadísticas de todas las columnas de un DataFrame o SparseFrame"""
+    types = {attr['name']: attr['type'] for attr in (metadata or {}).get('attribute_types', [])}
+
+    if isinstance(data, SparseFrame):
+        views = _sparse_views(data)
+    else:
+        views = ((name, column_view(data, name, metadata)) for name in data.columns)
+
+    return {
+        'rows': len(data),
+        'columns': [column_summary(view, name, types.get(name), bins) for name, view in views],
+    }
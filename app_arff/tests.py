@@ -1,3 +1,1618 @@
-from django.test import TestCase
+import io
+import os
+import re
+import shutil
+import tempfile
+import time
+import warnings
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, override_settings
+
+from . import arff_reader
+from .api_views import ARFFUploadAPI
+
+
+PLAIN_ARFF = """@relation plain
+@attribute duration integer
+@attribute rate numeric
+@attribute protocol {tcp,udp,icmp}
+@attribute service string
+@data
+0,0.5,tcp,http
+12,1.25,udp,dns
+7,3,icmp,echo
+"""
+
+
+class IsolatedStoreMixin:
+    """Almacén, tabla de trabajos y cachés del proceso en un directorio temporal"""
+
+    def setUp(self):
+        from . import dataset_cache, dataset_store, jobs, result_sets
+
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+        override = override_settings(
+            ARFF_DATASET_STORE_DIR=self.root,
+            ARFF_JOB_DB_PATH=os.path.join(self.root, 'jobs.sqlite3'),
+            ARFF_INGEST_SPOOL_DIR=os.path.join(self.root, 'spool'),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        for module, name in ((dataset_store, '_default_store'), (dataset_cache, '_default_cache'),
+                             (jobs, '_default_jobs'), (result_sets, '_default_cache')):
+            patcher = mock.patch.object(module, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class ARFFReaderTests(SimpleTestCase):
+    """Lector tipado frente a la lectura CSV de respaldo y casos de comillas"""
+
+    def test_types(self):
+        header, df = arff_reader.read_arff(PLAIN_ARFF)
+        self.assertEqual(header.relation, 'plain')
+        self.assertEqual(str(df['duration'].dtype), 'Int64')
+        self.assertEqual(df['rate'].dtype, np.float64)
+        self.assertIsInstance(df['protocol'].dtype, pd.CategoricalDtype)
+        self.assertEqual(list(df['protocol'].cat.categories), ['tcp', 'udp', 'icmp'])
+
+    def test_parity_with_legacy_parser(self):
+        _, df = arff_reader.read_arff(PLAIN_ARFF)
+        _, legacy = ARFFUploadAPI().legacy_parse(PLAIN_ARFF)
+        self.assertEqual(list(df.columns), list(legacy.columns))
+        self.assertEqual(
+            df.astype(str).to_dict('records'),
+            legacy.astype(str).to_dict('records'),
+        )
+
+    def test_stream_split_across_chunks(self):
+        from . import ingest
+
+        rows = ''.join(f"{i},{i / 8},{'tcp' if i % 2 else 'udp'},'adiós, {i}'\n" for i in range(300))
+        text = PLAIN_ARFF.split('@data\n')[0].replace('@attribute', '% comentario\n@attribute', 1)
+        text += '@data\n' + rows
+        data = text.encode()
+        expected_header, expected = arff_reader.read_arff(text)
+
+        # Muestra de comillas pequeña: parte de los datos sale del prefijo y el resto del flujo
+        with mock.patch.object(arff_reader, 'QUOTE_SAMPLE_SIZE', 100):
+            for size in (1, 3, 7, 64, 4096):
+                with self.subTest(chunk_size=size):
+                    chunks = (data[i:i + size] for i in range(0, len(data), size))
+                    header, df = arff_reader.read_arff_stream(ingest.open_chunks(chunks))
+                    self.assertEqual(header.names, expected_header.names)
+                    pd.testing.assert_frame_equal(df, expected)
+        self.assertEqual(df['service'].iloc[299], 'adiós, 299')
+
+    def test_prefixed_stream_reads(self):
+        # La muestra son líneas completas; read() no mezcla muestra y resto en un bloque
+        stream = arff_reader._PrefixedStream('abc\nde\n', io.StringIO('f\ng\n'))
+        parts = iter(lambda: stream.read(4), '')
+        self.assertEqual(list(parts), ['abc\n', 'de\n', 'f\ng\n'])
+
+        stream = arff_reader._PrefixedStream('abc\nde\n', io.StringIO('f\ng\n'))
+        self.assertEqual(list(stream), ['abc\n', 'de\n', 'f\n', 'g\n'])
+        self.assertEqual(arff_reader._PrefixedStream('ab', io.StringIO('c')).read(), 'abc')
+
+    def test_missing_values(self):
+        _, df = arff_reader.read_arff(PLAIN_ARFF.replace('12,1.25,udp,dns', '?,?,?,?'))
+        self.assertTrue(df.iloc[1].isna().all())
+
+    def test_apostrophe_inside_double_quotes(self):
+        text = PLAIN_ARFF.replace('http', '"O\'Brien"').replace('dns', "'plain'")
+        text = text.replace('echo', '"say \\"hi\\""')
+        _, df = arff_reader.read_arff(text)
+        self.assertEqual(df['service'].tolist(), ["O'Brien", 'plain', 'say "hi"'])
+
+    def test_mixed_quotes(self):
+        text = PLAIN_ARFF.replace('http', "'a, b'").replace('dns', '"don\'t"')
+        _, df = arff_reader.read_arff(text)
+        self.assertEqual(df['service'].tolist(), ['a, b', "don't", 'echo'])
+        self.assertEqual(df['duration'].tolist(), [0, 12, 7])
+
+    def test_comment_lines_skipped(self):
+        _, df = arff_reader.read_arff(PLAIN_ARFF.replace('12,', "% don't\n12,"))
+        self.assertEqual(df['duration'].tolist(), [0, 12, 7])
+
+    def test_percent_inside_value_is_data(self):
+        text = PLAIN_ARFF.replace('http', '50%off').replace('dns', "'10% \\'x\\''")
+        _, df = arff_reader.read_arff(text)
+        self.assertEqual(df['service'].tolist(), ['50%off', "10% 'x'", 'echo'])
+        self.assertEqual(df['duration'].tolist(), [0, 12, 7])
+
+    def test_extra_values_raise_with_line_number(self):
+        text = PLAIN_ARFF.replace('12,1.25,udp,dns', '% comentario\n12,1.25,udp,dns,extra')
+        for source in (text, text.replace('http', "'a'").replace('echo', '"b"')):
+            with self.subTest(mixed_quotes='"b"' in source):
+                with self.assertRaises(arff_reader.BadLineError) as raised:
+                    arff_reader.read_arff(source)
+                self.assertEqual(raised.exception.line, 9)
+                self.assertEqual((raised.exception.expected, raised.exception.seen), (4, 5))
+
+    def test_mixed_offsets_parse_as_utc(self):
+        text = (
+            '@relation r\n@attribute d date\n@data\n'
+            "'2020-01-02T00:00:00+02:00'\n'2020-01-02T00:00:00-05:00'\n'2020-01-02T00:00:00'\n?\n"
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            _, df = arff_reader.read_arff(text)
+        self.assertEqual(str(df['d'].dtype), 'datetime64[ns, UTC]')
+        self.assertEqual(
+            df['d'].tolist()[:3],
+            [pd.Timestamp(v, tz='UTC') for v in ('2020-01-01 22:00', '2020-01-02 05:00', '2020-01-02 00:00')],
+        )
+        self.assertTrue(pd.isna(df['d'].iloc[3]))
+
+    def test_detect_quotechar(self):
+        self.assertEqual(arff_reader.detect_quotechar("1,'a'\n"), "'")
+        self.assertEqual(arff_reader.detect_quotechar('1,"O\'Brien"\n'), '"')
+        self.assertIsNone(arff_reader.detect_quotechar('1,"a"\n2,\'b\'\n'))
+
+    def test_trailing_whitespace_before_delimiter(self):
+        text = PLAIN_ARFF.replace('0,0.5,tcp,http', '0 ,0.5 ,tcp ,http ')
+        _, df = arff_reader.read_arff(text)
+        self.assertEqual(list(df['protocol'].cat.categories), ['tcp', 'udp', 'icmp'])
+        self.assertEqual(df['protocol'].tolist(), ['tcp', 'udp', 'icmp'])
+        self.assertEqual(df['service'].iloc[0], 'http')
+        self.assertEqual(df['duration'].iloc[0], 0)
+
+    def test_chunked_stream_matches_text(self):
+        rows = ''.join(f'{i},{i / 2},tcp,s{i}\n' for i in range(2500))
+        text = PLAIN_ARFF.split('@data')[0] + '@data\n' + rows
+        _, expected = arff_reader.read_arff(text)
+        stream = io.StringIO(text)
+        header = arff_reader.parse_header(iter(stream.readline, ''))
+        df = arff_reader.read_data(stream, header)
+        pd.testing.assert_frame_equal(df, expected)
+
+
+@override_settings(ARFF_ASYNC_INGEST=False)
+class UploadTests(IsolatedStoreMixin, SimpleTestCase):
+    """Subida síncrona: lector tipado y lectura CSV de respaldo"""
+
+    def upload(self, text, name='data.arff'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, text.encode())})
+
+    def test_upload_returns_first_page(self):
+        response = self.upload(PLAIN_ARFF)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['shape'], {'rows': 3, 'columns': 4})
+        self.assertEqual([row['service'] for row in response.data['data']], ['http', 'dns', 'echo'])
+
+    def test_bad_line_is_not_dropped(self):
+        response = self.upload(PLAIN_ARFF.replace('12,1.25,udp,dns', '12,1.25,udp,dns,extra'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Línea 8', response.data['error'])
+
+
+@override_settings(ARFF_ASYNC_INGEST=False)
+class PageHTTPTests(IsolatedStoreMixin, SimpleTestCase):
+    """Cabeceras de caché de /api/data/ y compresión solo de páginas y exportaciones"""
+
+    def setUp(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        super().setUp()
+        rows = ''.join(f'{i},{i / 4},tcp,servicio{i}\n' for i in range(200))
+        text = PLAIN_ARFF.split('@data\n')[0] + '@data\n' + rows
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('data.arff', text.encode())})
+        self.cache_key = response.data['cache_key']
+
+    def test_page_is_cacheable_and_revalidates(self):
+        response = self.client.get('/api/data/', {'cache_key': self.cache_key, 'page_size': 50})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept', response['Vary'])
+
+        again = self.client.get(
+            '/api/data/', {'cache_key': self.cache_key, 'page_size': 50}, HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+        self.assertEqual(again['Cache-Control'], response['Cache-Control'])
+
+        other = self.client.get('/api/data/', {'cache_key': self.cache_key, 'page_size': 50, 'page': 2})
+        self.assertNotEqual(other['ETag'], response['ETag'])
+
+    def test_pages_and_exports_are_gzipped(self):
+        import gzip
+        import json
+
+        response = self.client.get('/api/data/', {'cache_key': self.cache_key}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['data']), 200)
+
+        # La ETag débil que deja la compresión sigue valiendo para revalidar
+        again = self.client.get(
+            '/api/data/', {'cache_key': self.cache_key},
+            HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(again.status_code, 304)
+
+        export = self.client.get(
+            '/api/export/', {'cache_key': self.cache_key, 'output': 'csv'}, HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertEqual(export['Content-Encoding'], 'gzip')
+        csv = gzip.decompress(b''.join(export.streaming_content)).decode()
+        self.assertEqual(len(csv.splitlines()), 201)
+
+    def test_html_pages_are_not_gzipped(self):
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class PartialDatasetTests(IsolatedStoreMixin, SimpleTestCase):
+    """Filas publicadas durante la ingesta y paso al dataset completo"""
+
+    def setUp(self):
+        from .dataset_store import get_store
+
+        super().setUp()
+        rows = ''.join(f'{i},{i / 4},{"tcp" if i < 6 else "udp"},s{i}\n' for i in range(10))
+        self.header, self.df = arff_reader.read_arff(PLAIN_ARFF.split('@data\n')[0] + '@data\n' + rows)
+        self.store = get_store()
+        self.key = 'b' * 32
+
+    def publish(self, *bounds):
+        segments = [
+            self.store.save_segment(self.key, f'{start:06d}', self.df.iloc[start:stop].reset_index(drop=True))
+            for start, stop in bounds
+        ]
+        self.store.publish_partial(self.key, self.header.to_metadata(), segments)
+
+    def page(self, **params):
+        return self.client.get('/api/data/', {'cache_key': self.key, **params})
+
+    def test_rows_across_segments(self):
+        segment = self.df.iloc[6:10].reset_index(drop=True)
+        # Cada segmento compacta sus categorías por separado
+        segment['protocol'] = segment['protocol'].cat.remove_unused_categories()
+        self.store.publish_partial(self.key, self.header.to_metadata(), [
+            self.store.save_segment(self.key, '000000', self.df.iloc[0:6]),
+            self.store.save_segment(self.key, '000006', segment),
+        ])
+
+        partial = self.store.load_partial(self.key)
+        self.assertEqual((partial.rows_ready, partial.columns), (10, self.header.names))
+        rows = partial.rows(4, 8)
+        self.assertEqual(rows['duration'].tolist(), [4, 5, 6, 7])
+        self.assertEqual(rows['protocol'].tolist(), ['tcp', 'tcp', 'udp', 'udp'])
+        self.assertEqual(len(partial.rows(8, 50)), 2)
+
+    def test_partial_page(self):
+        self.publish((0, 4), (4, 6))
+        response = self.page(page_size=4, page=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['duration'] for row in response.data['data']], [4, 5])
+        self.assertEqual((response.data['rows_ready'], response.data['total_rows']), (6, 6))
+        self.assertFalse(response.data['complete'])
+        self.assertTrue(response.data['has_next'])
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_query_on_partial_is_conflict(self):
+        self.publish((0, 6))
+        response = self.page(search='s1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['rows_ready'], 6)
+
+    def test_swap_to_final_dataset(self):
+        self.publish((0, 6))
+        self.assertFalse(self.page().data['complete'])
+
+        self.store.save(self.key, self.df, self.header.to_metadata())
+        self.store.delete_partial(self.key)
+        response = self.page(search='s1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_rows'], 1)
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_swap_while_reading_partial(self):
+        from .dataset_store import PartialDataset
+
+        self.publish((0, 6))
+        self.store.save(self.key, self.df, self.header.to_metadata())
+        # La ingesta termina y borra los segmentos mientras se lee la página
+        with mock.patch.object(PartialDataset, 'rows', side_effect=OSError):
+            response = self.page()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_rows'], 10)
+        self.assertNotEqual(response.data.get('complete'), False)
+
+
+class DatasetLookupTests(IsolatedStoreMixin, SimpleTestCase):
+    """Hash de contenido compartido con upload.js y consulta de datasets por hash"""
+
+    # sha256(sha256(bloque 1) + sha256(bloque 2) + ...), calculado como hashFile de upload.js
+    HASH_VECTORS = (
+        (b'', 'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855'),
+        (b'abc', '4f8b42c22dd3729b519ba6f68d2da7cc5b2d606d05daed5ad5128cc03e6c6358'),
+        # 8 MB + 256 bytes: dos bloques completos y uno parcial
+        (bytes(range(256)) * 32769, 'bfea91c7a023f8824047185385a98065d299e77d3b1f779d9bdf06e07e091d47'),
+    )
+
+    def test_block_hasher_matches_upload_js(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from .ingest import BlockHasher, hash_upload
+
+        for data, expected in self.HASH_VECTORS:
+            with self.subTest(size=len(data)):
+                hasher = BlockHasher()
+                # Bloques de entrada que no coinciden con los bloques del hash
+                for start in range(0, len(data), 999983):
+                    hasher.update(data[start:start + 999983])
+                self.assertEqual(hasher.hexdigest(), expected)
+                self.assertEqual(hash_upload(SimpleUploadedFile('data.arff', data)), expected)
+
+    def lookup(self, key, method='get'):
+        return getattr(self.client, method)(f'/api/datasets/{key}/', {'filename': 'datos.arff'})
+
+    def test_lookup(self):
+        from .dataset_cache import get_dataset_cache
+        from .dataset_store import get_store
+
+        key = 'd' * 32
+        self.assertEqual(self.lookup('nohex').status_code, 400)
+        self.assertEqual(self.lookup(key, 'head').status_code, 404)
+        self.assertEqual(self.lookup(key).status_code, 404)
+
+        header, df = arff_reader.read_arff(PLAIN_ARFF)
+        get_store().save(key, df, header.to_metadata())
+        self.assertEqual(self.lookup(key.upper(), 'head').status_code, 200)
+        # HEAD no carga el dataset en la caché
+        self.assertEqual(get_dataset_cache().stats()['loads'], 0)
+
+        response = self.lookup(key)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['cache_key'], response.data['filename']), (key, 'datos.arff'))
+        self.assertEqual(response.data['shape'], {'rows': 3, 'columns': 4})
+        self.assertEqual(get_dataset_cache().stats()['pinned'], 0)
+
+    def test_lookup_of_dataset_in_progress(self):
+        from . import jobs
+
+        key = 'e' * 32
+        job, _ = jobs.get_job_store().create_or_get_active(key, 'datos.arff', 100)
+        self.assertEqual(self.lookup(key, 'head').status_code, 404)
+
+        response = self.lookup(key)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data['job_id'], response.data['status']), (job['id'], 'queued'))
+
+
+class ExportTests(IsolatedStoreMixin, SimpleTestCase):
+    """Exportación en streaming por bloques y liberación de la entrada de la caché"""
+
+    def setUp(self):
+        from .dataset_store import get_store
+
+        super().setUp()
+        rows = ''.join(f'{i},{i / 4 if i % 3 else "?"},{"tcp" if i % 2 else "udp"},s{i}\n' for i in range(7))
+        self.header, self.df = arff_reader.read_arff(PLAIN_ARFF.split('@data\n')[0] + '@data\n' + rows)
+        self.key = 'c' * 32
+        get_store().save(self.key, self.df, self.header.to_metadata())
+        # Bloques de 2 filas: la exportación cruza varios bloques
+        patcher = mock.patch('app_arff.export.EXPORT_BLOCK_ROWS', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def export(self, **params):
+        return self.client.get('/api/export/', {'cache_key': self.key, **params})
+
+    def pinned(self):
+        from .dataset_cache import get_dataset_cache
+
+        return get_dataset_cache().stats()['pinned']
+
+    def test_ndjson_matches_pandas(self):
+        response = self.export()
+        self.assertEqual(self.pinned(), 1)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(self.pinned(), 0)
+
+        expected = self.df.to_json(orient='records', lines=True).splitlines()
+        self.assertEqual(lines, expected)
+        self.assertEqual(response['X-Total-Rows'], '7')
+
+    def test_csv_query_and_projection(self):
+        import csv
+
+        response = self.export(output='csv', filters='[{"column": "protocol", "op": "eq", "value": "tcp"}]',
+                               columns='duration,rate', start=1)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+        tcp = self.df[self.df['protocol'] == 'tcp'].iloc[1:]
+        self.assertEqual(response['X-Total-Rows'], '3')
+        self.assertEqual(rows[0], ['duration', 'rate'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], tcp['duration'].tolist())
+        self.assertEqual([row[1] for row in rows[1:]], ['' if pd.isna(v) else str(v) for v in tcp['rate']])
+        self.assertEqual(self.pinned(), 0)
+
+    def test_aborted_download_releases_entry(self):
+        response = self.export()
+        next(iter(response.streaming_content))
+        self.assertEqual(self.pinned(), 1)
+        response.close()
+        self.assertEqual(self.pinned(), 0)
+
+    def test_unknown_column_releases_entry(self):
+        response = self.export(columns='nada')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.pinned(), 0)
+
+
+class InstrumentationTests(IsolatedStoreMixin, SimpleTestCase):
+    """Cabecera Server-Timing y formato de texto de Prometheus de /metrics"""
+
+    SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? \S+$')
+
+    def setUp(self):
+        from . import instrumentation
+
+        super().setUp()
+        patcher = mock.patch.object(instrumentation, '_default_registry', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(ARFF_ASYNC_INGEST=False)
+    def test_server_timing_header(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        import json
+
+        with self.assertLogs('app_arff.metrics', 'INFO') as logs:
+            response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('data.arff', PLAIN_ARFF.encode())})
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['event'], record['view'], record['status']), ('request', 'api_upload', 200))
+        self.assertEqual(record['stages']['parse']['rows'], 3)
+
+        timings = dict(part.split(';dur=') for part in response['Server-Timing'].split(', '))
+        self.assertEqual(list(timings)[-1], 'total')
+        self.assertTrue({'hash', 'parse', 'store'} <= set(timings))
+        self.assertTrue(all(float(value) >= 0 for value in timings.values()))
+        self.assertGreaterEqual(float(timings['total']), float(timings['parse']))
+
+    def test_metrics_text_format(self):
+        self.client.get('/api/data/', {'cache_key': 'f' * 32})
+        self.client.get('/no-existe/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+
+        text = response.content.decode()
+        self.assertTrue(text.endswith('\n'))
+        declared = {}
+        for line in text.splitlines():
+            if line.startswith('# TYPE '):
+                _, _, name, kind = line.split(' ')
+                declared[name] = kind
+            elif not line.startswith('# HELP '):
+                self.assertRegex(line, self.SAMPLE)
+                name = line.split('{')[0].split(' ')[0]
+                base = re.sub(r'_(bucket|sum|count)$', '', name) if name not in declared else name
+                self.assertIn(base, declared, line)
+
+        self.assertEqual(declared['arff_request_duration_seconds'], 'histogram')
+        self.assertIn('arff_request_duration_seconds_count{view="api_data",method="GET",status="404"} 1', text)
+        self.assertIn('view="unmatched"', text)
+        self.assertIn('arff_dataset_cache_misses_total 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        from .instrumentation import Histogram
+
+        histogram = Histogram('h', 'Prueba.', ('view',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(('v',), value)
+        self.assertEqual(histogram.render()[2:], [
+            'h_bucket{view="v",le="0.1"} 2',
+            'h_bucket{view="v",le="1.0"} 3',
+            'h_bucket{view="v",le="+Inf"} 4',
+            'h_sum{view="v"} 3.65',
+            'h_count{view="v"} 4',
+        ])
+
+    @override_settings(ARFF_METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(ARFF_ASYNC_CPU_WORKERS=2)
+class AsyncViewTests(IsolatedStoreMixin, SimpleTestCase):
+    """Vistas asíncronas: trabajo en el pool acotado y streaming bloque a bloque"""
+
+    def setUp(self):
+        from . import async_views
+
+        super().setUp()
+        patcher = mock.patch.object(async_views, '_executor', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: async_views._executor and async_views._executor.shutdown())
+
+    def test_offload_is_bounded(self):
+        import asyncio
+        import threading
+
+        from .async_views import offload
+
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+            return threading.current_thread().name
+
+        async def main():
+            return await asyncio.gather(*(offload(work) for _ in range(6)))
+
+        names = asyncio.run(main())
+        self.assertEqual(max(peak), 2)
+        self.assertTrue(all(name.startswith('arff-async') for name in names))
+        self.assertEqual(len(set(names)), 2)
+
+    def test_offload_records_stages_in_request(self):
+        import asyncio
+
+        from .async_views import offload
+        from .instrumentation import recording, stage
+
+        def work():
+            with stage('parse', rows=5):
+                pass
+
+        async def main():
+            with recording() as timings:
+                await offload(work)
+            return timings
+
+        self.assertEqual(asyncio.run(main()).as_dict()['parse']['rows'], 5)
+
+    def test_async_data_and_export(self):
+        import asyncio
+        import json
+
+        from django.test import RequestFactory
+
+        from . import async_views
+        from .dataset_cache import get_dataset_cache
+        from .dataset_store import get_store
+
+        key = 'a' * 32
+        header, df = arff_reader.read_arff(PLAIN_ARFF)
+        get_store().save(key, df, header.to_metadata())
+        factory = RequestFactory()
+
+        async def main():
+            page = await async_views.data(factory.get('/api/data/', {'cache_key': key}))
+            export = await async_views.export(factory.get('/api/export/', {'cache_key': key}))
+            pinned = get_dataset_cache().stats()['pinned']
+            chunks = [chunk async for chunk in export.streaming_content]
+            export.close()
+            return page, export, pinned, chunks
+
+        page, export, pinned, chunks = asyncio.run(main())
+        self.assertTrue(asyncio.iscoroutinefunction(async_views.data))
+        self.assertEqual([row['service'] for row in json.loads(page.content)['data']], ['http', 'dns', 'echo'])
+        self.assertTrue(export.is_async)
+        self.assertEqual(pinned, 1)
+        self.assertEqual(b''.join(chunks).decode().splitlines(), df.to_json(orient='records', lines=True).splitlines())
+        self.assertEqual(get_dataset_cache().stats()['pinned'], 0)
+
+
+class IngestTests(SimpleTestCase):
+    """Flujos de texto sobre archivos subidos o en disco, comprimidos o no"""
+
+    def compressed(self, compression):
+        import bz2
+        import gzip
+        import zipfile
+
+        data = PLAIN_ARFF.encode()
+        if compression == 'gzip':
+            return gzip.compress(data)
+        if compression == 'bz2':
+            return bz2.compress(data)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('LEEME.txt', 'no es el dataset')
+            archive.writestr('datos/plain.ARFF', data)
+        return buffer.getvalue()
+
+    def test_compressed_round_trip(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from . import ingest
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        for compression in (None, 'gzip', 'bz2', 'zip'):
+            with self.subTest(compression=compression):
+                data = self.compressed(compression) if compression else PLAIN_ARFF.encode()
+                uploaded = SimpleUploadedFile('data', data)
+                self.assertEqual(ingest.detect_compression(uploaded), compression)
+                self.assertEqual(ingest.read_text(uploaded), PLAIN_ARFF)
+
+                path = os.path.join(root, compression or 'plain')
+                with open(path, 'wb') as f:
+                    f.write(data)
+                read = []
+                with open(path, 'rb') as f:
+                    _, df = arff_reader.read_arff_stream(ingest.open_file_text(f, on_bytes=read.append))
+                self.assertEqual(df['service'].tolist(), ['http', 'dns', 'echo'])
+                if compression != 'zip':
+                    self.assertEqual(sum(read), len(data))
+
+    def test_zip_members(self):
+        import zipfile
+
+        from . import ingest
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('vacio/', '')
+        with self.assertRaisesMessage(ValueError, 'vacío'):
+            ingest.decompress(io.BytesIO(buffer.getvalue()), ingest.ZIP_COMPRESSION)
+
+        # Sin ningún .arff se lee el primer archivo
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('a.txt', 'primero')
+            archive.writestr('b.txt', 'segundo')
+        stream = ingest.decompress(io.BytesIO(buffer.getvalue()), ingest.ZIP_COMPRESSION)
+        self.assertEqual(stream.read(), b'primero')
+
+    def test_decompressed_size_is_limited(self):
+        from . import ingest
+
+        stream = io.BufferedReader(ingest.LimitedStream(io.BytesIO(b'x' * 100), limit=64), buffer_size=16)
+        self.assertEqual(stream.read(64), b'x' * 64)
+        with self.assertRaisesMessage(ValueError, 'supera el máximo'):
+            stream.read()
+
+        # Una "bomba" gzip se corta al superar el límite, no al terminar de descomprimir
+        import gzip
+
+        bomb = gzip.GzipFile(fileobj=io.BytesIO(gzip.compress(b'0' * 10 ** 6)))
+        with self.assertRaises(ValueError):
+            io.BufferedReader(ingest.LimitedStream(bomb, limit=1000)).read()
+        self.assertLess(bomb.tell(), 10 ** 6)
+
+
+SPARSE_ARFF = """@relation sparse
+@attribute x numeric
+@attribute c {y,z}
+@attribute s string
+@data
+{0 1, 1 z}
+{1 y, 2 hola}
+{}
+"""
+
+
+class JobFlowTests(IsolatedStoreMixin, SimpleTestCase):
+    """Subida asíncrona: trabajo en cola, consulta del estado y resultado o error"""
+
+    def setUp(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from . import jobs
+
+        super().setUp()
+        # El trabajo corre en un hilo de este proceso, con los settings del test
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown, wait=True)
+        patcher = mock.patch.object(jobs, 'get_executor', return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, text, name='data.arff'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, text.encode())})
+
+    def wait(self, job_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        while True:
+            response = self.client.get(f'/api/jobs/{job_id}/')
+            self.assertEqual(response.status_code, 200)
+            if response.data['status'] in ('done', 'error') or time.monotonic() > deadline:
+                return response
+            time.sleep(0.01)
+
+    def test_submit_poll_done(self):
+        response = self.upload(PLAIN_ARFF)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+
+        job = self.wait(response.data['job_id'])
+        self.assertEqual(job.data['status'], 'done')
+        self.assertTrue(job.data['success'])
+        self.assertEqual(job.data['progress'], 1.0)
+        self.assertEqual(job.data['rows_ready'], 3)
+        self.assertEqual(job.data['result']['shape'], {'rows': 3, 'columns': 4})
+        self.assertEqual(job['Cache-Control'], 'no-store')
+
+        # El dataset queda en el almacén: /api/data/ lo sirve y otra subida no crea trabajo
+        page = self.client.get('/api/data/', {'cache_key': response.data['cache_key']})
+        self.assertEqual([row['duration'] for row in page.data['data']], [0, 12, 7])
+        self.assertEqual(self.upload(PLAIN_ARFF).status_code, 200)
+
+    def test_legacy_fallback(self):
+        text = PLAIN_ARFF.replace('{tcp,udp,icmp}', '{tcp,udp,icmp')
+        job = self.wait(self.upload(text).data['job_id'])
+        self.assertEqual(job.data['status'], 'done')
+        self.assertEqual(job.data['result']['columns'], ['duration', 'rate', 'protocol', 'service'])
+        self.assertEqual(job.data['result']['shape']['rows'], 3)
+
+    def test_invalid_rows_end_in_error(self):
+        job = self.wait(self.upload(PLAIN_ARFF.replace('7,3,icmp,echo', '7,3,icmp,echo,extra')).data['job_id'])
+        self.assertEqual(job.data['status'], 'error')
+        self.assertFalse(job.data['success'])
+        self.assertIn('Línea 9', job.data['error'])
+
+    def test_pending_job_is_reused(self):
+        import threading
+
+        # Ocupar el único hilo para que el trabajo quede en cola
+        gate = threading.Event()
+        self.executor.submit(gate.wait)
+        first = self.upload(PLAIN_ARFF)
+        second = self.upload(PLAIN_ARFF)
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.data['job_id'], first.data['job_id'])
+        self.assertEqual(self.client.get(f"/api/jobs/{first.data['job_id']}/").data['status'], 'queued')
+
+        gate.set()
+        self.assertEqual(self.wait(first.data['job_id']).data['status'], 'done')
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get(f"/api/jobs/{'0' * 32}/").status_code, 404)
+
+
+class SparseReaderTests(IsolatedStoreMixin, SimpleTestCase):
+    """Formato disperso: valores decodificados e índices inválidos"""
+
+    def test_values(self):
+        _, data = arff_reader.read_arff(SPARSE_ARFF)
+        df = data.page(0, len(data))
+        self.assertEqual(df['x'].tolist(), [1.0, 0.0, 0.0])
+        self.assertEqual(df['c'].tolist(), ['z', 'y', 'y'])
+        self.assertEqual(df['s'].tolist(), ['', 'hola', ''])
+
+    def test_repeated_or_out_of_range_index(self):
+        for row, message in (('{1 y, 1 z}', 'repetido en la fila 2'), ('{0 1, 3 2}', 'fuera de rango en la fila 2')):
+            with self.subTest(row=row), self.assertRaises(arff_reader.InvalidRowError) as raised:
+                arff_reader.read_arff(SPARSE_ARFF.replace('{1 y, 2 hola}', row))
+            self.assertIn(message, str(raised.exception))
+
+    @override_settings(ARFF_ASYNC_INGEST=False)
+    def test_upload_rejects_repeated_index(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from .dataset_cache import get_dataset_cache
+
+        text = SPARSE_ARFF.replace('{1 y, 2 hola}', '{1 y, 1 z}')
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('s.arff', text.encode())})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('repetido', response.data['error'])
+        self.assertEqual(get_dataset_cache().stats()['entries'], 0)
+
+
+class SparsePageTests(SimpleTestCase):
+    """Las páginas de datasets dispersos se limitan por celdas densificadas"""
+
+    def setUp(self):
+        from .dataset_cache import get_dataset_cache
+
+        attributes = ''.join(f'@attribute f{i} numeric\n' for i in range(2000))
+        rows = ''.join(f'{{0 {i}, {i % 1999 + 1} 1}}\n' for i in range(3000))
+        header, df = arff_reader.read_arff(f'@relation wide\n{attributes}@data\n{rows}')
+        self.key = 'f' * 32
+        self.cache = get_dataset_cache()
+        self.cache.release(self.cache.put(self.key, df, header.to_metadata()))
+
+    def test_page_size_clamped(self):
+        from .api_views import sparse_page_rows
+
+        response = self.client.get('/api/data/', {'cache_key': self.key, 'page': 2, 'page_size': 5000})
+        self.assertEqual(response.status_code, 200)
+        entry = self.cache.acquire(self.key)
+        limit = sparse_page_rows(entry.data)
+        self.cache.release(entry)
+        self.assertEqual(response.data['page_size'], limit)
+        self.assertEqual(len(response.data['data']), limit)
+        self.assertEqual(response.data['data'][0]['f0'], limit)
+
+
+def decode_buffers(content):
+    """Decodifica una página application/vnd.arff.columns como lo hace el cliente"""
+    import json
+    import struct
+
+    from .encoding import BUFFER_ALIGNMENT, BUFFER_MAGIC
+
+    assert content[:4] == BUFFER_MAGIC
+    (header_size,) = struct.unpack('<I', content[4:8])
+    header = json.loads(content[8:8 + header_size])
+    start = 8 + header_size
+    assert start % BUFFER_ALIGNMENT == 0
+
+    columns = {}
+    for column in header['columns']:
+        assert column['offset'] % BUFFER_ALIGNMENT == 0
+        dtype = '<i4' if column['dtype'] == 'int32' else '<f8'
+        values = np.frombuffer(
+            content, dtype=dtype, count=column['byte_length'] // np.dtype(dtype).itemsize,
+            offset=start + column['offset'],
+        )
+        columns[column['name']] = (column, values)
+    return header, columns
+
+
+class EncodingTests(SimpleTestCase):
+    """Formatos de página frente a los valores de pandas"""
+
+    def frame(self):
+        return pd.DataFrame({
+            'n': pd.array([1, None, 3], dtype='Int16'),
+            'x': [0.5, np.nan, np.inf],
+            'c': pd.Categorical(['b', None, 'b'], categories=['a', 'b', 'c']),
+            's': ['hola', None, 'adiós'],
+            'd': pd.to_datetime(['2020-01-01 00:00:00.250', None, '1969-12-31 23:00:00.000']),
+        })
+
+    def test_buffers_round_trip(self):
+        from .encoding import encode_buffers
+
+        df = self.frame()
+        content = b''.join(bytes(chunk) for chunk in encode_buffers(df, {'page': 2}))
+        header, columns = decode_buffers(content)
+
+        self.assertEqual((header['length'], header['meta']), (3, {'page': 2}))
+        self.assertEqual([name for name in columns], list(df.columns))
+
+        column, values = columns['n']
+        self.assertEqual((column['type'], column['dtype']), ('integer', 'float64'))
+        np.testing.assert_array_equal(values, [1, np.nan, 3])
+
+        _, values = columns['x']
+        np.testing.assert_array_equal(values, [0.5, np.nan, np.inf])
+
+        # int32 de 3 filas: 12 bytes más 4 de relleno hasta la siguiente columna
+        column, codes = columns['c']
+        self.assertEqual((column['dtype'], column['byte_length']), ('int32', 12))
+        self.assertEqual(column['dictionary'], ['b'])
+        self.assertEqual(codes.tolist(), [0, -1, 0])
+
+        column, codes = columns['s']
+        self.assertEqual([column['dictionary'][code] if code >= 0 else None for code in codes], df['s'].tolist())
+
+        column, values = columns['d']
+        self.assertEqual(column['type'], 'datetime')
+        expected = df['d'].to_numpy(dtype='datetime64[ms]').view(np.int64)
+        np.testing.assert_array_equal(values[[0, 2]], expected[[0, 2]])
+        self.assertTrue(np.isnan(values[1]))
+
+
+    def test_columns_match_records(self):
+        import base64
+
+        from .encoding import encode_columns, encode_records
+
+        df = self.frame()
+        page = encode_columns(df)
+        self.assertEqual((page['format'], page['length']), ('columns', 3))
+
+        decoded = {}
+        for column in page['columns']:
+            if 'dictionary' in column:
+                values = [column['dictionary'][code] if code >= 0 else None for code in column['codes']]
+            else:
+                nulls = column['nulls']
+                mask = np.zeros(3, dtype=bool)
+                if nulls:
+                    bits = np.unpackbits(np.frombuffer(base64.b64decode(nulls), dtype=np.uint8), bitorder='little')
+                    mask = bits[:3].astype(bool)
+                values = [None if null else value for value, null in zip(column['values'], mask)]
+            decoded[column['name']] = values
+
+        records = encode_records(df)
+        for name in ('n', 'x', 'c', 's'):
+            self.assertEqual(decoded[name], [row[name] for row in records], name)
+        self.assertEqual(decoded['n'], [1, None, 3])
+        self.assertEqual(decoded['x'], [0.5, None, None])
+        self.assertEqual(decoded['d'], ['2020-01-01T00:00:00.250', None, '1969-12-31T23:00:00.000'])
+
+
+class DatasetStoreTests(SimpleTestCase):
+    """Guardar y cargar datasets del almacén columnar sin perder tipos ni valores"""
+
+    def setUp(self):
+        from .dataset_store import DatasetStore
+
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.store = DatasetStore(self.root)
+        self.key = 'a' * 32
+
+    def test_frame_round_trip(self):
+        df = pd.DataFrame({
+            'count': pd.array([1, None, 3], dtype='Int64'),
+            'rate': [0.5, np.nan, 2.0],
+            'small': np.array([1, 2, 3], dtype=np.int8),
+            'protocol': pd.Categorical(['tcp', None, 'udp'], categories=['tcp', 'udp', 'icmp']),
+            'service': ['http', None, 'dns'],
+            'when': pd.to_datetime(['2020-01-01', None, '2021-06-30']),
+        })
+        metadata = {'relation': 'r', 'attributes': list(df.columns)}
+        self.store.save(self.key, df, metadata)
+
+        loaded, loaded_metadata = self.store.load(self.key)
+        self.assertEqual(loaded_metadata, metadata)
+        self.assertEqual(str(loaded['count'].dtype), 'Int64')
+        self.assertEqual(loaded['small'].dtype, np.int8)
+        self.assertEqual(list(loaded['protocol'].cat.categories), ['tcp', 'udp', 'icmp'])
+        # El texto se guarda por diccionario y vuelve como categórico con los mismos valores
+        pd.testing.assert_frame_equal(
+            loaded.astype(object).where(loaded.notna(), None),
+            df.astype(object).where(df.notna(), None),
+        )
+
+    def test_timezone_dates_round_trip(self):
+        text = (
+            '@relation r\n@attribute a numeric\n@attribute d date\n@data\n'
+            "1,'2020-01-02T00:00:00+02:00'\n2,?\n3,'2021-06-30T23:30:00+02:00'\n"
+        )
+        header, df = arff_reader.read_arff(text)
+        naive = pd.to_datetime(['2020-01-01 10:00', None, '2020-07-01 10:00'])
+        df['madrid'] = naive.tz_localize('Europe/Madrid')
+        df['offset'] = naive.tz_localize('UTC').tz_convert('+02:00')
+        self.store.save(self.key, df, header.to_metadata())
+
+        loaded, _ = self.store.load(self.key)
+        self.assertEqual(str(loaded['d'].dtype), 'datetime64[ns, UTC]')
+        self.assertEqual(str(loaded['offset'].dtype), 'datetime64[ns, UTC+02:00]')
+        pd.testing.assert_frame_equal(loaded, df)
+
+    def test_object_arrays_rejected(self):
+        from .dataset_store import _save
+
+        with self.assertRaises(ValueError):
+            _save(self.root, 'x.npy', np.array([pd.Timestamp('2020-01-01', tz='UTC')], dtype=object))
+
+    def test_sparse_round_trip(self):
+        attributes = ''.join(f'@attribute f{i} numeric\n' for i in range(50))
+        header, frame = arff_reader.read_arff(f'@relation s\n{attributes}@data\n{{0 1, 7 2.5}}\n{{49 3}}\n')
+        self.store.save(self.key, frame, header.to_metadata())
+
+        loaded, _ = self.store.load(self.key)
+        self.assertEqual((loaded.matrix != frame.matrix).nnz, 0)
+        pd.testing.assert_frame_equal(loaded.page(0, 2), frame.page(0, 2))
+
+    def test_missing_and_invalid_keys(self):
+        self.assertIsNone(self.store.load(self.key))
+        self.assertFalse(self.store.exists('../etc'))
+        with self.assertRaises(ValueError):
+            self.store.path('../etc')
+
+
+class DatasetCacheTests(SimpleTestCase):
+    """Presupuesto de bytes de la caché, incluidas las estructuras derivadas"""
+
+    def frame(self, rows):
+        return pd.DataFrame({'value': np.arange(rows, dtype=np.float64)})
+
+    def test_lru_eviction_skips_pinned(self):
+        from .dataset_cache import DatasetCache
+
+        cache = DatasetCache(max_bytes=20000)
+        first = cache.put('a', self.frame(1000), {})
+        cache.release(cache.put('b', self.frame(1000), {}))
+        # 'a' sigue fijada: se desaloja 'b' aunque sea la más reciente
+        cache.release(cache.put('c', self.frame(1000), {}))
+        self.assertIn('a', cache)
+        self.assertLessEqual(cache.stats()['entries'], 2)
+        cache.release(first)
+
+    def test_derived_values_count_and_evict(self):
+        from .dataset_cache import DatasetCache
+
+        cache = DatasetCache(max_bytes=20000)
+        cache.release(cache.put('a', self.frame(1000), {}))
+        entry = cache.put('b', self.frame(1000), {})
+        before = entry.nbytes
+
+        summary = cache.derived(entry, 'stats', lambda: {'histogram': np.zeros(1000), 'label': 'x' * 100})
+        self.assertGreater(entry.nbytes - before, 8000)
+        # El dict derivado supera el presupuesto: se desaloja la entrada no fijada
+        self.assertNotIn('a', cache)
+        self.assertIs(cache.derived(entry, 'stats', lambda: None), summary)
+        cache.release(entry)
+
+
+
+class CompactionTests(SimpleTestCase):
+    """La compactación reduce tipos sin cambiar valores ni tipos declarados"""
+
+    def test_declared_string_not_coerced(self):
+        from .compaction import compact_frame
+
+        text = PLAIN_ARFF.replace('http', "'00123'").replace('dns', "'1e3'").replace('echo', "'7'")
+        header, df = arff_reader.read_arff(text)
+        compacted, _ = compact_frame(df, header.to_metadata()['attribute_types'])
+        self.assertEqual(compacted['service'].astype(str).tolist(), ['00123', '1e3', '7'])
+        self.assertIsInstance(compacted['protocol'].dtype, pd.CategoricalDtype)
+
+    def test_declared_numeric_narrowed(self):
+        from .compaction import compact_frame
+
+        header, df = arff_reader.read_arff(PLAIN_ARFF)
+        compacted, report = compact_frame(df, header.to_metadata()['attribute_types'])
+        self.assertEqual(compacted['duration'].dtype, np.int8)
+        self.assertEqual(compacted['rate'].dtype, np.float32)
+        self.assertEqual(compacted['duration'].tolist(), df['duration'].tolist())
+        self.assertEqual(compacted['rate'].tolist(), df['rate'].tolist())
+        self.assertLess(report['bytes_after'], report['bytes_before'])
+
+    def test_declared_real_stays_float(self):
+        from .compaction import compact_frame
+
+        text = (
+            '@relation r\n@attribute a real\n@attribute b numeric\n@attribute c integer\n@data\n'
+            '1,2,3\n4,?,6\n'
+        )
+        header, df = arff_reader.read_arff(text)
+        compacted, _ = compact_frame(df, header.to_metadata()['attribute_types'])
+        self.assertEqual(compacted['a'].dtype, np.float32)
+        self.assertEqual(compacted['b'].dtype, np.float32)
+        self.assertTrue(np.isnan(compacted['b'].iloc[1]))
+        self.assertEqual(compacted['c'].dtype, np.int8)
+
+        # Sin tipo declarado (lectura de respaldo) los flotantes enteros sí pasan a enteros
+        untyped, _ = compact_frame(pd.DataFrame({'x': [1.0, np.nan, 3.0]}))
+        self.assertEqual(str(untyped['x'].dtype), 'Int8')
+
+    def test_nulls_and_inexact_floats(self):
+        from .compaction import compact_frame
+
+        df = pd.DataFrame({
+            'count': pd.array([1, None, 300], dtype='Int64'),
+            'ratio': [0.1, 0.2, np.nan],
+        })
+        compacted, _ = compact_frame(df)
+        self.assertEqual(str(compacted['count'].dtype), 'Int16')
+        self.assertTrue(compacted['count'].isna().iloc[1])
+        # 0.1 no es exacto en float32: se queda en float64
+        self.assertEqual(compacted['ratio'].dtype, np.float64)
+
+    def test_untyped_legacy_text_converted(self):
+        from .compaction import compact_frame
+
+        df = pd.DataFrame({'column_1': ['1', '?', '3'], 'column_2': ['a', 'b', 'a']})
+        compacted, _ = compact_frame(df)
+        self.assertEqual(str(compacted['column_1'].dtype), 'Int8')
+        self.assertEqual(compacted['column_2'].tolist(), ['a', 'b', 'a'])
+
+
+class SearchIndexTests(SimpleTestCase):
+    """El índice devuelve las mismas filas que el escaneo completo de df.astype(str)"""
+
+    def full_scan(self, df, text):
+        mask = df.astype(str).apply(lambda x: x.str.contains(text, case=False, regex=False)).any(axis=1)
+        return np.flatnonzero(mask.to_numpy())
+
+    def test_matches_full_scan(self):
+        from .search_index import SearchIndex
+
+        rng = np.random.default_rng(0)
+        rows = 500
+        df = pd.DataFrame({
+            'small': rng.integers(-5, 120, rows).astype(np.int8),
+            'count': pd.array(np.where(rng.random(rows) < 0.2, None, rng.integers(0, 50, rows)), dtype='Int64'),
+            'rate': np.where(rng.random(rows) < 0.1, np.nan, rng.random(rows).round(2)),
+            'flag': rng.random(rows) < 0.5,
+            'protocol': pd.Categorical(rng.choice(['tcp', 'udp', None], rows)),
+            'service': rng.choice(['http', 'NaN-service', 'ftp_data', None], rows),
+        })
+        index = SearchIndex(df)
+
+        for text in ('tcp', 'http', '1', '-3', '0.5', 'nan', '<na>', 'none', 'true', 'ftp_', 'zzz'):
+            with self.subTest(text=text):
+                np.testing.assert_array_equal(index.search(text), self.full_scan(df, text))
+
+
+class CursorTests(SimpleTestCase):
+    """Cursores opacos de /api/data/: ida y vuelta, manipulación y recorrido completo"""
+
+    def test_round_trip(self):
+        from .result_sets import decode_cursor, encode_cursor
+
+        query = {'search': 'tcp', 'sort': '-rate', 'filters': [{'column': 'rate', 'op': 'gt', 'value': 1}]}
+        cursor = encode_cursor('b' * 32, query, 2000, 1000)
+        self.assertEqual(decode_cursor(cursor), ('b' * 32, query, 2000, 1000))
+
+    def test_invalid_cursor(self):
+        from .result_sets import InvalidCursor, decode_cursor, encode_cursor
+
+        for cursor in ('no-es-un-cursor', encode_cursor('b' * 32, {}, -1, 10), encode_cursor('b' * 32, [], 0, 10)):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+    def test_pages_follow_cursors(self):
+        from .dataset_cache import get_dataset_cache
+
+        rows = ''.join(f'{i},{i % 7},{"tcp" if i % 3 else "udp"},s{i}\n' for i in range(250))
+        header, df = arff_reader.read_arff(PLAIN_ARFF.split('@data')[0] + '@data\n' + rows)
+        key = 'c' * 32
+        cache = get_dataset_cache()
+        cache.release(cache.put(key, df, header.to_metadata()))
+
+        expected = df[df['protocol'] == 'udp'].sort_values('rate', ascending=False, kind='stable')
+        seen = []
+        response = self.client.get('/api/data/', {'cache_key': key, 'page_size': 30, 'search': 'udp', 'sort': '-rate'})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['duration'] for row in response.data['data'])
+            self.assertEqual(response.data['total_rows'], len(expected))
+            if not response.data['has_next']:
+                break
+            response = self.client.get('/api/data/', {'cursor': response.data['next_cursor']})
+
+        self.assertEqual(seen, expected['duration'].tolist())
+
+
+class QueryTests(SimpleTestCase):
+    """Filtros y ordenación frente al equivalente en pandas, con nulos"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        n = 500
+        rate = rng.integers(0, 20, n).astype(float)
+        rate[rng.random(n) < 0.1] = np.nan
+        protocol = rng.choice(['tcp', 'udp', 'icmp'], n).astype(object)
+        protocol[rng.random(n) < 0.1] = None
+        self.df = pd.DataFrame({
+            'duration': pd.array(np.where(rng.random(n) < 0.1, None, rng.integers(0, 5, n)), dtype='Int64'),
+            'rate': rate,
+            'protocol': pd.Categorical(protocol, categories=['udp', 'tcp', 'icmp']),
+        })
+        self.metadata = {'attribute_types': [
+            {'name': 'duration', 'type': arff_reader.INTEGER_TYPE},
+            {'name': 'rate', 'type': arff_reader.NUMERIC_TYPE},
+            {'name': 'protocol', 'type': arff_reader.NOMINAL_TYPE},
+        ]}
+
+    def test_filters_match_pandas(self):
+        from .query import filter_mask
+
+        df = self.df
+        cases = [
+            ([{'column': 'rate', 'op': 'gt', 'value': 10}], df['rate'] > 10),
+            ([{'column': 'rate', 'op': 'ne', 'value': 3}], df['rate'].notna() & (df['rate'] != 3)),
+            ([{'column': 'rate', 'op': 'between', 'value': [2, 6]}], df['rate'].between(2, 6)),
+            ([{'column': 'duration', 'op': 'in', 'value': [1, 3]}], df['duration'].isin([1, 3]).fillna(False)),
+            ([{'column': 'protocol', 'op': 'eq', 'value': 'tcp'}], df['protocol'] == 'tcp'),
+            ([{'column': 'protocol', 'op': 'not_in', 'value': ['tcp']}],
+             df['protocol'].notna() & (df['protocol'] != 'tcp')),
+            ([{'column': 'protocol', 'op': 'is_null', 'value': None}], df['protocol'].isna()),
+            ([{'column': 'rate', 'op': 'lte', 'value': 5}, {'column': 'duration', 'op': 'not_null', 'value': None}],
+             (df['rate'] <= 5) & df['duration'].notna()),
+        ]
+        for filters, expected in cases:
+            with self.subTest(filters=filters):
+                mask = filter_mask(df, filters, self.metadata)
+                np.testing.assert_array_equal(mask, expected.to_numpy(dtype=bool))
+
+    def test_sort_matches_pandas_with_nulls_last(self):
+        from .query import sort_permutation
+
+        cases = [
+            [('rate', False)],
+            [('rate', True)],
+            [('protocol', False), ('rate', True)],
+            [('duration', True), ('protocol', True)],
+        ]
+        for sort_keys in cases:
+            with self.subTest(sort_keys=sort_keys):
+                expected = self.df.sort_values(
+                    [name for name, _ in sort_keys],
+                    ascending=[not descending for _, descending in sort_keys],
+                    kind='stable', na_position='last',
+                ).index.to_numpy()
+                np.testing.assert_array_equal(sort_permutation(self.df, sort_keys, self.metadata), expected)
+
+    def test_timezone_dates_filter_and_sort_as_instants(self):
+        from .query import filter_mask, sort_permutation
+
+        df = pd.DataFrame({'d': pd.to_datetime(['2020-01-02T00:00:00+02:00', None, '2020-01-01T23:00:00+02:00'])})
+        mask = filter_mask(df, [{'column': 'd', 'op': 'gt', 'value': '2020-01-01T21:30:00Z'}])
+        np.testing.assert_array_equal(mask, [True, False, False])
+        np.testing.assert_array_equal(sort_permutation(df, [('d', False)]), [2, 0, 1])
+
+    def test_unknown_column_or_operator(self):
+        from .query import QueryError, normalize_query
+
+        for query in ({'sort': 'nope'}, {'filters': [{'column': 'rate', 'op': 'like', 'value': 1}]},
+                      {'filters': [{'column': 'rate', 'op': 'between', 'value': 1}]}):
+            with self.subTest(query=query), self.assertRaises(QueryError):
+                normalize_query(query, list(self.df.columns))
+
+
+class StatsTests(SimpleTestCase):
+    """Estadísticas por columna frente a pandas"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        x = rng.normal(10, 3, 500)
+        x[::17] = np.nan
+        self.df = pd.DataFrame({
+            'x': x,
+            'n': pd.array(rng.integers(0, 50, 500), dtype='Int16'),
+            'c': pd.Categorical(rng.choice(['a', 'b', 'c', None], 500, p=[0.5, 0.3, 0.1, 0.1])),
+            'd': pd.to_datetime('2020-01-01') + pd.to_timedelta(rng.integers(0, 10 ** 6, 500), unit='s'),
+        })
+
+    def summaries(self, data, **kwargs):
+        from .stats import dataset_summary
+
+        summary = dataset_summary(data, **kwargs)
+        self.assertEqual(summary['rows'], len(data))
+        return {column['name']: column for column in summary['columns']}
+
+    def test_numeric_matches_pandas(self):
+        summaries = self.summaries(self.df, bins=7)
+        for name in ('x', 'n'):
+            column = self.df[name].astype(float)
+            summary = summaries[name]
+            self.assertEqual((summary['count'], summary['nulls']), (column.count(), column.isna().sum()))
+            self.assertAlmostEqual(summary['min'], column.min())
+            self.assertAlmostEqual(summary['max'], column.max())
+            self.assertAlmostEqual(summary['mean'], column.mean())
+            self.assertAlmostEqual(summary['std'], column.std())
+            for q, value in summary['quantiles'].items():
+                self.assertAlmostEqual(value, column.quantile(float(q)))
+            counts, edges = np.histogram(column.dropna(), bins=7)
+            self.assertEqual(summary['histogram']['counts'], counts.tolist())
+            np.testing.assert_allclose(summary['histogram']['edges'], edges)
+
+    def test_categories_and_dates(self):
+        summaries = self.summaries(self.df)
+
+        summary = summaries['c']
+        counts = self.df['c'].value_counts()
+        self.assertEqual([(top['value'], top['count']) for top in summary['top']],
+                         list(zip(counts.index, counts.tolist())))
+        self.assertEqual((summary['nulls'], summary['distinct'], summary['other']), (self.df['c'].isna().sum(), 3, 0))
+
+        summary = summaries['d']
+        self.assertEqual(summary['min'], self.df['d'].min().isoformat())
+        self.assertEqual(summary['max'], self.df['d'].max().isoformat())
+        self.assertIsNone(summary['std'])
+
+    def test_constant_and_empty_columns(self):
+        summaries = self.summaries(pd.DataFrame({'k': [2.0, 2.0], 'e': [np.nan, np.nan]}), bins=4)
+        # Columna constante: un bin de ancho 1 centrado en el valor
+        histogram = summaries['k']['histogram']
+        self.assertEqual((histogram['edges'][0], histogram['edges'][-1], sum(histogram['counts'])), (1.5, 2.5, 2))
+        self.assertEqual((summaries['e']['count'], summaries['e']['min']), (0, None))
+
+    def test_sparse_matches_dense(self):
+        attributes = ''.join(f'@attribute f{i} numeric\n' for i in range(5)) + '@attribute c {y,z}\n'
+        rows = ''.join(f'{{{i % 5} {i}, 5 {"yz"[i % 2]}}}\n' if i % 3 else '{}\n' for i in range(30))
+        header, frame = arff_reader.read_arff(f'@relation s\n{attributes}@data\n{rows}')
+        metadata = header.to_metadata()
+
+        sparse = self.summaries(frame, metadata=metadata)
+        dense = self.summaries(frame.page(0, len(frame)), metadata=metadata)
+        self.assertEqual(sparse, dense)
+
+
+def reference_lttb(x, y, threshold):
+    """LTTB punto a punto, como en la implementación original de Steinarsson"""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+
+        best, best_area = None, -1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    return selected + [n - 1]
+
+
+class PlottingTests(SimpleTestCase):
+    """Densidad por bincount y reducción LTTB frente a implementaciones de referencia"""
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.x = rng.normal(0, 1, 2000)
+        self.y = self.x * 2 + rng.normal(0, 0.5, 2000)
+        self.x[::50] = np.nan
+        self.color = rng.integers(-1, 3, 2000)
+
+    def test_binned_density_matches_histogram2d(self):
+        from .plotting import binned_density
+
+        x_edges, y_edges, cell_x, cell_y, group, counts = binned_density(self.x, self.y, 16)
+        valid = ~np.isnan(self.x)
+        expected, hx, hy = np.histogram2d(self.x[valid], self.y[valid], bins=16)
+        np.testing.assert_allclose(x_edges, hx)
+        np.testing.assert_allclose(y_edges, hy)
+
+        grid = np.zeros((16, 16), dtype=np.int64)
+        grid[cell_x, cell_y] = counts
+        np.testing.assert_array_equal(grid, expected)
+        self.assertTrue((counts > 0).all())
+        self.assertFalse(group.any())
+
+    def test_binned_density_by_color(self):
+        from .plotting import binned_density
+
+        x_edges, y_edges, cell_x, cell_y, group, counts = binned_density(self.x, self.y, 8, self.color, 3)
+        for code in range(3):
+            mask = ~np.isnan(self.x) & (self.color == code)
+            expected, _, _ = np.histogram2d(self.x[mask], self.y[mask], bins=(x_edges, y_edges))
+            grid = np.zeros((8, 8), dtype=np.int64)
+            selected = group == code
+            grid[cell_x[selected], cell_y[selected]] = counts[selected]
+            np.testing.assert_array_equal(grid, expected)
+
+    def test_lttb_matches_reference(self):
+        from .plotting import lttb
+
+        x = np.sort(np.nan_to_num(self.x))
+        y = np.sin(x * 3) + self.y / 10
+        for threshold in (3, 10, 257):
+            with self.subTest(threshold=threshold):
+                self.assertEqual(lttb(x, y, threshold).tolist(), reference_lttb(x.tolist(), y.tolist(), threshold))
+        self.assertEqual(lttb(x[:5], y[:5], 10).tolist(), [0, 1, 2, 3, 4])
+
+    def test_plot_data_counts_every_row(self):
+        from .plotting import plot_data
+
+        df = pd.DataFrame({
+            'x': self.x, 'y': self.y,
+            'c': pd.Categorical.from_codes(self.color, categories=['a', 'b', 'c']),
+        })
+        binned = plot_data(df, None, 'x', 'y', color_name='c', resolution=10)
+        self.assertEqual(sum(binned['cells']['count']), int((~np.isnan(self.x) & (self.color >= 0)).sum()))
+
+        reduced = plot_data(df, None, 'x', 'y', mode='lttb', resolution=50, color_name='c')
+        self.assertEqual([series['color'] for series in reduced['series']], ['a', 'b', 'c'])
+        for series in reduced['series']:
+            self.assertEqual(len(series['x']), 50)
+            self.assertEqual(series['x'], sorted(series['x']))
+
+
+class CorrelationTests(SimpleTestCase):
+    """Correlaciones por bloques frente a DataFrame.corr()"""
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        n = 1000
+        x = rng.normal(size=n)
+        self.df = pd.DataFrame({
+            'x': x,
+            'y': x * 2 + rng.normal(size=n),
+            'z': pd.array(rng.integers(0, 50, n), dtype='Int64'),
+            'protocol': pd.Categorical(rng.choice(['tcp', 'udp'], n)),
+        })
+
+    def test_pearson_with_nulls_matches_pandas(self):
+        from . import correlation
+
+        df = self.df.copy()
+        df.loc[::7, 'x'] = np.nan
+        df.loc[::11, 'z'] = pd.NA
+        with mock.patch.object(correlation, 'CORRELATION_CHUNK_ROWS', 64):
+            summary = correlation.association_summary(df)
+
+        self.assertEqual(summary['numeric']['columns'], ['x', 'y', 'z'])
+        self.assertEqual(summary['nominal']['columns'], ['protocol'])
+        expected = df[['x', 'y', 'z']].astype(float).corr().to_numpy()
+        np.testing.assert_allclose(np.array(summary['numeric']['matrix'], dtype=float), expected, atol=1e-5)
+
+    def test_spearman_matches_pandas(self):
+        from . import correlation
+
+        with mock.patch.object(correlation, 'CORRELATION_CHUNK_ROWS', 100):
+            summary = correlation.association_summary(self.df, method='spearman', columns=['x', 'y', 'z'])
+
+        expected = self.df[['x', 'y', 'z']].astype(float).corr(method='spearman').to_numpy()
+        np.testing.assert_allclose(np.array(summary['numeric']['matrix'], dtype=float), expected, atol=1e-5)
+
+
+class JobStoreTests(SimpleTestCase):
+    """Trabajo activo por archivo: uno solo aunque lleguen subidas simultáneas, y caducidad"""
+
+    def test_concurrent_submissions_share_one_job(self):
+        import threading
+
+        from .jobs import STATUS_DONE, JobStore
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = JobStore(f'{tmp}/jobs.sqlite3')
+            barrier = threading.Barrier(8)
+            results = []
+
+            def submit():
+                barrier.wait()
+                results.append(store.create_or_get_active('d' * 32, 'a.arff', 10))
+
+            threads = [threading.Thread(target=submit) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(sum(created for _, created in results), 1)
+            self.assertEqual(len({job['id'] for job, _ in results}), 1)
+
+            # Terminado el trabajo, una nueva subida crea otro
+            job_id = results[0][0]['id']
+            store.update(job_id, status=STATUS_DONE)
+            job, created = store.create_or_get_active('d' * 32, 'a.arff', 10)
+            self.assertTrue(created)
+            self.assertNotEqual(job['id'], job_id)
+
+    def _store(self):
+        from .jobs import JobStore
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        return JobStore(os.path.join(root, 'jobs.sqlite3'))
+
+    def _age(self, store, job_id, seconds):
+        past = time.time() - seconds
+        store._execute('UPDATE jobs SET created = ?, updated = ? WHERE id = ?', (past, past, job_id))
+
+    def test_long_queued_job_is_reused(self):
+        from .jobs import STALE_JOB_SECONDS
+
+        store = self._store()
+        job, _ = store.create_or_get_active('e' * 32, 'a.arff', 10)
+        # En cola sin actualizaciones más allá del margen de los trabajos en marcha
+        self._age(store, job['id'], STALE_JOB_SECONDS * 2)
+        again, created = store.create_or_get_active('e' * 32, 'a.arff', 10)
+        self.assertFalse(created)
+        self.assertEqual(again['id'], job['id'])
+
+    def test_running_job_without_heartbeat_is_stale(self):
+        from .jobs import STALE_JOB_SECONDS, STATUS_RUNNING
+
+        store = self._store()
+        job, _ = store.create_or_get_active('e' * 32, 'a.arff', 10)
+        store.update(job['id'], status=STATUS_RUNNING)
+        self._age(store, job['id'], STALE_JOB_SECONDS * 2)
+        again, created = store.create_or_get_active('e' * 32, 'a.arff', 10)
+        self.assertTrue(created)
+        self.assertNotEqual(again['id'], job['id'])
+
+    def test_heartbeat_refreshes_running_job(self):
+        from . import jobs
+
+        store = self._store()
+        job, _ = store.create_or_get_active('e' * 32, 'a.arff', 10)
+        self._age(store, job['id'], 1000)
+        with mock.patch.object(jobs, 'HEARTBEAT_SECONDS', 0.01), jobs._Heartbeat(store, job['id']):
+            time.sleep(0.1)
+        self.assertGreater(store.get(job['id'])['updated'], time.time() - 5)
+
+
+class ParallelReaderTests(SimpleTestCase):
+    """El lector por rangos da el mismo resultado que el lector por flujo"""
+
+    def _write(self, rows):
+        text = PLAIN_ARFF.split('@data')[0] + '@data\n' + ''.join(rows)
+        f = tempfile.NamedTemporaryFile('w', suffix='.arff', delete=False, encoding='utf-8')
+        with f:
+            f.write(text)
+        self.addCleanup(os.unlink, f.name)
+        return f.name, text
+
+    def _rows(self, n=3000):
+        rows = []
+        for i in range(n):
+            if i % 97 == 0:
+                rows.append("% don't split here\n")
+            if i % 13 == 0:
+                rows.append(f"{i},{i / 4},tcp,'multi\nline, it''s {i}'\n")
+            elif i % 17 == 0:
+                rows.append(f"{i},?,udp,'50% of \\'it\\''\n")
+            else:
+                rows.append(f'{i},{i % 9},icmp,s{i} % trailing comment\n')
+        return rows
+
+    def test_bad_line_number_is_file_relative(self):
+        from . import parallel_reader
+
+        rows = self._rows()
+        rows[2500] = '2500,1,tcp,x,extra\n'
+        path, text = self._write(rows)
+        line = text.splitlines().index('2500,1,tcp,x,extra') + 1
+        with mock.patch.object(parallel_reader, 'MIN_RANGE_BYTES', 4096):
+            with self.assertRaises(arff_reader.BadLineError) as raised:
+                parallel_reader.read_arff_path(path, workers=4)
+        # Los valores multilínea de las filas anteriores cuentan como una línea
+        multiline = sum(row.count('\n') - 1 for row in rows[:2500])
+        self.assertEqual(raised.exception.line, line - multiline)
+
+        # El lector por flujo numera igual
+        with self.assertRaises(arff_reader.BadLineError) as streamed:
+            arff_reader.read_arff(text)
+        self.assertEqual(streamed.exception.line, raised.exception.line)
+
+    def test_shared_pool_does_not_fork(self):
+        from .parallel_reader import get_parse_executor
+
+        executor = get_parse_executor()
+        self.assertIs(get_parse_executor(), executor)
+        self.assertNotEqual(executor._mp_context.get_start_method(), 'fork')
+
+    @override_settings(ARFF_PARSE_WORKERS=8, ARFF_INGEST_WORKERS=2)
+    def test_ingest_workers_split_parse_workers(self):
+        from django.conf import settings
+
+        from . import jobs, parallel_reader
+
+        with mock.patch.object(parallel_reader, '_worker_limit', None):
+            self.assertEqual(parallel_reader.parse_workers(), 8)
+            jobs._init_worker(settings.SETTINGS_MODULE)
+            self.assertEqual(parallel_reader.parse_workers(), 4)
+
+    def test_boundaries_skip_comments_and_quoted_newlines(self):
+        from .parallel_reader import split_data_ranges
+
+        path, text = self._write(self._rows())
+        data_start = text.index('@data\n') + len('@data\n')
+        with open(path, 'rb') as f:
+            boundaries = split_data_ranges(f, data_start, len(text.encode()), 16, "'")
+        self.assertGreater(len(boundaries), 8)
+
+        lines = text.encode()
+        for boundary in boundaries[1:-1]:
+            head = lines[data_start:boundary].decode()
+            self.assertTrue(head.endswith('\n'))
+            # Ninguna frontera cae dentro de un valor multilínea
+            self.assertFalse(head.endswith('multi\n'))
+
+    def test_parallel_matches_stream(self):
+        from . import parallel_reader
+
+        path, text = self._write(self._rows())
+        expected_header, expected = arff_reader.read_arff_stream(io.StringIO(text))
+        with mock.patch.object(parallel_reader, 'MIN_RANGE_BYTES', 4096):
+            header, df = parallel_reader.read_arff_path(path, workers=4)
+
+        self.assertEqual(header.names, expected_header.names)
+        self.assertEqual(len(df), 3000)
+        pd.testing.assert_frame_equal(df, expected)
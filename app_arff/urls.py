@@ -1,6 +1,15 @@
+from django.conf import settings
 from django.urls import path
 from . import views
-from .api_views import ARFFUploadAPI, ARFFDataAPI
+from .api_views import ARFFUploadAPI, ARFFDataAPI, ARFFExportAPI, DatasetStatsAPI, DatasetCorrelationAPI, DatasetPlotAPI, DatasetLookupAPI, JobStatusAPI, DatasetCacheStatsAPI, MetricsAPI
+
+if settings.ARFF_ASYNC_VIEWS:
+    # Servido por ASGI: variantes asíncronas que no bloquean el bucle de eventos
+    from .async_views import data as data_view, export as export_view, upload as upload_view
+else:
+    upload_view = ARFFUploadAPI.as_view()
+    data_view = ARFFDataAPI.as_view()
+    export_view = ARFFExportAPI.as_view()
 
 urlpatterns = [
    
@@ -8,6 +17,14 @@ urlpatterns = [
     path('results/', views.result_page, name='result_page'),
     
     
-    path('api/upload/', ARFFUploadAPI.as_view(), name='api_upload'),
-    path('api/data/', ARFFDataAPI.as_view(), name='api_data'),
+    path('api/upload/', upload_view, name='api_upload'),
+    path('api/data/', data_view, name='api_data'),
+    path('api/export/', export_view, name='api_export'),
+    path('api/stats/', DatasetStatsAPI.as_view(), name='api_stats'),
+    path('api/correlation/', DatasetCorrelationAPI.as_view(), name='api_correlation'),
+    path('api/plot/', DatasetPlotAPI.as_view(), name='api_plot'),
+    path('api/datasets/<str:dataset_hash>/', DatasetLookupAPI.as_view(), name='api_dataset_lookup'),
+    path('api/jobs/<str:job_id>/', JobStatusAPI.as_view(), name='api_job_status'),
+    path('api/cache/stats/', DatasetCacheStatsAPI.as_view(), name='api_cache_stats'),
+    path('metrics', MetricsAPI.as_view(), name='metrics'),
 ]
\ No newline at end of file
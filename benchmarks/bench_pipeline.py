@@ -0,0 +1,326 @@
+"""
+Benchmark por etapas de la ingesta y de las consultas de /api/data/.
+
+Para cada tamaño genera un ARFF sintético (benchmarks.synthetic) y mide por
+separado cada etapa: hash y decodificación de la subida, lectura de
+respaldo (parse_arff_metadata, robust_read_csv, clean_dataframe), lector
+tipado, compactación, almacén/caché, codificación de páginas y consultas
+(búsqueda, filtro, orden y página). El resultado se escribe en JSON para
+comparar dos ejecuciones con benchmarks.compare.
+
+Uso:
+    python -m benchmarks.bench_pipeline --rows 1000 100000 --output base.json
+    python -m benchmarks.bench_pipeline --preset strings --rows 50000 --stages typed_read search
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import django
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'visualizacion.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from django.core.files import File  # noqa: E402
+
+from app_arff import arff_reader, ingest  # noqa: E402
+from app_arff.api_views import ARFFUploadAPI  # noqa: E402
+from app_arff.compaction import compact_frame  # noqa: E402
+from app_arff.dataset_cache import DatasetCache  # noqa: E402
+from app_arff.dataset_store import DatasetStore  # noqa: E402
+from app_arff.encoding import COLUMNS_FORMAT, RECORDS_FORMAT, encode_buffers, encode_page  # noqa: E402
+from app_arff.parallel_reader import read_arff_path  # noqa: E402
+from app_arff.query import normalize_query, query_row_ids  # noqa: E402
+from app_arff.sparse import SparseFrame  # noqa: E402
+from benchmarks.synthetic import PRESETS, generate_file  # noqa: E402
+
+
+RESULTS_VERSION = 1
+
+# Filas de las páginas codificadas (como la primera página de la subida)
+PAGE_ROWS = 1000
+
+# La lectura de respaldo es muy lenta en archivos grandes: por encima de este
+# número de filas sus etapas se omiten salvo que se pida --legacy-max-rows
+LEGACY_MAX_ROWS = 500000
+
+STAGES = [
+    'hash', 'decode', 'parse_arff_metadata', 'robust_read_csv', 'clean_dataframe',
+    'typed_read', 'parallel_read', 'compact', 'store_save', 'store_load', 'cache_roundtrip',
+    'encode_records', 'encode_columns', 'encode_buffers',
+    'search_index', 'search', 'filter', 'sort', 'page',
+]
+LEGACY_STAGES = ('decode', 'parse_arff_metadata', 'robust_read_csv', 'clean_dataframe')
+
+
+def measure(func, repeat, setup=None):
+    """
+    Ejecuta `func` `repeat` veces y devuelve (tiempos, último resultado).
+    `setup()` prepara un argumento nuevo antes de cada ejecución (fuera del tiempo).
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        result = func(argument) if setup is not None else func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def summarize(times):
+    return {
+        'best': min(times),
+        'median': statistics.median(times),
+        'repeat': len(times),
+    }
+
+
+def _query_columns(df):
+    """Una columna numérica y una categórica del dataset para filtrar y ordenar"""
+    numeric = None
+    nominal = None
+    for name in df.columns:
+        if isinstance(df, SparseFrame):
+            numeric = numeric or name
+            continue
+        dtype = df[name].dtype
+        if nominal is None and isinstance(dtype, pd.CategoricalDtype):
+            nominal = name
+        elif numeric is None and pd.api.types.is_numeric_dtype(dtype):
+            numeric = name
+    return numeric, nominal
+
+
+def run_size(path, rows, repeat, stages, legacy_max_rows, workdir):
+    """Tiempos de las etapas pedidas para el archivo `path` de `rows` filas"""
+    view = ARFFUploadAPI()
+    results = {}
+
+    def record(stage, times):
+        results[stage] = summarize(times)
+        print(f'  {stage:<20} {results[stage]["best"] * 1000:10.1f} ms')
+
+    def wanted(stage):
+        if stage not in stages:
+            return False
+        if stage in LEGACY_STAGES and rows > legacy_max_rows:
+            results[stage] = {'skipped': f'más de {legacy_max_rows} filas'}
+            return False
+        return True
+
+    def upload():
+        return File(open(path, 'rb'), name=os.path.basename(path))
+
+    if wanted('hash'):
+        times, _ = measure(ingest.hash_upload, repeat, setup=upload)
+        record('hash', times)
+
+    text = None
+    if any(stage in stages for stage in LEGACY_STAGES) and rows <= legacy_max_rows:
+        text = ingest.read_text(upload())
+
+    if wanted('decode'):
+        times, _ = measure(ingest.read_text, repeat, setup=upload)
+        record('decode', times)
+
+    if wanted('parse_arff_metadata'):
+        times, metadata = measure(lambda: view.parse_arff_metadata(text), repeat)
+        record('parse_arff_metadata', times)
+
+    legacy_df = None
+    if wanted('robust_read_csv'):
+        metadata = view.parse_arff_metadata(text)
+        csv_content = text[text.find('@data') + 5:].strip()
+        times, legacy_df = measure(lambda: view.robust_read_csv(csv_content, metadata.get('attributes')), repeat)
+        record('robust_read_csv', times)
+
+    if wanted('clean_dataframe') and legacy_df is not None:
+        times, _ = measure(view.clean_dataframe, repeat, setup=legacy_df.copy)
+        record('clean_dataframe', times)
+    del text, legacy_df
+
+    def typed_read():
+        with open(path, 'rb') as f:
+            return arff_reader.read_arff_stream(ingest.open_file_text(f))
+
+    times, (header, df) = measure(typed_read, repeat if 'typed_read' in stages else 1)
+    if 'typed_read' in stages:
+        record('typed_read', times)
+
+    if wanted('parallel_read'):
+        times, _ = measure(lambda: read_arff_path(path), repeat)
+        record('parallel_read', times)
+
+    if wanted('compact'):
+        attribute_types = header.to_metadata()['attribute_types']
+        times, (compacted, report) = measure(lambda: compact_frame(df, attribute_types), repeat)
+        record('compact', times)
+        if report is not None:
+            results['compact']['bytes_before'] = report['bytes_before']
+            results['compact']['bytes_after'] = report['bytes_after']
+            df = compacted
+
+    metadata = header.to_metadata()
+    store = DatasetStore(os.path.join(workdir, 'store'))
+    key = f'{rows:016x}'
+
+    if wanted('store_save'):
+        # save() no reescribe un dataset existente: se borra antes de cada ejecución
+        times, _ = measure(lambda _: store.save(key, df, metadata), repeat, setup=lambda: store.delete(key))
+        record('store_save', times)
+    elif any(stage in stages for stage in ('store_load', 'cache_roundtrip')):
+        store.save(key, df, metadata)
+
+    if wanted('store_load'):
+        times, _ = measure(lambda: store.load(key), repeat)
+        record('store_load', times)
+
+    if wanted('cache_roundtrip'):
+        def roundtrip():
+            # Guardar en una caché vacía, soltar, y volver a pedirlo (acierto)
+            cache = DatasetCache(1 << 40, loader=store.load)
+            cache.release(cache.put(key, df, metadata))
+            entry = cache.acquire(key)
+            cache.release(entry)
+            return entry
+
+        times, _ = measure(roundtrip, repeat)
+        record('cache_roundtrip', times)
+
+    page = df.head(PAGE_ROWS)
+    if wanted('encode_records'):
+        times, _ = measure(lambda: encode_page(page, RECORDS_FORMAT), repeat)
+        record('encode_records', times)
+
+    if wanted('encode_columns'):
+        times, _ = measure(lambda: encode_page(page, COLUMNS_FORMAT), repeat)
+        record('encode_columns', times)
+
+    if wanted('encode_buffers'):
+        times, _ = measure(lambda: encode_buffers(page), repeat)
+        record('encode_buffers', times)
+
+    # Consultas sobre una entrada de caché, como en ARFFDataAPI
+    cache = DatasetCache(1 << 40)
+    entry = cache.put(key, df, metadata)
+    numeric, nominal = _query_columns(df)
+    columns = list(df.columns)
+
+    def run_query(query):
+        return query_row_ids(cache, entry, normalize_query(query, columns))
+
+    if wanted('search_index') and not isinstance(df, SparseFrame):
+        def build_index():
+            entry.derived.pop('search_index', None)
+            return run_query({'search': 'tcp'})
+
+        times, _ = measure(build_index, repeat)
+        record('search_index', times)
+
+    if wanted('search'):
+        run_query({'search': 'tcp'})
+        times, _ = measure(lambda: run_query({'search': 'tcp'}), repeat)
+        record('search', times)
+
+    if wanted('filter') and numeric is not None:
+        filters = [{'column': numeric, 'op': 'gt', 'value': 0.5}]
+        if nominal is not None:
+            filters.append({'column': nominal, 'op': 'ne', 'value': str(df[nominal].cat.categories[0])})
+        times, _ = measure(lambda: run_query({'filters': filters}), repeat)
+        record('filter', times)
+
+    if wanted('sort') and numeric is not None:
+        def sort():
+            entry.derived.pop(f'sort:-{numeric}', None)
+            return run_query({'sort': f'-{numeric}'})
+
+        times, _ = measure(sort, repeat)
+        record('sort', times)
+
+    if wanted('page'):
+        # Página intermedia de una búsqueda ordenada, codificada por columnas
+        query = {'search': 'a', 'sort': numeric} if numeric else {'search': 'a'}
+
+        def page_query():
+            row_ids = run_query(query)
+            start = min(len(row_ids), 50 * PAGE_ROWS)
+            ids = np.asarray(row_ids[start:start + PAGE_ROWS])
+            block = df.take(ids) if isinstance(df, SparseFrame) else df.iloc[ids]
+            return encode_page(block, COLUMNS_FORMAT)
+
+        times, _ = measure(page_query, repeat)
+        record('page', times)
+
+    cache.release(entry)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=False
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='kdd')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--legacy-max-rows', type=int, default=LEGACY_MAX_ROWS)
+    parser.add_argument('--output', help='archivo JSON de resultados')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='arff-bench-')
+    results = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'params': {'preset': args.preset, 'repeat': args.repeat, 'seed': args.seed},
+        'sizes': {},
+    }
+
+    try:
+        for rows in args.rows:
+            path = generate_file(os.path.join(workdir, f'{args.preset}-{rows}.arff'), rows, args.preset, args.seed)
+            print(f'{args.preset}, {rows} filas ({os.path.getsize(path) / 1e6:.1f} MB)')
+            results['sizes'][str(rows)] = {
+                'bytes': os.path.getsize(path),
+                'stages': run_size(path, rows, args.repeat, args.stages, args.legacy_max_rows, workdir),
+            }
+            os.unlink(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'Resultados en {args.output}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Benchmark del lector ARFF tipado frente a la cadena robust_read_csv.
+
+Uso:
+    python -m benchmarks.bench_reader [--rows 125000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import django
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'visualizacion.settings')
+django.setup()
+
+from app_arff import arff_reader  # noqa: E402
+from app_arff.api_views import ARFFUploadAPI  # noqa: E402
+from benchmarks.synthetic import generate_nsl_kdd_like  # noqa: E402
+
+
+def time_call(func, repeat):
+    """Devuelve el mejor tiempo (segundos) de `repeat` ejecuciones"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=125000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    content = generate_nsl_kdd_like(args.rows)
+    view = ARFFUploadAPI()
+
+    legacy_time, (_, legacy_df) = time_call(lambda: view.legacy_parse(content), args.repeat)
+    reader_time, (_, reader_df) = time_call(lambda: arff_reader.read_arff(content), args.repeat)
+
+    legacy_bytes = legacy_df.memory_usage(deep=True).sum()
+    reader_bytes = reader_df.memory_usage(deep=True).sum()
+
+    print(f'Filas: {args.rows}, tamaño: {len(content) / 1e6:.1f} MB')
+    print(f'robust_read_csv + clean_dataframe: {legacy_time:.3f} s, {legacy_bytes / 1e6:.1f} MB')
+    print(f'arff_reader.read_arff:             {reader_time:.3f} s, {reader_bytes / 1e6:.1f} MB')
+    print(f'Aceleración: {legacy_time / reader_time:.1f}x')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
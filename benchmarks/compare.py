@@ -0,0 +1,77 @@
+"""
+Compara dos resultados de benchmarks.bench_pipeline y marca las regresiones.
+
+Una etapa es una regresión cuando su mejor tiempo empeora más que
+`--threshold` (fracción, 0.10 = 10 %) y más de `--min-ms` milisegundos, para
+no marcar ruido en etapas de microsegundos. Sale con código 1 si hay alguna.
+
+Uso:
+    python -m benchmarks.compare base.json nuevo.json [--threshold 0.10]
+"""
+import argparse
+import json
+import sys
+
+
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_MIN_MS = 1.0
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(base, new, threshold=DEFAULT_THRESHOLD, min_ms=DEFAULT_MIN_MS):
+    """
+    Filas (tamaño, etapa, base_ms, nuevo_ms, cambio, regresión) de las
+    etapas medidas en ambos resultados.
+    """
+    rows = []
+    for size, new_size in new.get('sizes', {}).items():
+        base_stages = base.get('sizes', {}).get(size, {}).get('stages', {})
+        for stage, timing in new_size.get('stages', {}).items():
+            previous = base_stages.get(stage)
+            if not previous or 'best' not in previous or 'best' not in timing:
+                continue
+
+            base_ms = previous['best'] * 1000
+            new_ms = timing['best'] * 1000
+            change = (new_ms - base_ms) / base_ms if base_ms else 0.0
+            regression = change > threshold and new_ms - base_ms > min_ms
+            rows.append((size, stage, base_ms, new_ms, change, regression))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--min-ms', type=float, default=DEFAULT_MIN_MS)
+    args = parser.parse_args(argv)
+
+    base = load_results(args.base)
+    new = load_results(args.new)
+
+    for label, results in (('base', base), ('nuevo', new)):
+        env = results.get('environment', {})
+        print(f"{label}: commit {env.get('commit')}, python {env.get('python')}, "
+              f"pandas {env.get('pandas')}, {results.get('created')}")
+
+    rows = compare_results(base, new, args.threshold, args.min_ms)
+    print(f"\n{'filas':>10} {'etapa':<20} {'base ms':>10} {'nuevo ms':>10} {'cambio':>8}")
+    for size, stage, base_ms, new_ms, change, regression in rows:
+        flag = '  REGRESIÓN' if regression else ''
+        print(f'{size:>10} {stage:<20} {base_ms:10.1f} {new_ms:10.1f} {change:+8.1%}{flag}')
+
+    regressions = [row for row in rows if row[5]]
+    if regressions:
+        print(f'\n{len(regressions)} regresiones por encima del {args.threshold:.0%}')
+        return 1
+    print('\nSin regresiones')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,474 @@
+"""
+Prueba de carga de extremo a extremo con clientes concurrentes.
+
+Arranca la aplicación en local con la configuración de servidor elegida
+(gunicorn con workers sync o gthread, o uvicorn sobre visualizacion/asgi.py),
+sube un dataset sintético y reproduce desde `--clients` hilos una mezcla de
+subidas, desplazamiento por páginas y búsquedas con las mismas peticiones
+que hace el navegador. Informa por endpoint del rendimiento y de la latencia
+p50/p95/p99, y de la memoria residente (RSS) de cada worker.
+
+Uso:
+    python -m benchmarks.load_test --server sync --workers 2 --clients 20 --duration 60
+    python -m benchmarks.load_test --server gthread --workers 2 --threads 8 --cache-max-bytes 268435456
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --clients 20   # servidor ya arrancado
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from benchmarks.synthetic import CLASSES, PROTOCOLS, SERVICES, generate_file
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = ('sync', 'gthread', 'uvicorn')
+
+# Peso de cada acción en la mezcla de carga
+DEFAULT_MIX = 'upload=1,scroll=6,search=3'
+
+# Páginas consecutivas que recorre un cliente en cada desplazamiento
+SCROLL_PAGES = 5
+
+# Tamaño de página del navegador (result.js)
+PAGE_SIZE = 1000
+
+SEARCH_TERMS = PROTOCOLS + SERVICES[:10] + CLASSES
+
+JOB_POLL_INTERVAL = 0.5
+REQUEST_TIMEOUT = 300
+STARTUP_TIMEOUT = 60
+RSS_SAMPLE_INTERVAL = 1.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(server, port, workers, threads):
+    bind = f'127.0.0.1:{port}'
+    if server == 'uvicorn':
+        if importlib.util.find_spec('uvicorn') is None:
+            raise SystemExit('uvicorn no está instalado (pip install uvicorn)')
+        return [
+            sys.executable, '-m', 'uvicorn', 'visualizacion.asgi:application',
+            '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--no-access-log',
+        ]
+
+    command = [
+        sys.executable, '-m', 'gunicorn', 'visualizacion.wsgi:application',
+        '--bind', bind, '--workers', str(workers), '--worker-class', server, '--timeout', str(REQUEST_TIMEOUT),
+    ]
+    if server == 'gthread':
+        command += ['--threads', str(threads)]
+    return command
+
+
+def _tail(path, lines=20):
+    with open(path, 'rb') as f:
+        return b''.join(f.readlines()[-lines:]).decode('utf-8', errors='replace')
+
+
+def start_server(args, workdir):
+    """Lanza el servidor con un almacén vacío y devuelve (proceso, url base)"""
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'visualizacion.settings',
+        'ARFF_DATASET_STORE_DIR': os.path.join(workdir, 'store'),
+        'ARFF_ASYNC_INGEST': '1' if args.async_ingest else '0',
+        # Una línea por petición no aporta nada aquí y ralentiza el servidor
+        'ARFF_METRICS_LOG_LEVEL': 'WARNING',
+    })
+    if args.cache_max_bytes is not None:
+        env['ARFF_DATASET_CACHE_MAX_BYTES'] = str(args.cache_max_bytes)
+
+    log = open(os.path.join(workdir, 'server.log'), 'wb')
+    process = subprocess.Popen(
+        server_command(args.server, port, args.workers, args.threads),
+        cwd=PROJECT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'El servidor terminó al arrancar:\n{_tail(log.name)}')
+        try:
+            status, _ = request(base_url, 'GET', '/api/cache/stats/')
+            if status == 200:
+                return process, base_url
+        except OSError:
+            pass
+        time.sleep(0.2)
+
+    stop_server(process)
+    raise SystemExit(f'El servidor no respondió en {STARTUP_TIMEOUT} s:\n{_tail(log.name)}')
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# Peticiones HTTP
+
+def request(base_url, method, path, body=None, headers=None):
+    """Petición en una conexión nueva (los workers sync no mantienen keep-alive)"""
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=REQUEST_TIMEOUT)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def multipart_body(filename, content, fields=None):
+    """Cuerpo multipart/form-data con el archivo en el campo 'file'"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in (fields or {}).items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+    )
+    parts.extend([content, f'\r\n--{boundary}--\r\n'.encode()])
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class Recorder:
+    """Latencias por endpoint, compartidas por todos los clientes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def timed(self, name, base_url, method, path, body=None, headers=None, expected=(200,)):
+        start = time.perf_counter()
+        try:
+            status, content = request(base_url, method, path, body, headers)
+        except OSError:
+            status, content = None, b''
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            if status in expected:
+                self.latencies.setdefault(name, []).append(elapsed)
+            else:
+                self.errors[name] = self.errors.get(name, 0) + 1
+        return status, content
+
+    def add(self, name, elapsed):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(elapsed)
+
+    def summary(self, duration):
+        report = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            values = np.array(self.latencies.get(name, []))
+            entry = {
+                'requests': int(values.size),
+                'errors': self.errors.get(name, 0),
+                'throughput': values.size / duration,
+            }
+            if values.size:
+                p50, p95, p99 = np.percentile(values, [50, 95, 99])
+                entry.update({
+                    'mean_ms': values.mean() * 1000,
+                    'p50_ms': p50 * 1000,
+                    'p95_ms': p95 * 1000,
+                    'p99_ms': p99 * 1000,
+                    'max_ms': values.max() * 1000,
+                })
+            report[name] = entry
+        return report
+
+
+# Acciones de un cliente
+
+class Workload:
+    def __init__(self, base_url, recorder, content, cache_key, rows):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.content = content
+        self.cache_key = cache_key
+        self.rows = rows
+        self._uploads = 0
+        self._lock = threading.Lock()
+
+    def upload(self, rng):
+        """Sube un archivo nuevo (contenido distinto, así que no hay acierto de caché) y espera al resultado"""
+        with self._lock:
+            self._uploads += 1
+            n = self._uploads
+        content = f'% carga {n} {uuid.uuid4().hex}\n'.encode() + self.content
+        body, content_type = multipart_body(f'carga-{n}.arff', content, {'layout': 'columns'})
+
+        start = time.perf_counter()
+        status, response = self.recorder.timed(
+            'upload', self.base_url, 'POST', '/api/upload/', body, {'Content-Type': content_type},
+            expected=(200, 202),
+        )
+        if status != 202:
+            return
+
+        job_id = json.loads(response)['job_id']
+        while True:
+            time.sleep(JOB_POLL_INTERVAL)
+            status, response = self.recorder.timed(
+                'job_status', self.base_url, 'GET', f'/api/jobs/{job_id}/?layout=columns'
+            )
+            if status != 200 or json.loads(response)['status'] in ('done', 'error'):
+                break
+        # Tiempo hasta que la primera página está disponible
+        self.recorder.add('upload_ready', time.perf_counter() - start)
+
+    def scroll(self, rng):
+        """Páginas consecutivas desde una posición al azar, como el scroll de result.js"""
+        pages = max(1, (self.rows + PAGE_SIZE - 1) // PAGE_SIZE)
+        first = rng.randint(1, pages)
+        for page in range(first, min(pages, first + SCROLL_PAGES - 1) + 1):
+            query = urlencode({'cache_key': self.cache_key, 'page': page, 'page_size': PAGE_SIZE, 'layout': 'columns'})
+            self.recorder.timed('data_page', self.base_url, 'GET', f'/api/data/?{query}')
+
+    def search(self, rng):
+        query = urlencode({
+            'cache_key': self.cache_key, 'page': 1, 'page_size': PAGE_SIZE,
+            'search': rng.choice(SEARCH_TERMS), 'layout': 'columns',
+        })
+        self.recorder.timed('search', self.base_url, 'GET', f'/api/data/?{query}')
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('upload', 'scroll', 'search'):
+            raise SystemExit(f'Acción desconocida en --mix: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_clients(workload, clients, duration, mix, seed):
+    actions = list(mix)
+    weights = [mix[name] for name in actions]
+    deadline = time.monotonic() + duration
+
+    def client(i):
+        rng = random.Random(seed + i)
+        while time.monotonic() < deadline:
+            getattr(workload, rng.choices(actions, weights)[0])(rng)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+# Memoria de los procesos del servidor
+
+def _children(pid):
+    """Hijos directos de `pid` según /proc"""
+    children = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # El nombre (2º campo) puede tener espacios: el ppid va tras el último ')'
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(name))
+    return children
+
+
+def _rss(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RSSMonitor(threading.Thread):
+    """
+    Muestrea cada RSS_SAMPLE_INTERVAL la memoria de cada worker (hijo del
+    proceso maestro) y, por separado, la de sus procesos hijos (pools de
+    ingesta y de parseo).
+    """
+
+    def __init__(self, master_pid, single_process=False):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        # uvicorn con un solo worker no crea procesos hijos: el maestro es el worker
+        self.single_process = single_process
+        self.samples = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(RSS_SAMPLE_INTERVAL)
+
+    def sample(self):
+        workers = [self.master_pid] if self.single_process else _children(self.master_pid)
+        for pid in workers:
+            worker = _rss(pid)
+            pool = sum(_rss(child) for child in _children(pid))
+            stats = self.samples.setdefault(pid, {'rss_max': 0, 'pool_rss_max': 0})
+            stats['rss_max'] = max(stats['rss_max'], worker)
+            stats['pool_rss_max'] = max(stats['pool_rss_max'], pool)
+            stats['rss_final'] = worker
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+        return {str(pid): stats for pid, stats in sorted(self.samples.items())}
+
+
+def seed_dataset(base_url, content):
+    """Sube el dataset que recorren los clientes y devuelve su cache_key"""
+    body, content_type = multipart_body('base.arff', content)
+    status, response = request(base_url, 'POST', '/api/upload/', body, {'Content-Type': content_type})
+    if status not in (200, 202):
+        raise SystemExit(f'La subida inicial falló ({status}): {response[:200]!r}')
+
+    data = json.loads(response)
+    while status == 202 or data.get('status') not in (None, 'done'):
+        if data.get('status') == 'error':
+            raise SystemExit(f"La subida inicial falló: {data.get('error')}")
+        time.sleep(JOB_POLL_INTERVAL)
+        status, response = request(base_url, 'GET', f"/api/jobs/{data['job_id']}/")
+        data = json.loads(response)
+    return data['cache_key']
+
+
+def print_report(results):
+    params = results['params']
+    print(f"\n{params['server']}, {params['workers']} workers, {params['clients']} clientes, "
+          f"{results['duration']:.1f} s")
+    print(f"{'endpoint':<14} {'peticiones':>10} {'errores':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, entry in results['endpoints'].items():
+        print(f"{name:<14} {entry['requests']:>10} {entry['errors']:>8} {entry['throughput']:>8.1f} "
+              f"{entry.get('p50_ms', 0):>9.1f} {entry.get('p95_ms', 0):>9.1f} {entry.get('p99_ms', 0):>9.1f}")
+
+    if results['workers']:
+        print(f"\n{'worker':<10} {'RSS máx MB':>12} {'RSS final MB':>13} {'pools MB':>10}")
+        for pid, stats in results['workers'].items():
+            print(f"{pid:<10} {stats['rss_max'] / 1e6:>12.1f} {stats.get('rss_final', 0) / 1e6:>13.1f} "
+                  f"{stats['pool_rss_max'] / 1e6:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--server', choices=SERVERS, default='sync')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4, help='hilos por worker (gthread)')
+    parser.add_argument('--url', help='usar un servidor ya arrancado en lugar de lanzar uno')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30.0, help='segundos de carga')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='pesos de las acciones, p. ej. upload=1,scroll=6,search=3')
+    parser.add_argument('--rows', type=int, default=100000, help='filas del dataset sintético')
+    parser.add_argument('--preset', default='kdd')
+    parser.add_argument('--cache-max-bytes', type=int, help='ARFF_DATASET_CACHE_MAX_BYTES de cada worker')
+    parser.add_argument('--sync-ingest', dest='async_ingest', action='store_false',
+                        help='parsear la subida dentro de la petición (ARFF_ASYNC_INGEST=0)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='archivo JSON de resultados')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix='arff-load-')
+    process = None
+
+    try:
+        path = generate_file(os.path.join(workdir, 'dataset.arff'), args.rows, args.preset, args.seed)
+        with open(path, 'rb') as f:
+            content = f.read()
+        print(f'Dataset: {args.rows} filas, {len(content) / 1e6:.1f} MB')
+
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            process, base_url = start_server(args, workdir)
+            print(f'Servidor {args.server} en {base_url} (pid {process.pid})')
+
+        cache_key = seed_dataset(base_url, content)
+        recorder = Recorder()
+        workload = Workload(base_url, recorder, content, cache_key, args.rows)
+
+        monitor = None
+        if process is not None:
+            monitor = RSSMonitor(process.pid, single_process=args.server == 'uvicorn' and args.workers == 1)
+        if monitor is not None:
+            monitor.start()
+        duration = run_clients(workload, args.clients, args.duration, mix, args.seed)
+        workers = monitor.stop() if monitor is not None else {}
+
+        results = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'params': {
+                'server': args.server if process is not None else args.url,
+                'workers': args.workers,
+                'threads': args.threads,
+                'clients': args.clients,
+                'mix': mix,
+                'rows': args.rows,
+                'bytes': len(content),
+                'cache_max_bytes': args.cache_max_bytes,
+                'async_ingest': args.async_ingest,
+            },
+            'duration': duration,
+            'endpoints': recorder.summary(duration),
+            'workers': workers,
+        }
+        print_report(results)
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            print(f'Resultados en {args.output}')
+    finally:
+        if process is not None:
+            stop_server(process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
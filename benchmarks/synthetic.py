@@ -0,0 +1,180 @@
+"""
+Generador de archivos ARFF sintéticos para los benchmarks.
+
+Los valores se generan con NumPy por bloques de filas y se escriben
+directamente al archivo, así que se pueden crear archivos de millones de
+filas sin tenerlos en memoria.
+
+Uso:
+    python -m benchmarks.synthetic salida.arff --preset kdd --rows 1000000
+    python -m benchmarks.synthetic salida.arff.gz --preset sparse --rows 50000
+"""
+import argparse
+import gzip
+import io
+import sys
+
+import numpy as np
+
+
+PROTOCOLS = ['tcp', 'udp', 'icmp']
+SERVICES = [f'service_{i}' for i in range(70)]
+FLAGS = ['SF', 'S0', 'REJ', 'RSTR', 'SH', 'RSTO', 'S1', 'RSTOS0', 'S3', 'S2', 'OTH']
+CLASSES = ['normal', 'anomaly']
+
+WORDS = [
+    'alpha', 'beta', 'gamma', 'delta', 'red', 'green', 'blue', 'north', 'south',
+    'server', 'client', 'packet', 'login', 'error', 'ok', 'timeout', 'retry',
+]
+
+# Filas generadas y escritas por bloque
+BLOCK_ROWS = 50000
+
+# Formas predefinidas; cualquier parámetro se puede sobrescribir
+PRESETS = {
+    # Mezcla tipo NSL-KDD: 38 numéricas, 3 nominales + clase
+    'kdd': {'numeric': 38, 'nominal': 3, 'strings': 0, 'missing': 0.01},
+    # Texto entre comillas con comas y comillas escapadas
+    'strings': {'numeric': 5, 'nominal': 2, 'strings': 3, 'missing': 0.02},
+    # Formato disperso {índice valor, ...}
+    'sparse': {'numeric': 1000, 'nominal': 0, 'strings': 0, 'missing': 0.0, 'sparse': True, 'density': 0.01},
+}
+
+
+def _phrases(rng, count=500, multiline=False):
+    """Textos entre comillas simples; algunos con comas, comillas escapadas o saltos de línea"""
+    phrases = []
+    for i in range(count):
+        words = list(rng.choice(WORDS, size=rng.integers(1, 5)))
+        if i % 5 == 0:
+            words.insert(1, 'with, comma')
+        if i % 7 == 0:
+            words.append("it\\'s")
+        if multiline and i % 11 == 0:
+            words.append('\nnext line')
+        phrases.append("'" + ' '.join(words) + "'")
+    return np.array(phrases, dtype=object)
+
+
+def nominal_attributes(nominal):
+    """(nombre, valores) de las `nominal` columnas nominales: las de NSL-KDD y luego genéricas"""
+    known = [('protocol_type', PROTOCOLS), ('service', SERVICES), ('flag', FLAGS)]
+    return [
+        known[i] if i < len(known) else (f'nominal_{i}', [f'v{i}_{k}' for k in range(10)])
+        for i in range(nominal)
+    ]
+
+
+def header_lines(numeric, nominal, strings, relation='synthetic'):
+    lines = [f'@relation {relation}', '']
+    lines.append('@attribute duration integer')
+    for name, values in nominal_attributes(nominal):
+        lines.append(f"@attribute {name} {{{','.join(values)}}}")
+    for i in range(numeric - 1):
+        lines.append(f'@attribute feature_{i} real')
+    for i in range(strings):
+        lines.append(f'@attribute text_{i} string')
+    lines.append(f"@attribute class {{{','.join(CLASSES)}}}")
+    lines.extend(['', '@data'])
+    return lines
+
+
+def _dense_block(rng, rows, numeric, nominal, strings, missing, phrases):
+    columns = [rng.integers(0, 500, size=rows).astype(str)]
+
+    for _, values in nominal_attributes(nominal):
+        columns.append(np.asarray(values, dtype=object)[rng.integers(0, len(values), size=rows)])
+
+    for _ in range(numeric - 1):
+        values = np.round(rng.random(rows), 2)
+        values[rng.random(rows) < 0.5] = 0
+        text = values.astype(str).astype(object)
+        text[values == 0] = '0'
+        if missing:
+            text[rng.random(rows) < missing] = '?'
+        columns.append(text)
+
+    for _ in range(strings):
+        text = phrases[rng.integers(0, len(phrases), size=rows)]
+        if missing:
+            text = np.where(rng.random(rows) < missing, '?', text)
+        columns.append(text)
+
+    columns.append(np.asarray(CLASSES, dtype=object)[rng.integers(0, 2, size=rows)])
+    return [','.join(row) for row in zip(*columns)]
+
+
+def _sparse_block(rng, rows, n_columns, density):
+    lines = []
+    counts = rng.binomial(n_columns, density, size=rows)
+    for count in counts:
+        indices = np.sort(rng.choice(n_columns, size=count, replace=False))
+        values = np.round(rng.random(count) * 10, 2)
+        lines.append('{' + ','.join(f'{i} {v}' for i, v in zip(indices, values)) + '}')
+    return lines
+
+
+def write_arff(f, rows, numeric=38, nominal=3, strings=0, missing=0.01,
+               sparse=False, density=0.01, multiline=False, seed=0):
+    """Escribe un ARFF sintético de `rows` filas en el archivo de texto `f`"""
+    rng = np.random.default_rng(seed)
+    phrases = _phrases(rng, multiline=multiline)
+
+    if sparse:
+        lines = ['@relation synthetic_sparse', '']
+        lines.extend(f'@attribute feature_{i} real' for i in range(numeric))
+        lines.extend(['', '@data'])
+    else:
+        lines = header_lines(numeric, nominal, strings)
+    f.write('\n'.join(lines) + '\n')
+
+    for start in range(0, rows, BLOCK_ROWS):
+        n = min(BLOCK_ROWS, rows - start)
+        if sparse:
+            block = _sparse_block(rng, n, numeric, density)
+        else:
+            block = _dense_block(rng, n, numeric, nominal, strings, missing, phrases)
+        f.write('\n'.join(block) + '\n')
+
+
+def generate_file(path, rows, preset='kdd', seed=0, **overrides):
+    """Crea `path` (comprimido con gzip si termina en .gz) con la forma `preset`"""
+    params = dict(PRESETS[preset], **{k: v for k, v in overrides.items() if v is not None})
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8', newline='\n') as f:
+        write_arff(f, rows, seed=seed, **params)
+    return path
+
+
+def generate_nsl_kdd_like(rows, seed=0):
+    """ARFF sintético con la forma de NSL-KDD como str (para tamaños pequeños)"""
+    buffer = io.StringIO()
+    write_arff(buffer, rows, seed=seed, **PRESETS['kdd'])
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Genera archivos ARFF sintéticos')
+    parser.add_argument('path')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='kdd')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--numeric', type=int)
+    parser.add_argument('--nominal', type=int)
+    parser.add_argument('--strings', type=int)
+    parser.add_argument('--missing', type=float)
+    parser.add_argument('--density', type=float)
+    parser.add_argument('--multiline', action='store_true', default=None,
+                        help='incluye saltos de línea dentro de los textos entre comillas')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate_file(
+        args.path, args.rows, args.preset, args.seed,
+        numeric=args.numeric, nominal=args.nominal, strings=args.strings,
+        missing=args.missing, density=args.density, multiline=args.multiline,
+    )
+    print(f'Generado {args.path}: {args.rows} filas ({args.preset})')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,5 @@
+// Extensiones aceptadas en la subida
+const ARFF_EXTENSIONS = ['.arff', '.gz', '.bz2', '.zip'];
 
 class AppUtils {
    
@@ -22,9 +24,11 @@ class AppUtils {
 
     static isValidARFFFile(file) {
         if (!file) return false;
-        if (!file.name.toLowerCase().endsWith('.arff')) return false;
-        if (file.size > 10 * 1024 * 1024) { // 10MB
-            this.showMessage('El archivo es demasiado grande (máximo 10MB)', 'error');
+        // .arff o comprimido (el servidor detecta gzip, bz2 y zip por su contenido)
+        const name = file.name.toLowerCase();
+        if (!ARFF_EXTENSIONS.some(extension => name.endsWith(extension))) return false;
+        if (file.size > 500 * 1024 * 1024) { // 500MB
+            this.showMessage('El archivo es demasiado grande (máximo 500MB)', 'error');
             return false;
         }
         return true;
@@ -1,3 +1,8 @@
+// Formato binario de páginas (buffers por columna) servido por /api/data/
+const COLUMN_BUFFERS_MEDIA_TYPE = 'application/vnd.arff.columns';
+// Intervalo (ms) entre consultas del trabajo mientras el archivo se sigue procesando
+const INGEST_POLL_INTERVAL = 1000;
+
 class ARFFResults {
     constructor() {
         this.metadata = null;
@@ -9,6 +14,7 @@ class ARFFResults {
         this.totalRows = 0;
         this.cacheKey = null;
         this.isLoading = false;
+        this.isStreaming = false;
         
         this.init();
     }
@@ -32,7 +38,9 @@ class ARFFResults {
             
             this.render();
             
-            if (this.metadata.has_more) {
+            if (this.metadata.partial) {
+                this.followIngest();
+            } else if (this.metadata.has_more) {
                 this.loadAllDataInBackground();
             }
         } catch (error) {
@@ -41,28 +49,87 @@ class ARFFResults {
         }
     }
 
+    async followIngest() {
+        // El archivo se sigue procesando: el total crece con las filas ya publicadas
+        console.log('🔄 Esperando al resto del archivo...');
+        
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, INGEST_POLL_INTERVAL));
+            
+            let job;
+            try {
+                const response = await fetch(`/api/jobs/${this.metadata.job_id}/`);
+                job = await response.json();
+                
+                if (!response.ok || job.status === 'error') {
+                    AppUtils.showMessage(job.error || 'Error al procesar el archivo', 'error');
+                    return;
+                }
+            } catch (error) {
+                console.error('Error consultando el trabajo:', error);
+                continue;
+            }
+            
+            if (job.status === 'done') {
+                this.totalRows = job.result.shape.rows;
+                this.metadata.partial = false;
+                break;
+            }
+            
+            if (job.rows_ready > this.totalRows) {
+                this.totalRows = job.rows_ready;
+                this.renderDatasetInfo();
+                this.renderPagination();
+            }
+        }
+        
+        console.log(`✅ Archivo procesado: ${this.totalRows} filas`);
+        this.renderDatasetInfo();
+        this.renderPagination();
+        
+        if (this.allData.length < this.totalRows) {
+            this.loadAllDataInBackground();
+        }
+    }
+
     async loadAllDataInBackground() {
         console.log('🔄 Cargando datos completos en background...');
         
-        let currentPage = 2;
-        const pageSize = 5000;
+        // Una sola descarga en streaming (NDJSON) desde la primera fila que falta
+        this.isStreaming = true;
         
-        while (this.allData.length < this.totalRows && !this.isLoading) {
-            try {
-                const response = await fetch(
-                    `/api/data/?cache_key=${this.cacheKey}&page=${currentPage}&page_size=${pageSize}`
-                );
+        try {
+            const response = await fetch(
+                `/api/export/?cache_key=${this.cacheKey}&output=ndjson&start=${this.allData.length}`
+            );
+            
+            if (!response.ok || !response.body) {
+                console.error('Error cargando datos adicionales');
+                return;
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let pending = '';
+            let lastRender = 0;
+            
+            while (true) {
+                const { done, value } = await reader.read();
                 
-                if (!response.ok) {
-                    console.error('Error cargando datos adicionales');
-                    break;
-                }
+                pending += done ? decoder.decode() : decoder.decode(value, { stream: true });
                 
-                const result = await response.json();
+                // Solo se procesan las líneas completas; el resto espera al siguiente bloque
+                const lines = pending.split('\n');
+                pending = done ? '' : lines.pop();
                 
-                if (result.success && result.data.length > 0) {
-                    this.allData.push(...result.data);
-                    console.log(`📥 Cargados ${this.allData.length} de ${this.totalRows} filas`);
+                for (const line of lines) {
+                    if (line) this.allData.push(JSON.parse(line));
+                }
+                
+                // Renderizado progresivo a medida que llegan los bytes
+                const now = Date.now();
+                if (done || now - lastRender > 250) {
+                    lastRender = now;
                     
                     if (!this.currentSearch) {
                         this.filteredData = [...this.allData];
@@ -70,26 +137,23 @@ class ARFFResults {
                     }
                     
                     this.updateLoadedCount();
-                    currentPage++;
-                    
-                    if (!result.has_next) break;
-                } else {
-                    break;
+                    console.log(`📥 Cargados ${this.allData.length} de ${this.totalRows} filas`);
                 }
                 
-                await new Promise(resolve => setTimeout(resolve, 100));
-                
-            } catch (error) {
-                console.error('Error en carga background:', error);
-                break;
+                if (done) break;
             }
+        } catch (error) {
+            console.error('Error en carga background:', error);
+        } finally {
+            this.isStreaming = false;
         }
         
         console.log(`✅ Carga completa: ${this.allData.length} filas`);
     }
 
     async loadPageData(page) {
-        if (this.isLoading) return;
+        // Durante la descarga en streaming las filas llegan solas
+        if (this.isLoading || this.isStreaming) return;
         
         const startIdx = (page - 1) * this.rowsPerPage;
         const endIdx = startIdx + this.rowsPerPage;
@@ -104,23 +168,19 @@ class ARFFResults {
         try {
             const serverPage = Math.ceil(endIdx / 1000);
             
-            const response = await fetch(
-                `/api/data/?cache_key=${this.cacheKey}&page=${serverPage}&page_size=1000&search=${this.currentSearch}`
+            const result = await this.fetchPage(
+                `/api/data/?cache_key=${this.cacheKey}&page=${serverPage}&page_size=1000&search=${this.currentSearch}&layout=columns`
             );
             
-            if (response.ok) {
-                const result = await response.json();
+            if (result && result.success) {
+                const newData = this.decodePage(result.data);
+                this.allData.push(...newData);
                 
-                if (result.success) {
-                    const newData = result.data;
-                    this.allData.push(...newData);
-                    
-                    if (!this.currentSearch) {
-                        this.filteredData = [...this.allData];
-                    }
-                    
-                    console.log(`📥 Página ${serverPage} cargada: +${newData.length} filas`);
+                if (!this.currentSearch) {
+                    this.filteredData = [...this.allData];
                 }
+                
+                console.log(`📥 Página ${serverPage} cargada: +${newData.length} filas`);
             }
         } catch (error) {
             console.error('Error cargando página:', error);
@@ -130,6 +190,79 @@ class ARFFResults {
         }
     }
 
+    async fetchPage(url) {
+        // Pide la página como buffers binarios por columna; acepta JSON si el servidor no los envía
+        const response = await fetch(url, { headers: { 'Accept': COLUMN_BUFFERS_MEDIA_TYPE } });
+        
+        if (!response.ok) return null;
+        
+        if (response.headers.get('Content-Type') === COLUMN_BUFFERS_MEDIA_TYPE) {
+            return this.decodeBuffers(await response.arrayBuffer());
+        }
+        return response.json();
+    }
+
+    decodeBuffers(buffer) {
+        // 'ARFB' | uint32 longitud de cabecera | cabecera JSON | buffers alineados a 8 bytes
+        const view = new DataView(buffer);
+        const headerLength = view.getUint32(4, true);
+        const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+        const base = 8 + headerLength;
+        
+        const columns = header.columns.map(column => {
+            const ArrayType = column.dtype === 'int32' ? Int32Array : Float64Array;
+            const values = new ArrayType(buffer, base + column.offset, header.length);
+            return { ...column, values };
+        });
+        
+        return { ...header.meta, data: { format: 'buffers', length: header.length, columns } };
+    }
+
+    decodePage(data) {
+        // Formato por filas (compatibilidad): ya es una lista de objetos
+        if (Array.isArray(data)) return data;
+        
+        // Buffers binarios: arrays tipados con NaN o código -1 para los nulos
+        if (data.format === 'buffers') {
+            return this.columnsToRows(data.length, data.columns.map(column => {
+                if (column.dictionary) {
+                    return Array.from(column.values, code => code < 0 ? null : column.dictionary[code]);
+                }
+                if (column.type === 'datetime') {
+                    return Array.from(column.values, value => isNaN(value) ? null : new Date(value).toISOString());
+                }
+                return Array.from(column.values, value => isNaN(value) ? null : value);
+            }), data.columns);
+        }
+        
+        // Formato por columnas: valores por columna, bitmap de nulos y diccionarios
+        const columns = data.columns.map(column => {
+            if (column.dictionary) {
+                return column.codes.map(code => code < 0 ? null : column.dictionary[code]);
+            }
+            if (!column.nulls) return column.values;
+            
+            const bitmap = atob(column.nulls);
+            return column.values.map((value, i) => 
+                (bitmap.charCodeAt(i >> 3) >> (i & 7)) & 1 ? null : value
+            );
+        });
+        
+        return this.columnsToRows(data.length, columns, data.columns);
+    }
+
+    columnsToRows(length, values, columns) {
+        const rows = new Array(length);
+        for (let i = 0; i < length; i++) {
+            const row = {};
+            columns.forEach((column, j) => {
+                row[column.name] = values[j][i];
+            });
+            rows[i] = row;
+        }
+        return rows;
+    }
+
     showLoadingIndicator(show) {
         let indicator = document.getElementById('loadingIndicator');
         
@@ -1,3 +1,9 @@
+// Intervalo entre consultas del estado de un trabajo de ingesta (ms)
+const JOB_POLL_INTERVAL = 500;
+
+// Bloque del hash de contenido; debe coincidir con ingest.HASH_BLOCK_SIZE
+const HASH_BLOCK_SIZE = 4 * 1024 * 1024;
+
 class ARFFUploader {
     constructor() {
         this.fileInput = document.getElementById('arffFile');
@@ -87,6 +93,11 @@ class ARFFUploader {
     AppUtils.setLoading(this.uploadBtn, true);
 
     try {
+        // Si el servidor ya tiene este archivo no hace falta subirlo
+        if (await this.tryCachedDataset(file)) {
+            return;
+        }
+
         const formData = new FormData();
         formData.append('file', file);
         
@@ -117,7 +128,9 @@ class ARFFUploader {
 
         console.log(' DEBUG - Resultado parseado:', result);
 
-        if (response.ok && result.success) {
+        if (response.status === 202 && result.job_id) {
+            await this.handleAccepted(result);
+        } else if (response.ok && result.success) {
             this.handleSuccess(result);
         } else {
             this.handleError(result.error || 'Error al procesar el archivo');
@@ -129,6 +142,93 @@ class ARFFUploader {
         AppUtils.setLoading(this.uploadBtn, false);
     }
 }
+    async hashFile(file) {
+        // SHA-256 de la concatenación de los SHA-256 de cada bloque (ingest.BlockHasher)
+        const digests = [];
+        for (let start = 0; start < file.size; start += HASH_BLOCK_SIZE) {
+            const block = await file.slice(start, start + HASH_BLOCK_SIZE).arrayBuffer();
+            digests.push(new Uint8Array(await crypto.subtle.digest('SHA-256', block)));
+        }
+
+        const joined = new Uint8Array(digests.length * 32);
+        digests.forEach((digest, i) => joined.set(digest, i * 32));
+
+        const hash = new Uint8Array(await crypto.subtle.digest('SHA-256', joined));
+        return Array.from(hash, byte => byte.toString(16).padStart(2, '0')).join('');
+    }
+
+    async tryCachedDataset(file) {
+        // WebCrypto solo está disponible en contextos seguros (HTTPS o localhost)
+        if (!window.crypto || !crypto.subtle) {
+            return false;
+        }
+
+        let hash;
+        try {
+            hash = await this.hashFile(file);
+        } catch (error) {
+            console.warn('No se pudo calcular el hash del archivo:', error);
+            return false;
+        }
+
+        const response = await fetch(
+            `/api/datasets/${hash}/?filename=${encodeURIComponent(file.name)}`
+        );
+
+        if (response.status === 200) {
+            this.handleSuccess(await response.json());
+            return true;
+        }
+        if (response.status === 202) {
+            // Ya se está procesando (p. ej. otra pestaña lo subió)
+            await this.handleAccepted(await response.json());
+            return true;
+        }
+        return false;
+    }
+
+    async handleAccepted(result) {
+        // Si la primera página ya está parseada se muestra enseguida y el resto llega después
+        if (result.partial) {
+            this.handleSuccess(result);
+        } else {
+            await this.handleJob(result.job_id);
+        }
+    }
+
+    async handleJob(jobId) {
+        // El archivo se procesa en segundo plano: consultar el trabajo hasta que termine
+        const job = await this.pollJob(jobId);
+        if (job.status === 'done') {
+            this.handleSuccess(job.result);
+        } else {
+            this.handleError(job.error || 'Error al procesar el archivo');
+        }
+    }
+
+    async pollJob(jobId) {
+        while (true) {
+            const response = await fetch(`/api/jobs/${jobId}/`);
+            const job = await response.json();
+
+            if (!response.ok) {
+                return { status: 'error', error: job.error };
+            }
+            if (job.status === 'done' || job.status === 'error') {
+                return job;
+            }
+
+            const percent = Math.round(job.progress * 100);
+            const stage = job.stage === 'saving' ? 'Guardando' : 'Procesando';
+            AppUtils.showMessage(
+                `${stage} "${job.filename}": ${percent}% (${job.rows.toLocaleString()} filas)`,
+                'success'
+            );
+
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        }
+    }
+
     handleSuccess(data) {
         console.log('DEBUG - Éxito, datos recibidos:', data);  
         // Guardar datos en sessionStorage para la página de resultados
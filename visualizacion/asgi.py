@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'visualizacion.settings')
+# Servido por ASGI: subida, páginas y exportación usan las vistas asíncronas
+os.environ.setdefault('ARFF_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -47,6 +47,8 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Tiempos por etapa: cabecera Server-Timing, log estructurado y /metrics
+    'app_arff.instrumentation.TimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -132,7 +134,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'  # ← models, no backends
 # Django REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'app_arff.renderers.InstrumentedJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.MultiPartParser',
@@ -172,17 +174,69 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # File upload settings
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  
-
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'arff-dataset-cache',
-        'OPTIONS': {
-            'MAX_ENTRIES': 10,
-        }
-    }
+# Los archivos mayores se guardan en disco temporal y se leen por bloques
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  
+# Tamaño máximo aceptado para archivos ARFF
+ARFF_MAX_UPLOAD_SIZE = int(os.environ.get('ARFF_MAX_UPLOAD_SIZE', 500 * 1024 * 1024))
+
+
+# Almacén columnar de datasets procesados, compartido por todos los workers
+ARFF_DATASET_STORE_DIR = os.environ.get('ARFF_DATASET_STORE_DIR', str(BASE_DIR / 'dataset_store'))
+
+# Presupuesto en bytes de la caché de datasets de cada proceso
+ARFF_DATASET_CACHE_MAX_BYTES = int(os.environ.get('ARFF_DATASET_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Conjuntos de resultados filtrados (índices de fila) por proceso
+ARFF_RESULT_SET_MAX_BYTES = int(os.environ.get('ARFF_RESULT_SET_MAX_BYTES', 64 * 1024 * 1024))
+ARFF_RESULT_SET_TTL = int(os.environ.get('ARFF_RESULT_SET_TTL', 600))
+
+# Las páginas de un dataset no cambian nunca (cache_key es el hash del archivo):
+# el navegador puede guardarlas todo este tiempo y revalidarlas con su ETag
+ARFF_PAGE_CACHE_MAX_AGE = int(os.environ.get('ARFF_PAGE_CACHE_MAX_AGE', 365 * 24 * 60 * 60))
+
+# Ingesta en segundo plano: la subida devuelve un id de trabajo y el parseo
+# se hace en un pool de procesos local; el estado vive en SQLite (sin broker)
+ARFF_ASYNC_INGEST = os.environ.get('ARFF_ASYNC_INGEST', '1') == '1'
+ARFF_INGEST_WORKERS = int(os.environ.get('ARFF_INGEST_WORKERS', 2))
+ARFF_JOB_DB_PATH = os.environ.get('ARFF_JOB_DB_PATH', os.path.join(ARFF_DATASET_STORE_DIR, 'jobs.sqlite3'))
+ARFF_INGEST_SPOOL_DIR = os.environ.get('ARFF_INGEST_SPOOL_DIR', os.path.join(ARFF_DATASET_STORE_DIR, 'spool'))
+
+# Ingesta progresiva: la subida responde con la primera página y el trabajo
+# publica los bloques ya parseados para que /api/data/ los sirva antes de terminar
+ARFF_PROGRESSIVE_INGEST = os.environ.get('ARFF_PROGRESSIVE_INGEST', '1') == '1'
+
+# Procesos que parsean en paralelo la sección @data de archivos grandes en disco
+ARFF_PARSE_WORKERS = int(os.environ.get('ARFF_PARSE_WORKERS', os.cpu_count() or 1))
+
+# Vistas asíncronas de subida, páginas y exportación (las activa visualizacion/asgi.py):
+# el trabajo bloqueante va a un pool de ARFF_ASYNC_CPU_WORKERS hilos por worker
+ARFF_ASYNC_VIEWS = os.environ.get('ARFF_ASYNC_VIEWS', '0') == '1'
+ARFF_ASYNC_CPU_WORKERS = int(os.environ.get('ARFF_ASYNC_CPU_WORKERS', max(4, os.cpu_count() or 1)))
+
+# Instrumentación por etapas (Server-Timing, log 'app_arff.metrics' y /metrics);
+# con '0' no se mide nada y /metrics responde 404
+ARFF_METRICS_ENABLED = os.environ.get('ARFF_METRICS_ENABLED', '1') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Mensajes de la app (lectura, trabajos, páginas); ARFF_LOG_LEVEL=DEBUG muestra el detalle
+        'app_arff': {
+            'handlers': ['console'],
+            'level': os.environ.get('ARFF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # Una línea JSON por petición; ARFF_METRICS_LOG_LEVEL=WARNING las silencia
+        'app_arff.metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('ARFF_METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
 }
 
 # Security settings for production